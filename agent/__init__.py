@@ -13,17 +13,21 @@ if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
 # 导出主要的类和函数
-from .agent import create_agent, stream_agent
+from .agent import create_agent, stream_agent, stream_agent_messages
 from .utils import parse_messages
 from .llm_provider import init_llm
 from .tool_provider import ToolFactory
+from .checkpointer import create_checkpointer, RedisSaver
 from . import config
 
 __all__ = [
     'create_agent',
     'stream_agent',
+    'stream_agent_messages',
     'parse_messages',
     'init_llm',
     'ToolFactory',
+    'create_checkpointer',
+    'RedisSaver',
     'config'
 ]
\ No newline at end of file
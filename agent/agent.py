@@ -1,10 +1,11 @@
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import InMemorySaver
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
 from typing import Optional, AsyncGenerator, Tuple, Any
 from memory_strategy import BaseMemoryStrategy
 from trajectory.trajectory_recorder import create_local_recorder
 from trajectory.react_trajectory_hook import create_trajectory_hook
+from trajectory.callback_handler import create_trajectory_callback_handler
 
 def create_agent(
     llm, 
@@ -12,7 +13,10 @@ def create_agent(
     use_memory=True, 
     memory_strategy: Optional[BaseMemoryStrategy] = None,
     use_trajectory: bool = False,  # 新增参数
-    trajectory_recorder: Optional[Any] = None  # 新增参数
+    trajectory_recorder: Optional[Any] = None,  # 新增参数
+    checkpointer: Optional[Any] = None,
+    trajectory_hook: Optional[Any] = None,
+    trajectory_spans: bool = True
 ):
     """创建ReAct Agent
     
@@ -23,6 +27,9 @@ def create_agent(
         memory_strategy: 记忆策略实例，用于控制上下文长度
         use_trajectory: 是否启用轨迹记录
         trajectory_recorder: 自定义的轨迹记录器，如果不提供则使用默认的本地记录器
+        checkpointer: 自定义的检查点存储，重建Agent时传入同一实例可保留会话记忆
+        trajectory_hook: 已有的轨迹钩子，重建Agent时传入可避免重复记录历史消息
+        trajectory_spans: 启用轨迹记录时，是否通过回调记录请求、节点、模型调用和工具调用的耗时
     """
     # 根据可用工具动态生成系统提示
     tool_descriptions = []
@@ -56,17 +63,25 @@ def create_agent(
     
     # 处理轨迹记录
     if use_trajectory:
-        trajectory_recorder = trajectory_recorder or create_local_recorder()
-        trajectory_hook = create_trajectory_hook(trajectory_recorder)
+        if trajectory_hook is None:
+            trajectory_recorder = trajectory_recorder or create_local_recorder()
+            trajectory_hook = create_trajectory_hook(trajectory_recorder)
         agent_params["post_model_hook"] = trajectory_hook
+        trajectory_recorder = trajectory_recorder or trajectory_hook.recorder
 
     
     # 如果启用记忆，添加 checkpointer
     if use_memory:
-        agent_params["checkpointer"] = InMemorySaver()
+        agent_params["checkpointer"] = checkpointer or InMemorySaver()
     
     # 只返回 agent，不返回 trajectory_hook
-    return create_react_agent(**agent_params)
+    agent = create_react_agent(**agent_params)
+    if use_trajectory and trajectory_spans:
+        # 记录每次请求的耗时分解：模型调用、工具调用和各个节点
+        # 与轨迹钩子共用会话状态，同一轮的消息和耗时记录在同一个trace中
+        sessions = getattr(trajectory_hook, "sessions", None)
+        agent = agent.with_config(callbacks=[create_trajectory_callback_handler(trajectory_recorder, sessions)])
+    return agent
 
 
 async def stream_agent(
@@ -97,4 +112,48 @@ async def stream_agent(
         config=config,
         stream_mode="messages"
     ):
-        yield message_chunk, metadata
\ No newline at end of file
+        yield message_chunk, metadata
+
+
+# 产生对话消息的节点；post_model_hook 返回的是完整状态，不能当作新增消息
+MESSAGE_NODES = ("agent", "tools")
+
+
+async def stream_agent_messages(
+    agent,
+    query: str,
+    thread_id: str
+) -> AsyncGenerator[BaseMessage, None]:
+    """统一的Agent调用接口 - 逐条输出本轮新增的完整消息
+    
+    先输出本轮的用户消息，之后每当模型回复或工具返回时输出对应的消息，
+    不读取也不输出之前的对话历史。
+    
+    Args:
+        agent: Agent实例
+        query: 用户查询
+        thread_id: 会话ID
+    
+    Yields:
+        BaseMessage: HumanMessage、AIMessage 或 ToolMessage
+    """
+    print(f"\n{'='*50}")
+    print(f"🔍 处理查询: {query}")
+    print(f"🆔 会话ID: {thread_id}")
+    print(f"{'='*50}\n")
+    
+    config = {"configurable": {"thread_id": thread_id}}
+    human_message = HumanMessage(content=query)
+    yield human_message
+    
+    async for update in agent.astream(
+        input={"messages": [human_message]},
+        config=config,
+        stream_mode="updates"
+    ):
+        for node, node_update in update.items():
+            if node not in MESSAGE_NODES or not isinstance(node_update, dict):
+                continue
+            for message in node_update.get("messages") or []:
+                if isinstance(message, BaseMessage):
+                    yield message
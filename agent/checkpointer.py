@@ -0,0 +1,433 @@
+"""会话状态（检查点）存储：进程内存或 Redis"""
+
+import asyncio
+import json
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+DEFAULT_PREFIX = "lang_agent:checkpoint:"
+# list() 每次管道读取的检查点数
+LIST_PAGE_SIZE = 100
+
+
+def _pack(header: List[Any], data: bytes) -> bytes:
+    """把 (type, bytes) 形式的序列化结果和附加字段打包成一个值：JSON 头 + 换行 + 原始字节"""
+    return json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n" + data
+
+
+def _unpack(value: bytes) -> Tuple[List[Any], bytes]:
+    header, _, data = value.partition(b"\n")
+    return json.loads(header), data
+
+
+class RedisSaver(BaseCheckpointSaver):
+    """基于 Redis 的检查点存储，多个服务实例共享同一份会话状态，任一实例都能处理任一会话
+
+    键的布局（``prefix`` 默认为 ``lang_agent:checkpoint:``）：
+
+    - ``<prefix>threads``：所有会话ID的有序集合，分数为会话最后一次保存检查点的时间
+    - ``<prefix><thread_id>:namespaces``：会话下的 checkpoint_ns 集合
+    - ``<prefix><thread_id>:<ns>:ids``：检查点ID的有序集合（分数均为0，按ID字典序即时间顺序）
+    - ``<prefix><thread_id>:<ns>:checkpoint:<checkpoint_id>``：哈希，保存检查点、元数据和父检查点ID
+    - ``<prefix><thread_id>:<ns>:blobs``：哈希，``<channel>\\0<version>`` -> 通道值，未变化的通道不重复保存
+    - ``<prefix><thread_id>:<ns>:writes:<checkpoint_id>``：哈希，``<task_id>\\0<idx>`` -> 待写入值
+
+    每次保存（检查点或待写入值）只发送一个 MULTI/EXEC 管道，读取一个检查点最多三次往返。
+    ``ttl`` 大于0时，会话的键在最后一次写入 ``ttl`` 秒后过期，
+    ``<prefix>threads`` 中已过期的会话在保存检查点时清除，列出会话时也不再返回。
+
+    ``client`` 可传入已有的 ``redis.Redis`` 兼容客户端（例如测试用的 ``fakeredis.FakeRedis()``），
+    客户端不能开启 ``decode_responses``。异步方法在线程池中调用同步客户端。
+    """
+
+    def __init__(
+        self,
+        url: str = DEFAULT_REDIS_URL,
+        prefix: str = DEFAULT_PREFIX,
+        ttl: float = 0,
+        client: Optional[Any] = None,
+        *,
+        serde: Optional[SerializerProtocol] = None,
+    ) -> None:
+        super().__init__(serde=serde)
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ImportError(
+                    "Redis checkpointer requires the 'redis' package. "
+                    "Install it with `pip install redis` or use CHECKPOINTER=memory."
+                )
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.ttl = int(ttl)
+
+    # --- 键 ---
+    def _threads_key(self) -> str:
+        return f"{self.prefix}threads"
+
+    def _namespaces_key(self, thread_id: str) -> str:
+        return f"{self.prefix}{thread_id}:namespaces"
+
+    def _ids_key(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self.prefix}{thread_id}:{checkpoint_ns}:ids"
+
+    def _checkpoint_key(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"{self.prefix}{thread_id}:{checkpoint_ns}:checkpoint:{checkpoint_id}"
+
+    def _blobs_key(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self.prefix}{thread_id}:{checkpoint_ns}:blobs"
+
+    def _writes_key(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"{self.prefix}{thread_id}:{checkpoint_ns}:writes:{checkpoint_id}"
+
+    # --- 读取 ---
+    def _loads(self, value: bytes) -> Any:
+        (type_,), data = _unpack(value)
+        return self.serde.loads_typed((type_, data))
+
+    def _dumps(self, value: Any, *header: Any) -> bytes:
+        type_, data = self.serde.dumps_typed(value)
+        return _pack([type_, *header], data)
+
+    def _fetch_checkpoints(self, thread_id: str, checkpoint_ns: str, checkpoint_ids: Sequence[str]) -> List[Dict[bytes, bytes]]:
+        pipe = self.client.pipeline(transaction=False)
+        for checkpoint_id in checkpoint_ids:
+            pipe.hgetall(self._checkpoint_key(thread_id, checkpoint_ns, checkpoint_id))
+        return pipe.execute()
+
+    def _build_tuples(
+        self, thread_id: str, checkpoint_ns: str, saved: List[Tuple[str, Dict[bytes, bytes], CheckpointMetadata]]
+    ) -> List[CheckpointTuple]:
+        """一次管道读取所有检查点的通道值和待写入值，组装成 CheckpointTuple"""
+        checkpoints = [self._loads(stored[b"checkpoint"]) for _, stored, _ in saved]
+        blobs_key = self._blobs_key(thread_id, checkpoint_ns)
+        pipe = self.client.pipeline(transaction=False)
+        for (checkpoint_id, _, _), checkpoint in zip(saved, checkpoints):
+            versions = checkpoint["channel_versions"]
+            pipe.hmget(blobs_key, [f"{channel}\0{version}" for channel, version in versions.items()] or ["\0"])
+            pipe.hgetall(self._writes_key(thread_id, checkpoint_ns, checkpoint_id))
+        results = pipe.execute()
+
+        tuples = []
+        for i, ((checkpoint_id, stored, metadata), checkpoint) in enumerate(zip(saved, checkpoints)):
+            blobs, writes = results[2 * i], results[2 * i + 1]
+            channel_values = {}
+            for channel, blob in zip(checkpoint["channel_versions"], blobs):
+                if blob is None:
+                    continue
+                (type_,), data = _unpack(blob)
+                if type_ != "empty":
+                    channel_values[channel] = self.serde.loads_typed((type_, data))
+            ordered = []
+            for field, value in writes.items():
+                (type_, task_id, channel, task_path), data = _unpack(value)
+                idx = int(field.decode("utf-8").rpartition("\0")[2])
+                ordered.append((writes_sort_key(task_path, task_id, idx), task_id, channel, (type_, data)))
+            ordered.sort(key=lambda write: write[0])
+            pending_writes = [(task_id, channel, self.serde.loads_typed(value)) for _, task_id, channel, value in ordered]
+            parent_checkpoint_id = stored.get(b"parent", b"").decode("utf-8")
+            tuples.append(CheckpointTuple(
+                config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+                checkpoint={**checkpoint, "channel_values": channel_values},
+                metadata=metadata,
+                pending_writes=pending_writes,
+                parent_config=(
+                    {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+                    if parent_checkpoint_id
+                    else None
+                ),
+            ))
+        return tuples
+
+    def get_latest_checkpoint_id(self, thread_id: str, checkpoint_ns: str = "") -> Optional[str]:
+        """最新检查点的ID，只读取有序集合，不读取检查点内容"""
+        latest = self.client.zrevrange(self._ids_key(thread_id, checkpoint_ns), 0, 0)
+        return latest[0].decode("utf-8") if latest else None
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """读取指定检查点；配置中没有 checkpoint_id 时读取该会话最新的检查点"""
+        thread_id: str = config["configurable"]["thread_id"]
+        checkpoint_ns: str = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            checkpoint_id = self.get_latest_checkpoint_id(thread_id, checkpoint_ns)
+            if checkpoint_id is None:
+                return None
+        stored = self._fetch_checkpoints(thread_id, checkpoint_ns, [checkpoint_id])[0]
+        if not stored:
+            return None
+        metadata = self._loads(stored[b"metadata"])
+        return self._build_tuples(thread_id, checkpoint_ns, [(checkpoint_id, stored, metadata)])[0]
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """按时间倒序列出检查点，可按元数据、before 和 limit 过滤"""
+        if config:
+            thread_ids = [config["configurable"]["thread_id"]]
+        else:
+            oldest = time.time() - self.ttl if self.ttl > 0 else "-inf"
+            thread_ids = sorted(t.decode("utf-8") for t in self.client.zrangebyscore(self._threads_key(), oldest, "+inf"))
+        config_checkpoint_ns = config["configurable"].get("checkpoint_ns") if config else None
+        config_checkpoint_id = get_checkpoint_id(config) if config else None
+        before_checkpoint_id = get_checkpoint_id(before) if before else None
+
+        for thread_id in thread_ids:
+            if config_checkpoint_ns is not None:
+                namespaces = [config_checkpoint_ns]
+            else:
+                namespaces = sorted(ns.decode("utf-8") for ns in self.client.smembers(self._namespaces_key(thread_id)))
+            for checkpoint_ns in namespaces:
+                if limit is not None and limit <= 0:
+                    return
+                if config_checkpoint_id:
+                    checkpoint_ids = [config_checkpoint_id]
+                else:
+                    upper = f"({before_checkpoint_id}" if before_checkpoint_id else "+"
+                    checkpoint_ids = [
+                        i.decode("utf-8")
+                        for i in self.client.zrevrangebylex(self._ids_key(thread_id, checkpoint_ns), upper, "-")
+                    ]
+                if before_checkpoint_id:
+                    checkpoint_ids = [i for i in checkpoint_ids if i < before_checkpoint_id]
+
+                # 分页读取，limit 较小时不必取回全部检查点
+                page_size = min(max(limit, 1), LIST_PAGE_SIZE) if limit is not None and not filter else LIST_PAGE_SIZE
+                for start in range(0, len(checkpoint_ids), page_size):
+                    if limit is not None and limit <= 0:
+                        return
+                    page = checkpoint_ids[start:start + page_size]
+                    selected = []
+                    for checkpoint_id, stored in zip(page, self._fetch_checkpoints(thread_id, checkpoint_ns, page)):
+                        if not stored:
+                            continue
+                        metadata = self._loads(stored[b"metadata"])
+                        if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                            continue
+                        selected.append((checkpoint_id, stored, metadata))
+                        if limit is not None and len(selected) >= limit:
+                            break
+                    if limit is not None:
+                        limit -= len(selected)
+                    if selected:
+                        yield from self._build_tuples(thread_id, checkpoint_ns, selected)
+
+    # --- 写入 ---
+    def _expire(self, pipe: Any, *keys: str) -> None:
+        if self.ttl > 0:
+            for key in keys:
+                pipe.expire(key, self.ttl)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """保存检查点，只写入本次有新版本的通道值"""
+        c = checkpoint.copy()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        values: Dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+        blobs = {
+            f"{channel}\0{version}": (
+                self._dumps(values[channel]) if channel in values else _pack(["empty"], b"")
+            )
+            for channel, version in new_versions.items()
+        }
+        checkpoint_key = self._checkpoint_key(thread_id, checkpoint_ns, checkpoint["id"])
+        ids_key = self._ids_key(thread_id, checkpoint_ns)
+        blobs_key = self._blobs_key(thread_id, checkpoint_ns)
+        namespaces_key = self._namespaces_key(thread_id)
+
+        pipe = self.client.pipeline()
+        if blobs:
+            pipe.hset(blobs_key, mapping=blobs)
+        pipe.hset(checkpoint_key, mapping={
+            "checkpoint": self._dumps(c),
+            "metadata": self._dumps(get_checkpoint_metadata(config, metadata)),
+            "parent": config["configurable"].get("checkpoint_id") or "",
+        })
+        # 最后登记检查点ID，其他实例看到ID时检查点内容已经写入
+        pipe.zadd(ids_key, {checkpoint["id"]: 0})
+        pipe.sadd(namespaces_key, checkpoint_ns)
+        now = time.time()
+        pipe.zadd(self._threads_key(), {thread_id: now})
+        if self.ttl > 0:
+            pipe.zremrangebyscore(self._threads_key(), "-inf", now - self.ttl)
+        self._expire(pipe, checkpoint_key, ids_key, blobs_key, namespaces_key, self._threads_key())
+        pipe.execute()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """保存某个任务的待写入值；普通写入已存在时不覆盖，特殊通道（错误、中断等）总是覆盖"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        writes_key = self._writes_key(thread_id, checkpoint_ns, checkpoint_id)
+        pipe = self.client.pipeline()
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            field = f"{task_id}\0{idx}"
+            packed = self._dumps(value, task_id, channel, task_path)
+            if idx >= 0:
+                pipe.hsetnx(writes_key, field, packed)
+            else:
+                pipe.hset(writes_key, field, packed)
+        self._expire(pipe, writes_key)
+        pipe.execute()
+
+    def delete_thread(self, thread_id: str) -> None:
+        """删除会话的所有检查点、通道值和待写入值"""
+        namespaces = [ns.decode("utf-8") for ns in self.client.smembers(self._namespaces_key(thread_id))]
+        id_pipe = self.client.pipeline(transaction=False)
+        for checkpoint_ns in namespaces:
+            id_pipe.zrange(self._ids_key(thread_id, checkpoint_ns), 0, -1)
+        checkpoint_ids = id_pipe.execute()
+
+        pipe = self.client.pipeline()
+        for checkpoint_ns, ids in zip(namespaces, checkpoint_ids):
+            keys = [self._ids_key(thread_id, checkpoint_ns), self._blobs_key(thread_id, checkpoint_ns)]
+            for checkpoint_id in ids:
+                checkpoint_id = checkpoint_id.decode("utf-8")
+                keys.append(self._checkpoint_key(thread_id, checkpoint_ns, checkpoint_id))
+                keys.append(self._writes_key(thread_id, checkpoint_ns, checkpoint_id))
+            pipe.delete(*keys)
+        pipe.delete(self._namespaces_key(thread_id))
+        pipe.zrem(self._threads_key(), thread_id)
+        pipe.execute()
+
+    # --- 异步接口：在线程池中执行同步方法，不阻塞事件循环 ---
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # 与 InMemorySaver 相同的版本格式，两种存储可以互换
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class MemorySaverWithLatest(InMemorySaver):
+    """进程内存中的检查点存储，另外记录每个会话最新的检查点ID
+
+    提供与 RedisSaver 相同的 ``get_latest_checkpoint_id``，
+    调用方不需要读取 InMemorySaver 内部的存储结构。
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # (thread_id, checkpoint_ns) -> 最新检查点ID
+        self._latest: Dict[Tuple[str, str], str] = {}
+
+    def get_latest_checkpoint_id(self, thread_id: str, checkpoint_ns: str = "") -> Optional[str]:
+        return self._latest.get((thread_id, checkpoint_ns))
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        key = (saved["configurable"]["thread_id"], saved["configurable"].get("checkpoint_ns", ""))
+        # 检查点ID按字典序即时间顺序
+        self._latest[key] = max(self._latest.get(key, ""), checkpoint["id"])
+        return saved
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        for key in [key for key in self._latest if key[0] == thread_id]:
+            del self._latest[key]
+
+
+def create_checkpointer(kind: str = "memory", **options: Any) -> BaseCheckpointSaver:
+    """创建检查点存储
+
+    Args:
+        kind: memory（进程内存，仅单实例）或 redis（多个实例共享）
+        **options: 传给 RedisSaver 的参数（url、prefix、ttl、client）
+    """
+    if kind == "memory":
+        return MemorySaverWithLatest()
+    if kind == "redis":
+        return RedisSaver(**options)
+    raise ValueError(f"不支持的检查点存储: {kind}")
@@ -44,6 +44,24 @@ if LANGCHAIN_TRACING_V2 and not LANGCHAIN_API_KEY:
     print("⚠️ 警告: LANGCHAIN_TRACING_V2 已启用但未设置 LANGCHAIN_API_KEY")
     print("   LangSmith追踪可能无法正常工作，建议设置API Key或禁用追踪")
 
+# 工具提供器初始化配置
+# 每个提供器初始化的最长等待时间（秒），非关键提供器超时后转入后台加载
+TOOL_PROVIDER_INIT_TIMEOUT = float(os.getenv("TOOL_PROVIDER_INIT_TIMEOUT", "5"))
+# MCP工具列表缓存时间（秒），过期后在后台刷新；0 表示不缓存
+MCP_TOOLS_CACHE_TTL = float(os.getenv("MCP_TOOLS_CACHE_TTL", "300"))
+# 每个MCP服务器维持的常驻会话数，0 表示每次调用都新建会话
+MCP_SESSION_POOL_SIZE = int(os.getenv("MCP_SESSION_POOL_SIZE", "2"))
+# 常驻会话的健康检查（ping）间隔（秒）
+MCP_HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "30"))
+# 单次MCP工具调用的最长时间（秒）
+MCP_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "30"))
+# 每个MCP服务的最大并发调用数，排队超过 MCP_BULKHEAD_MAX_WAIT 秒的调用直接返回错误
+MCP_MAX_CONCURRENCY = int(os.getenv("MCP_MAX_CONCURRENCY", "10"))
+MCP_BULKHEAD_MAX_WAIT = float(os.getenv("MCP_BULKHEAD_MAX_WAIT", "1"))
+# 连续失败多少次后熔断，熔断后多少秒尝试恢复
+MCP_FAILURE_THRESHOLD = int(os.getenv("MCP_FAILURE_THRESHOLD", "5"))
+MCP_RECOVERY_TIMEOUT = float(os.getenv("MCP_RECOVERY_TIMEOUT", "30"))
+
 # MCP工具配置
 MCP_SERVICES = {
     "amap": {
@@ -52,10 +70,168 @@ MCP_SERVICES = {
         "url": os.getenv("AMAP_URL", "https://mcp.amap.com/sse"),
         "transport": "sse",
         "name": "amap-service",
-        "description": "高德地图服务"
+        "description": "高德地图服务",
+        "critical": os.getenv("AMAP_CRITICAL", "false").lower() == "true",
+        "init_timeout": float(os.getenv("AMAP_INIT_TIMEOUT", str(TOOL_PROVIDER_INIT_TIMEOUT))),
+        "tools_cache_ttl": MCP_TOOLS_CACHE_TTL,
+        "session_pool_size": MCP_SESSION_POOL_SIZE,
+        "health_check_interval": MCP_HEALTH_CHECK_INTERVAL,
+        "call_timeout": MCP_CALL_TIMEOUT,
+        "max_concurrency": MCP_MAX_CONCURRENCY,
+        "bulkhead_max_wait": MCP_BULKHEAD_MAX_WAIT,
+        "failure_threshold": MCP_FAILURE_THRESHOLD,
+        "recovery_timeout": MCP_RECOVERY_TIMEOUT
+    }
+}
+
+# 会话状态（检查点）存储：memory（进程内存，仅单实例）或 redis（多个服务实例共享，任一实例可处理任一会话）
+CHECKPOINTER = os.getenv("CHECKPOINTER", "memory").lower()
+# Redis 连接地址，检查点存储和 redis 轨迹存储默认共用
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# 检查点在 Redis 中的键前缀，以及会话最后一次写入后保留的秒数，0 表示永久保留
+CHECKPOINT_REDIS_PREFIX = os.getenv("CHECKPOINT_REDIS_PREFIX", "lang_agent:checkpoint:")
+CHECKPOINT_TTL = float(os.getenv("CHECKPOINT_TTL", "0"))
+
+# /threads/{thread_id}/messages 按检查点缓存格式化后的消息，最多缓存的检查点数
+THREAD_HISTORY_CACHE_SIZE = int(os.getenv("THREAD_HISTORY_CACHE_SIZE", "256"))
+# 缓存的消息总条数上限，超过时淘汰最久未用的检查点
+THREAD_HISTORY_CACHE_MESSAGES = int(os.getenv("THREAD_HISTORY_CACHE_MESSAGES", "20000"))
+
+CHECKPOINTER_OPTIONS = {
+    "redis": {
+        "url": REDIS_URL,
+        "prefix": CHECKPOINT_REDIS_PREFIX,
+        "ttl": CHECKPOINT_TTL
     }
 }
 
+# 轨迹记录配置
+TRAJECTORY_DIR = os.getenv("TRAJECTORY_DIR", "./trajectories")
+# 存储方式：file（每个会话一个JSONL文件）、segmented（多会话共用压缩分段文件）、otlp（导出到 OpenTelemetry Collector）或 redis（写入 Redis Stream，多实例共享）
+TRAJECTORY_BACKEND = os.getenv("TRAJECTORY_BACKEND", "file").lower()
+# 轨迹事件先进入内存队列，按此间隔（秒）批量写入文件
+TRAJECTORY_FLUSH_INTERVAL = float(os.getenv("TRAJECTORY_FLUSH_INTERVAL", "0.2"))
+TRAJECTORY_MAX_BATCH_SIZE = int(os.getenv("TRAJECTORY_MAX_BATCH_SIZE", "1000"))
+# 同时保持打开的轨迹文件数量上限
+TRAJECTORY_MAX_OPEN_FILES = int(os.getenv("TRAJECTORY_MAX_OPEN_FILES", "64"))
+# 落盘策略：never（交给操作系统）或 batch（每批写入后 fsync）
+TRAJECTORY_FSYNC = os.getenv("TRAJECTORY_FSYNC", "never").lower()
+# 分段存储：压缩算法（gzip / zstd / none）、单个分段的大小上限（字节）和时长上限（秒）
+TRAJECTORY_COMPRESSION = os.getenv("TRAJECTORY_COMPRESSION", "gzip").lower()
+TRAJECTORY_SEGMENT_MAX_BYTES = int(os.getenv("TRAJECTORY_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+TRAJECTORY_SEGMENT_MAX_AGE = float(os.getenv("TRAJECTORY_SEGMENT_MAX_AGE", "3600"))
+# 分段保留策略：总大小上限（字节）和保留天数，0 表示不限制
+TRAJECTORY_RETENTION_BYTES = int(os.getenv("TRAJECTORY_RETENTION_BYTES", "0"))
+TRAJECTORY_RETENTION_DAYS = float(os.getenv("TRAJECTORY_RETENTION_DAYS", "0"))
+# 写入时维护 index.sqlite3 索引（会话、trace、事件类型、时间 -> 文件位置），查看器据此直接定位事件
+TRAJECTORY_INDEX = os.getenv("TRAJECTORY_INDEX", "true").lower() == "true"
+# 不小于此字节数的消息内容、工具调用和工具输出按内容哈希只存一份（blobs/ 目录），事件中只保存引用；0 表示不启用
+TRAJECTORY_BLOB_THRESHOLD = int(os.getenv("TRAJECTORY_BLOB_THRESHOLD", "4096"))
+# 轨迹钩子的待记录队列长度，以及队列满时的处理方式：drop（丢弃）、sample（半满后按比例采样）、block（等待）
+TRAJECTORY_HOOK_QUEUE_SIZE = int(os.getenv("TRAJECTORY_HOOK_QUEUE_SIZE", "10000"))
+TRAJECTORY_HOOK_OVERFLOW = os.getenv("TRAJECTORY_HOOK_OVERFLOW", "drop").lower()
+# 轨迹钩子最多跟踪的会话数，以及会话空闲多少秒后释放其跟踪状态
+TRAJECTORY_MAX_SESSIONS = int(os.getenv("TRAJECTORY_MAX_SESSIONS", "10000"))
+TRAJECTORY_SESSION_IDLE_TTL = float(os.getenv("TRAJECTORY_SESSION_IDLE_TTL", "3600"))
+# 记录请求、节点、模型调用和工具调用的耗时 span（含 token 用量和状态）
+TRAJECTORY_SPANS = os.getenv("TRAJECTORY_SPANS", "true").lower() == "true"
+# otlp 存储方式：导出到 OpenTelemetry Collector 的 OTLP/HTTP 地址（file:// 开头时写入本地文件，用于测试）
+TRAJECTORY_OTLP_ENDPOINT = os.getenv("TRAJECTORY_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+# 额外的请求头，格式：key1=value1,key2=value2（例如鉴权信息）
+TRAJECTORY_OTLP_HEADERS = dict(
+    item.split("=", 1) for item in os.getenv("TRAJECTORY_OTLP_HEADERS", "").split(",") if "=" in item
+)
+TRAJECTORY_OTLP_SERVICE_NAME = os.getenv("TRAJECTORY_OTLP_SERVICE_NAME", "lang-agent")
+TRAJECTORY_OTLP_TIMEOUT = float(os.getenv("TRAJECTORY_OTLP_TIMEOUT", "10"))
+TRAJECTORY_OTLP_MAX_RETRIES = int(os.getenv("TRAJECTORY_OTLP_MAX_RETRIES", "5"))
+# 等待导出的事件上限，超过后按 TRAJECTORY_OTLP_OVERFLOW 处理：drop（丢弃）、block（等待）
+TRAJECTORY_OTLP_MAX_PENDING = int(os.getenv("TRAJECTORY_OTLP_MAX_PENDING", "10000"))
+TRAJECTORY_OTLP_OVERFLOW = os.getenv("TRAJECTORY_OTLP_OVERFLOW", "drop").lower()
+# redis 存储方式：每个会话一个 Stream，键前缀、单个 Stream 的大致长度上限和会话空闲后保留的秒数，0 表示不限制
+TRAJECTORY_REDIS_URL = os.getenv("TRAJECTORY_REDIS_URL", REDIS_URL)
+TRAJECTORY_REDIS_PREFIX = os.getenv("TRAJECTORY_REDIS_PREFIX", "lang_agent:trajectory:")
+TRAJECTORY_REDIS_MAX_STREAM_LENGTH = int(os.getenv("TRAJECTORY_REDIS_MAX_STREAM_LENGTH", "0"))
+TRAJECTORY_REDIS_TTL = float(os.getenv("TRAJECTORY_REDIS_TTL", "0"))
+# 头部采样：按会话ID哈希记录的会话比例（0-1），同一会话要么全部记录要么全部不记录
+TRAJECTORY_SAMPLE_RATE = float(os.getenv("TRAJECTORY_SAMPLE_RATE", "1.0"))
+# 尾部采样：未被头部采样选中的会话先缓存在内存中，请求结束后只保留慢请求、出错或工具调用失败的轨迹
+TRAJECTORY_TAIL_SAMPLING = os.getenv("TRAJECTORY_TAIL_SAMPLING", "false").lower() == "true"
+TRAJECTORY_TAIL_SLOW_MS = float(os.getenv("TRAJECTORY_TAIL_SLOW_MS", "10000"))
+# 未记录 span 时，请求（trace）空闲多少秒后视为结束；以及最多同时缓存的请求数
+TRAJECTORY_TAIL_TIMEOUT = float(os.getenv("TRAJECTORY_TAIL_TIMEOUT", "60"))
+TRAJECTORY_TAIL_MAX_SESSIONS = int(os.getenv("TRAJECTORY_TAIL_MAX_SESSIONS", "10000"))
+
+TRAJECTORY_SAMPLING = {
+    "sample_rate": TRAJECTORY_SAMPLE_RATE,
+    "tail": TRAJECTORY_TAIL_SAMPLING,
+    "slow_threshold_ms": TRAJECTORY_TAIL_SLOW_MS,
+    "tail_timeout": TRAJECTORY_TAIL_TIMEOUT,
+    "max_buffered_sessions": TRAJECTORY_TAIL_MAX_SESSIONS
+}
+
+# 各存储方式的参数
+TRAJECTORY_BACKENDS = {
+    "file": {
+        "flush_interval": TRAJECTORY_FLUSH_INTERVAL,
+        "max_batch_size": TRAJECTORY_MAX_BATCH_SIZE,
+        "max_open_files": TRAJECTORY_MAX_OPEN_FILES,
+        "fsync": TRAJECTORY_FSYNC,
+        "index": TRAJECTORY_INDEX,
+        "blob_threshold": TRAJECTORY_BLOB_THRESHOLD
+    },
+    "segmented": {
+        "flush_interval": TRAJECTORY_FLUSH_INTERVAL,
+        "max_batch_size": TRAJECTORY_MAX_BATCH_SIZE,
+        "fsync": TRAJECTORY_FSYNC,
+        "compression": TRAJECTORY_COMPRESSION,
+        "max_segment_bytes": TRAJECTORY_SEGMENT_MAX_BYTES,
+        "max_segment_age": TRAJECTORY_SEGMENT_MAX_AGE,
+        "retention_bytes": TRAJECTORY_RETENTION_BYTES,
+        "retention_seconds": TRAJECTORY_RETENTION_DAYS * 86400,
+        "index": TRAJECTORY_INDEX,
+        "blob_threshold": TRAJECTORY_BLOB_THRESHOLD
+    },
+    "otlp": {
+        "endpoint": TRAJECTORY_OTLP_ENDPOINT,
+        "headers": TRAJECTORY_OTLP_HEADERS,
+        "service_name": TRAJECTORY_OTLP_SERVICE_NAME,
+        "timeout": TRAJECTORY_OTLP_TIMEOUT,
+        "max_retries": TRAJECTORY_OTLP_MAX_RETRIES,
+        "max_pending": TRAJECTORY_OTLP_MAX_PENDING,
+        "overflow": TRAJECTORY_OTLP_OVERFLOW
+    },
+    "redis": {
+        "url": TRAJECTORY_REDIS_URL,
+        "prefix": TRAJECTORY_REDIS_PREFIX,
+        "max_stream_length": TRAJECTORY_REDIS_MAX_STREAM_LENGTH,
+        "ttl": TRAJECTORY_REDIS_TTL,
+        "flush_interval": TRAJECTORY_FLUSH_INTERVAL,
+        "max_batch_size": TRAJECTORY_MAX_BATCH_SIZE
+    }
+}
+
+# /chat 流式事件（stream_format 为 sse 或 ndjson）：相邻 token 合并发送的最长等待时间（秒）和最大字符数
+STREAM_COALESCE_INTERVAL = float(os.getenv("STREAM_COALESCE_INTERVAL", "0.03"))
+STREAM_COALESCE_MAX_CHARS = int(os.getenv("STREAM_COALESCE_MAX_CHARS", "512"))
+
+# 本地CPU密集型工具的执行方式：process（进程池，可限制CPU时间）、thread（线程池）、inline（在事件循环上直接执行）
+LOCAL_TOOL_EXECUTOR = os.getenv("LOCAL_TOOL_EXECUTOR", "process").lower()
+LOCAL_TOOL_WORKERS = int(os.getenv("LOCAL_TOOL_WORKERS", "2"))
+# 进程池的启动方式（fork / forkserver / spawn），留空时优先使用 forkserver
+LOCAL_TOOL_MP_CONTEXT = os.getenv("LOCAL_TOOL_MP_CONTEXT") or None
+# 单次调用的CPU时间上限（秒，仅进程池模式）和等待结果的最长时间（秒）
+LOCAL_TOOL_CPU_TIME_LIMIT = float(os.getenv("LOCAL_TOOL_CPU_TIME_LIMIT", "5"))
+LOCAL_TOOL_TIMEOUT = float(os.getenv("LOCAL_TOOL_TIMEOUT", "10"))
+# 输入总字符数上限（超过则拒绝）和输出字符数上限（超过则截断）
+LOCAL_TOOL_MAX_INPUT_CHARS = int(os.getenv("LOCAL_TOOL_MAX_INPUT_CHARS", "200000"))
+LOCAL_TOOL_MAX_OUTPUT_CHARS = int(os.getenv("LOCAL_TOOL_MAX_OUTPUT_CHARS", "20000"))
+
+# 文件读取工具：允许读取的根目录（多个用系统路径分隔符分隔，留空为启动目录）
+FILE_READER_ALLOWED_ROOTS = os.getenv("FILE_READER_ALLOWED_ROOTS", "")
+# 单次返回内容的最大字节数，以及 grep 单次最多扫描的字节数（超过后返回 next_offset 供下次继续）
+FILE_READER_MAX_OUTPUT_BYTES = int(os.getenv("FILE_READER_MAX_OUTPUT_BYTES", "16384"))
+FILE_READER_MAX_SCAN_BYTES = int(os.getenv("FILE_READER_MAX_SCAN_BYTES", str(256 * 1024 * 1024)))
+
 # 本地工具配置
 LOCAL_TOOLS = {
     "calculator": {
@@ -65,6 +241,11 @@ LOCAL_TOOLS = {
     "text_processor": {
         "enabled": os.getenv("TEXT_PROCESSOR_ENABLED", "true").lower() == "true",
         "description": "文本处理工具"
+    },
+    # 可读取 FILE_READER_ALLOWED_ROOTS 下的本地文件，默认关闭
+    "file_reader": {
+        "enabled": os.getenv("FILE_READER_ENABLED", "false").lower() == "true",
+        "description": "大文件读取工具"
     }
 }
 
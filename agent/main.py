@@ -18,6 +18,7 @@ from utils import parse_messages
 async def main():
     """主函数 - 使用新的工具提供器系统"""
     tool_provider = None
+    trajectory_recorder = None
     try:
         print("🚀 启动Agent系统...")
         
@@ -40,8 +41,13 @@ async def main():
         print(f"📋 支持的LLM提供器: {LLMFactory.get_supported_providers()}")
         
         # 创建agent（为测试独立性，禁用记忆功能）
-        trajectory_recorder = create_local_recorder() 
-        agent = create_agent(llm, tools, use_memory=False, use_trajectory=True, trajectory_recorder=trajectory_recorder)
+        trajectory_recorder = create_local_recorder(
+            config.TRAJECTORY_DIR,
+            backend=config.TRAJECTORY_BACKEND,
+            sampling=config.TRAJECTORY_SAMPLING,
+            **config.TRAJECTORY_BACKENDS.get(config.TRAJECTORY_BACKEND, {})
+        )
+        agent = create_agent(llm, tools, use_memory=False, use_trajectory=True, trajectory_recorder=trajectory_recorder, trajectory_spans=config.TRAJECTORY_SPANS)
     
         print("✅ Agent创建成功\n")
 
@@ -57,6 +63,8 @@ async def main():
         if tool_provider and hasattr(tool_provider, 'close'):
             await tool_provider.close()
             print("\n🧹 已清理工具提供器资源")
+        if trajectory_recorder is not None:
+            await trajectory_recorder.close()
             
 
 async def run_conversation_test(agent):
@@ -1,9 +1,16 @@
 """MCP客户端模块 - 重命名避免与系统mcp包冲突"""
 
-from .client import MCPClient, GenericMCPClient, MCPClientFactory
+from .client import MCPClient, GenericMCPClient, MCPClientFactory, MCPSessionPool, MCPPoolUnavailableError, MCPConnectionManager
+from .resilience import CircuitBreaker, Bulkhead, ResilienceInterceptor
 
 __all__ = [
     "MCPClient",
     "GenericMCPClient", 
-    "MCPClientFactory"
+    "MCPClientFactory",
+    "MCPSessionPool",
+    "MCPPoolUnavailableError",
+    "MCPConnectionManager",
+    "CircuitBreaker",
+    "Bulkhead",
+    "ResilienceInterceptor"
 ]
\ No newline at end of file
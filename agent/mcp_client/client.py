@@ -1,9 +1,12 @@
 """MCP客户端实现"""
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Callable, AsyncIterator
 from langchain_core.tools import BaseTool
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -25,14 +28,381 @@ class MCPClient(ABC):
         """关闭客户端连接"""
         pass
 
+class MCPPoolUnavailableError(RuntimeError):
+    """会话池在等待时间内无法提供可用会话"""
+
+class _PooledSession:
+    """会话池中的一个槽位，由专属任务持有一条长连接"""
+    
+    def __init__(self, index: int):
+        self.index = index
+        self.session = None
+        self.in_flight = 0
+        self.calls = 0
+        self.task: Optional[asyncio.Task] = None
+        # 置位后持有任务关闭当前连接并重连
+        self.reset = asyncio.Event()
+    
+    @property
+    def connected(self) -> bool:
+        return self.session is not None and not self.reset.is_set()
+
+class MCPSessionPool:
+    """单个MCP服务器的长连接会话池
+    
+    维持 size 条常驻会话，工具调用复用这些会话，单条会话最多并发承载
+    max_concurrent_per_session 个请求。后台定期ping空闲会话，失效的会话自动重连。
+    
+    MCP的会话上下文必须在同一个任务中进入和退出，因此每条会话由一个专属任务持有。
+    """
+    
+    def __init__(
+        self,
+        client: Any,
+        server_name: str,
+        size: int = 2,
+        max_concurrent_per_session: int = 8,
+        acquire_timeout: float = 10.0,
+        health_check_interval: float = 30.0,
+        ping_timeout: float = 5.0,
+        max_reconnect_delay: float = 30.0,
+    ):
+        self.client = client
+        self.server_name = server_name
+        self.size = size
+        self.max_concurrent_per_session = max_concurrent_per_session
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self.ping_timeout = ping_timeout
+        self.max_reconnect_delay = max_reconnect_delay
+        
+        self._slots = [_PooledSession(index) for index in range(size)]
+        self._condition = asyncio.Condition()
+        self._health_task: Optional[asyncio.Task] = None
+        self._started = False
+        self._closed = False
+        self._waiting = 0
+        self._reconnects = 0
+        self._ping_failures = 0
+    
+    def start(self) -> None:
+        """启动所有会话的持有任务和健康检查任务（连接在后台建立）"""
+        if self._started:
+            return
+        self._started = True
+        for slot in self._slots:
+            slot.task = asyncio.ensure_future(self._hold_session(slot))
+        if self.health_check_interval > 0:
+            self._health_task = asyncio.ensure_future(self._health_check_loop())
+    
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Any]:
+        """借出一条会话，连接层异常会使该会话重连"""
+        slot = await self._checkout()
+        try:
+            yield slot.session
+        except Exception as e:
+            if self.is_connection_error(e):
+                logger.warning(f"MCP会话 {self.server_name}#{slot.index} 调用失败，准备重连: {e}")
+                slot.reset.set()
+            raise
+        finally:
+            slot.in_flight -= 1
+            async with self._condition:
+                self._condition.notify_all()
+    
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> Any:
+        """在池化会话上执行工具调用，连接断开时换一条会话重试一次"""
+        for attempt in range(2):
+            try:
+                async with self.acquire() as session:
+                    return await session.call_tool(name, arguments)
+            except Exception as e:
+                if attempt == 0 and self.is_connection_error(e):
+                    continue
+                raise
+    
+    @staticmethod
+    def is_connection_error(error: Exception) -> bool:
+        """区分连接层异常与服务端返回的协议错误（后者不影响会话本身）"""
+        from mcp.shared.exceptions import McpError
+        from mcp.types import CONNECTION_CLOSED
+        if isinstance(error, McpError):
+            return error.error.code == CONNECTION_CLOSED
+        return True
+    
+    async def _checkout(self) -> _PooledSession:
+        if not self._started:
+            self.start()
+        if self._closed:
+            raise MCPPoolUnavailableError(f"MCP会话池 {self.server_name} 已关闭")
+        
+        async with self._condition:
+            self._waiting += 1
+            try:
+                slot = await asyncio.wait_for(
+                    self._condition.wait_for(self._pick_slot),
+                    timeout=self.acquire_timeout
+                )
+            except asyncio.TimeoutError:
+                raise MCPPoolUnavailableError(
+                    f"MCP会话池 {self.server_name} 在 {self.acquire_timeout}s 内没有可用会话"
+                )
+            finally:
+                self._waiting -= 1
+            slot.in_flight += 1
+            slot.calls += 1
+            return slot
+    
+    def _pick_slot(self) -> Optional[_PooledSession]:
+        """选择负载最低且未满的已连接会话"""
+        candidates = [
+            slot for slot in self._slots
+            if slot.connected and slot.in_flight < self.max_concurrent_per_session
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda slot: slot.in_flight)
+    
+    async def _hold_session(self, slot: _PooledSession) -> None:
+        """持有一条长连接，连接失效或被标记重置后按指数退避重连"""
+        delay = 1.0
+        while not self._closed:
+            try:
+                async with self.client.session(self.server_name) as session:
+                    slot.session = session
+                    delay = 1.0
+                    async with self._condition:
+                        self._condition.notify_all()
+                    logger.info(f"MCP会话 {self.server_name}#{slot.index} 已连接")
+                    await slot.reset.wait()
+            except asyncio.CancelledError:
+                if self._closed:
+                    break
+                # 连接的后台读写任务失败时，MCP内部的任务组会取消当前等待
+                logger.warning(f"MCP会话 {self.server_name}#{slot.index} 连接中断")
+            except Exception as e:
+                logger.warning(f"MCP会话 {self.server_name}#{slot.index} 连接失败: {e}")
+            finally:
+                slot.session = None
+                slot.reset.clear()
+            
+            if self._closed:
+                break
+            self._reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+    
+    async def _health_check_loop(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.health_check_interval)
+            for slot in self._slots:
+                # 正在承载请求的会话本身就能暴露连接问题，只检查空闲会话
+                if not slot.connected or slot.in_flight > 0:
+                    continue
+                try:
+                    await asyncio.wait_for(slot.session.send_ping(), timeout=self.ping_timeout)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._ping_failures += 1
+                    logger.warning(f"MCP会话 {self.server_name}#{slot.index} 健康检查失败，准备重连: {e}")
+                    slot.reset.set()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """会话池使用情况"""
+        connected = sum(1 for slot in self._slots if slot.connected)
+        in_flight = sum(slot.in_flight for slot in self._slots)
+        capacity = connected * self.max_concurrent_per_session
+        return {
+            "server": self.server_name,
+            "size": self.size,
+            "connected": connected,
+            "in_flight": in_flight,
+            "waiting": self._waiting,
+            "utilization": round(in_flight / capacity, 3) if capacity else None,
+            "calls": sum(slot.calls for slot in self._slots),
+            "reconnects": self._reconnects,
+            "ping_failures": self._ping_failures,
+        }
+    
+    async def close(self) -> None:
+        """关闭所有会话"""
+        self._closed = True
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for slot in self._slots:
+            slot.reset.set()
+        tasks = [slot.task for slot in self._slots if slot.task is not None]
+        if tasks:
+            await asyncio.wait(tasks, timeout=5.0)
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        async with self._condition:
+            self._condition.notify_all()
+
+class MCPConnectionManager:
+    """多个MCP服务器共享的连接管理器
+    
+    所有注册的服务器共用一个 MultiServerMCPClient，工具调用按服务器名称分发给
+    对应客户端的拦截器链。各服务器的工具名称冲突时，先注册的服务器保留原名，
+    后注册的服务器工具加上服务器名称前缀。
+    """
+    
+    def __init__(self):
+        self.connections: Dict[str, Dict[str, Any]] = {}
+        self.client = None
+        self._clients: Dict[str, "GenericMCPClient"] = {}
+        self._raw_tools: Dict[str, List[BaseTool]] = {}
+        self._tool_views: Dict[str, List[BaseTool]] = {}
+    
+    def register(self, mcp_client: "GenericMCPClient") -> Any:
+        """注册一个服务器，返回共享的 MultiServerMCPClient"""
+        from langchain_mcp_adapters.client import MultiServerMCPClient
+        
+        server_name = mcp_client.server_name
+        registered = self._clients.get(server_name)
+        if registered is not None and registered is not mcp_client:
+            raise ValueError(f"MCP服务器名称重复: {server_name}")
+        
+        self._clients[server_name] = mcp_client
+        self.connections[server_name] = mcp_client.build_connection()
+        if self.client is None:
+            # 共享同一个连接字典，后续注册的服务器对已创建的客户端立即可见
+            self.client = MultiServerMCPClient(self.connections, tool_interceptors=[self._dispatch])
+        return self.client
+    
+    def unregister(self, mcp_client: "GenericMCPClient") -> None:
+        """注销服务器
+
+        其他服务器的工具名称在各自下次刷新时更新，这里不主动通知，
+        避免关闭过程中触发其他服务器重新加载。
+        """
+        server_name = mcp_client.server_name
+        if self._clients.get(server_name) is not mcp_client:
+            return
+        del self._clients[server_name]
+        self.connections.pop(server_name, None)
+        self._raw_tools.pop(server_name, None)
+        self._tool_views.pop(server_name, None)
+        self._rebuild_views()
+    
+    @property
+    def server_names(self) -> List[str]:
+        return list(self._clients)
+    
+    async def get_all_tools(self) -> Dict[str, List[BaseTool]]:
+        """并行获取所有服务器的工具，失败的服务器记录日志后跳过"""
+        names = list(self._clients)
+        results = await asyncio.gather(
+            *(self._clients[name].get_tools() for name in names),
+            return_exceptions=True
+        )
+        all_tools = {}
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                logger.error(f"获取MCP服务器 {name} 的工具失败: {result}")
+                continue
+            all_tools[name] = result
+        return all_tools
+    
+    def resolve_tools(self, server_name: str, tools: List[BaseTool]) -> List[BaseTool]:
+        """记录服务器的原始工具列表，返回名称去重后的视图"""
+        self._raw_tools[server_name] = tools
+        renamed = [name for name in self._rebuild_views() if name != server_name]
+        self._notify_renamed(renamed)
+        return self._tool_views.get(server_name, tools)
+    
+    def _rebuild_views(self) -> List[str]:
+        """按注册顺序重新计算各服务器的工具名称，返回名称发生变化的服务器"""
+        owners: Dict[str, str] = {}
+        for server_name in self._clients:
+            for tool in self._raw_tools.get(server_name, []):
+                owners.setdefault(tool.name, server_name)
+        
+        changed = []
+        for server_name in self._clients:
+            if server_name not in self._raw_tools:
+                continue
+            view = [
+                tool if owners[tool.name] == server_name else self._prefixed(server_name, tool)
+                for tool in self._raw_tools[server_name]
+            ]
+            previous = self._tool_views.get(server_name)
+            if previous is not None and [t.name for t in previous] != [t.name for t in view]:
+                changed.append(server_name)
+            self._tool_views[server_name] = view
+        return changed
+    
+    @staticmethod
+    def _prefixed(server_name: str, tool: BaseTool) -> BaseTool:
+        """复制一个带服务器前缀的工具，实际调用仍使用MCP服务器上的原始名称"""
+        prefixed = tool.model_copy(update={"name": f"{server_name}_{tool.name}"})
+        logger.debug(f"MCP工具名称冲突，{server_name} 的 {tool.name} 重命名为 {prefixed.name}")
+        return prefixed
+    
+    def _notify_renamed(self, server_names: List[str]) -> None:
+        for server_name in server_names:
+            self._clients[server_name].on_tool_names_changed(self._tool_views[server_name])
+    
+    def conflict_count(self, server_name: str) -> int:
+        """该服务器被加上前缀的工具数量"""
+        raw = self._raw_tools.get(server_name, [])
+        view = self._tool_views.get(server_name, [])
+        return sum(1 for original, resolved in zip(raw, view) if original.name != resolved.name)
+    
+    async def _dispatch(self, request: Any, handler: Callable) -> Any:
+        """共享客户端的拦截器：转交给请求所属服务器的拦截器链"""
+        mcp_client = self._clients.get(request.server_name)
+        if mcp_client is None:
+            return await handler(request)
+        return await mcp_client.intercept(request, handler)
+    
+    async def close(self) -> None:
+        """关闭所有已注册的服务器"""
+        clients = list(self._clients.values())
+        await asyncio.gather(*(mcp_client.close() for mcp_client in clients), return_exceptions=True)
+
 class GenericMCPClient(MCPClient):
-    """通用MCP客户端实现"""
+    """通用MCP客户端实现
+    
+    工具列表按 tools_cache_ttl（秒）缓存：缓存过期后先返回旧列表，同时在后台刷新；
+    tools_cache_ttl 为0时不缓存，每次都请求MCP服务器。
+    
+    session_pool_size 大于0时，工具列表和工具调用都复用会话池中的长连接；
+    会话池暂时不可用时退回到每次调用新建会话。
+    
+    tool_interceptors 为额外的工具调用拦截器，按顺序包裹在会话池调用之外。
+    
+    传入 connection_manager 时与其他服务器共享同一个连接管理器，否则单独使用一个。
+    """
     
-    def __init__(self, config: Dict[str, Any]):
+    # 默认的工具列表缓存时间（秒）
+    DEFAULT_TOOLS_CACHE_TTL = 300.0
+    # 默认的常驻会话数
+    DEFAULT_SESSION_POOL_SIZE = 2
+    
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        tool_interceptors: Optional[List[Callable]] = None,
+        connection_manager: Optional[MCPConnectionManager] = None,
+    ):
         self.config = config
         self.client = None
+        self.tool_interceptors = list(tool_interceptors or [])
+        self.connection_manager = connection_manager or MCPConnectionManager()
         self._initialized = False
         self._validate_config()
+        self.tools_cache_ttl = float(self.config.get("tools_cache_ttl", self.DEFAULT_TOOLS_CACHE_TTL))
+        self._tools_cache: Optional[List[BaseTool]] = None
+        self._tools_cached_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._tools_listeners: List[Callable[[List[BaseTool]], Any]] = []
+        self.server_name = self.config.get("name", f"mcp-server-{hash(self.config['url'])}")
+        self.session_pool: Optional[MCPSessionPool] = None
+        self._pool_fallbacks = 0
     
     def _validate_config(self):
         """验证配置参数"""
@@ -45,26 +415,19 @@ class GenericMCPClient(MCPClient):
             return
             
         try:
-            from langchain_mcp_adapters.client import MultiServerMCPClient
-            
-            # 构建客户端配置
-            server_name = self.config.get("name", f"mcp-server-{hash(self.config['url'])}")
-            transport_type = self.config.get("transport", "sse")
-            
-            client_config = {
-                server_name: {
-                    "url": self.config["url"],
-                    "transport": transport_type,
-                }
-            }
+            server_name = self.server_name
+            self.client = self.connection_manager.register(self)
             
-            # 添加可选配置
-            if "headers" in self.config:
-                client_config[server_name]["headers"] = self.config["headers"]
-            if "timeout" in self.config:
-                client_config[server_name]["timeout"] = self.config["timeout"]
-            
-            self.client = MultiServerMCPClient(client_config)
+            pool_size = int(self.config.get("session_pool_size", self.DEFAULT_SESSION_POOL_SIZE))
+            if pool_size > 0:
+                self.session_pool = MCPSessionPool(
+                    self.client,
+                    server_name,
+                    size=pool_size,
+                    max_concurrent_per_session=int(self.config.get("max_concurrent_per_session", 8)),
+                    health_check_interval=float(self.config.get("health_check_interval", 30.0)),
+                )
+                self.session_pool.start()
             self._initialized = True
             logger.info(f"成功初始化MCP客户端: {server_name}")
             
@@ -75,27 +438,177 @@ class GenericMCPClient(MCPClient):
             logger.error(f"初始化MCP客户端失败: {e}")
             raise
     
+    def build_connection(self) -> Dict[str, Any]:
+        """构建该服务器的连接配置"""
+        connection = {
+            "url": self.config["url"],
+            "transport": self.config.get("transport", "sse"),
+        }
+        
+        # 添加可选配置
+        if "headers" in self.config:
+            connection["headers"] = self.config["headers"]
+        if "timeout" in self.config:
+            connection["timeout"] = self.config["timeout"]
+        return connection
+    
+    async def intercept(self, request: Any, handler: Callable) -> Any:
+        """依次经过额外拦截器和会话池执行工具调用"""
+        call = handler
+        for interceptor in reversed([*self.tool_interceptors, self._call_tool_with_pool]):
+            call = self._wrap_interceptor(interceptor, call)
+        return await call(request)
+    
+    @staticmethod
+    def _wrap_interceptor(interceptor: Callable, handler: Callable) -> Callable:
+        async def call(request: Any) -> Any:
+            return await interceptor(request, handler)
+        return call
+    
     async def get_tools(self) -> List[BaseTool]:
-        """获取工具列表"""
+        """获取工具列表，优先使用缓存"""
         if not self._initialized:
             await self.initialize()
         
+        if self._tools_cache is None or self.tools_cache_ttl <= 0:
+            return await self.refresh_tools()
+        
+        if self.is_tools_cache_stale():
+            self._schedule_refresh()
+        return self._tools_cache
+    
+    def is_tools_cache_stale(self) -> bool:
+        """缓存是否已超过TTL"""
+        return time.monotonic() - self._tools_cached_at >= self.tools_cache_ttl
+    
+    async def refresh_tools(self) -> List[BaseTool]:
+        """从MCP服务器重新获取工具列表，并发调用共享同一次请求"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._fetch_tools())
+        return await asyncio.shield(self._refresh_task)
+    
+    def add_tools_listener(self, listener: Callable[[List[BaseTool]], Any]) -> None:
+        """注册监听器，后台刷新发现工具列表变化时回调"""
+        self._tools_listeners.append(listener)
+    
+    def _schedule_refresh(self) -> None:
+        """在后台刷新缓存，失败时保留旧缓存"""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.ensure_future(self._fetch_tools())
+        self._refresh_task.add_done_callback(self._on_background_refresh_done)
+    
+    @staticmethod
+    def _on_background_refresh_done(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"后台刷新MCP工具失败，继续使用缓存: {task.exception()}")
+    
+    async def _fetch_tools(self) -> List[BaseTool]:
         try:
-            tools = await self.client.get_tools()
+            tools = await self._list_tools()
             logger.info(f"成功获取 {len(tools)} 个MCP工具")
-            return tools
         except Exception as e:
             logger.error(f"获取MCP工具失败: {e}")
             raise
+        
+        tools = self.connection_manager.resolve_tools(self.server_name, tools)
+        previous = self._tools_cache
+        self._tools_cache = tools
+        self._tools_cached_at = time.monotonic()
+        if previous is not None and self._tool_signature(previous) != self._tool_signature(tools):
+            logger.info("MCP工具列表已变化")
+            self._notify_tools_listeners(tools)
+        return tools
     
-    async def close(self) -> None:
-        """关闭客户端连接"""
-        if self.client and hasattr(self.client, 'close'):
+    def on_tool_names_changed(self, tools: List[BaseTool]) -> None:
+        """其他服务器的工具变化导致本服务器的工具被重命名时由连接管理器调用"""
+        if self._tools_cache is None:
+            return
+        self._tools_cache = tools
+        self._notify_tools_listeners(tools)
+    
+    def _notify_tools_listeners(self, tools: List[BaseTool]) -> None:
+        for listener in self._tools_listeners:
             try:
-                await self.client.close()
-                logger.info("MCP客户端连接已关闭")
+                listener(tools)
             except Exception as e:
-                logger.warning(f"关闭MCP客户端时出现警告: {e}")
+                logger.warning(f"MCP工具监听器执行失败: {e}")
+    
+    @staticmethod
+    def _tool_signature(tools: List[BaseTool]) -> List[tuple]:
+        return [(tool.name, tool.description) for tool in tools]
+    
+    async def _list_tools(self) -> List[BaseTool]:
+        """列出工具，有会话池时复用池中的会话"""
+        if self.session_pool is None:
+            return await self.client.get_tools(server_name=self.server_name)
+        
+        from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+        
+        try:
+            async with self.session_pool.acquire() as session:
+                mcp_tools = []
+                cursor = None
+                while True:
+                    page = await session.list_tools(cursor=cursor)
+                    mcp_tools.extend(page.tools)
+                    cursor = page.nextCursor
+                    if not cursor:
+                        break
+        except MCPPoolUnavailableError as e:
+            logger.warning(f"{e}，改用临时会话获取工具")
+            self._pool_fallbacks += 1
+            return await self.client.get_tools(server_name=self.server_name)
+        
+        # 工具绑定连接配置而不是具体会话，实际调用由拦截器转发到会话池
+        return [
+            convert_mcp_tool_to_langchain_tool(
+                None,
+                tool,
+                connection=self.client.connections[self.server_name],
+                callbacks=self.client.callbacks,
+                tool_interceptors=self.client.tool_interceptors,
+                server_name=self.server_name,
+            )
+            for tool in mcp_tools
+        ]
+    
+    async def _call_tool_with_pool(self, request: Any, handler: Callable) -> Any:
+        """工具调用拦截器：优先在池化会话上执行，会话池不可用时新建临时会话"""
+        # 修改了请求头的调用需要独立连接
+        if self.session_pool is None or request.headers:
+            return await handler(request)
+        try:
+            return await self.session_pool.call_tool(request.name, request.args)
+        except MCPPoolUnavailableError as e:
+            logger.warning(f"{e}，改用临时会话调用工具 {request.name}")
+            self._pool_fallbacks += 1
+            return await handler(request)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """工具缓存与会话池的使用情况"""
+        stats = {
+            "tools_cached": self._tools_cache is not None,
+            "tools_cache_stale": self._tools_cache is not None and self.is_tools_cache_stale(),
+            "pool_fallbacks": self._pool_fallbacks,
+            "renamed_tools": self.connection_manager.conflict_count(self.server_name),
+        }
+        if self.session_pool is not None:
+            stats["session_pool"] = self.session_pool.get_stats()
+        return stats
+    
+    async def close(self) -> None:
+        """关闭客户端连接"""
+        if self.session_pool is not None:
+            await self.session_pool.close()
+            self.session_pool = None
+        if self.client is not None:
+            self.connection_manager.unregister(self)
+            self.client = None
+            logger.info(f"MCP客户端连接已关闭: {self.server_name}")
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        self._tools_cache = None
         self._initialized = False
 
 class MCPClientFactory:
@@ -106,7 +619,7 @@ class MCPClientFactory:
     }
     
     @classmethod
-    def create_client(cls, config: Dict[str, Any]) -> MCPClient:
+    def create_client(cls, config: Dict[str, Any], **kwargs) -> MCPClient:
         """根据配置创建MCP客户端"""
         if not isinstance(config, dict):
             raise ValueError("配置必须是字典类型")
@@ -118,7 +631,7 @@ class MCPClientFactory:
             raise ValueError(f"不支持的MCP客户端类型: {client_type}。支持的类型: {supported_types}")
         
         client_class = cls._client_types[client_type]
-        return client_class(config)
+        return client_class(config, **kwargs)
     
     @classmethod
     def get_supported_types(cls) -> List[str]:
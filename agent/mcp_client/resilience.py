@@ -0,0 +1,248 @@
+"""MCP服务的容错组件：熔断器、舱壁隔离与调用超时"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于打开状态，调用被直接拒绝"""
+
+class BulkheadFullError(RuntimeError):
+    """并发已满且排队超时，调用被拒绝"""
+
+class CircuitBreaker:
+    """熔断器
+
+    连续失败达到 failure_threshold 次后打开，打开期间直接拒绝调用；
+    经过 recovery_timeout 秒后进入半开状态，放行最多 half_open_max_calls 个试探调用，
+    试探成功则关闭，失败则重新打开。
+
+    状态变化通过返回值 (旧状态, 新状态) 告知调用方，便于调用方结合调用上下文记录。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._half_open_calls = 0
+        # 每次状态变化加一，用于判断试探名额是否属于当前这次半开
+        self.generation = 0
+        self.rejected = 0
+
+    def before_call(self) -> Optional[Tuple[str, str]]:
+        """调用前检查，拒绝时抛出 CircuitOpenError，返回可能发生的状态变化"""
+        transition = None
+        if self.state == self.OPEN and self.retry_after() <= 0:
+            transition = self._transition(self.HALF_OPEN)
+
+        if self.state == self.OPEN:
+            self.rejected += 1
+            raise CircuitOpenError(f"熔断器已打开，{self.retry_after():.1f}s 后重试")
+        if self.state == self.HALF_OPEN:
+            if self._half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitOpenError("熔断器半开，试探调用进行中")
+            self._half_open_calls += 1
+        return transition
+
+    def release_probe(self, generation: int) -> None:
+        """已放行但没有记录结果的调用（排队被拒、被取消）归还半开试探名额，
+        否则名额永远占用，熔断器会一直拒绝该服务"""
+        if self.state == self.HALF_OPEN and generation == self.generation and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def record_success(self) -> Optional[Tuple[str, str]]:
+        self.consecutive_failures = 0
+        if self.state == self.HALF_OPEN:
+            return self._transition(self.CLOSED)
+        return None
+
+    def record_failure(self) -> Optional[Tuple[str, str]]:
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            return self._transition(self.OPEN)
+        return None
+
+    def retry_after(self) -> float:
+        """距离进入半开状态还需等待的秒数"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.recovery_timeout - time.monotonic())
+
+    def _transition(self, new_state: str) -> Tuple[str, str]:
+        old_state = self.state
+        self.state = new_state
+        self._half_open_calls = 0
+        self.generation += 1
+        if new_state == self.OPEN:
+            self.opened_at = time.monotonic()
+        logger.warning(f"熔断器状态变化: {old_state} -> {new_state}")
+        return old_state, new_state
+
+class Bulkhead:
+    """舱壁隔离：限制单个服务的并发调用数，排队超过 max_wait 秒的调用被拒绝"""
+
+    def __init__(self, max_concurrency: int = 10, max_wait: float = 1.0):
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self) -> None:
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise BulkheadFullError(f"并发已达上限 {self.max_concurrency}，排队超过 {self.max_wait}s")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+class ResilienceInterceptor:
+    """MCP工具调用拦截器，为单个MCP服务提供舱壁隔离、调用超时和熔断
+
+    被拒绝或失败的调用不会抛出异常，而是返回 isError 的结构化工具结果，
+    让LLM看到错误类型和重试建议后自行决定改用其他方式回答。
+    """
+
+    def __init__(
+        self,
+        service_name: str,
+        call_timeout: Optional[float] = 30.0,
+        max_concurrency: int = 10,
+        max_wait: float = 1.0,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        on_state_change: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.service_name = service_name
+        self.call_timeout = call_timeout
+        self.bulkhead = Bulkhead(max_concurrency, max_wait)
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        self.on_state_change = on_state_change
+        self.timeouts = 0
+        self.failures = 0
+
+    @classmethod
+    def from_config(cls, service_name: str, service_config: Dict[str, Any], **kwargs) -> "ResilienceInterceptor":
+        """从MCP服务配置创建拦截器"""
+        return cls(
+            service_name,
+            call_timeout=service_config.get("call_timeout", 30.0),
+            max_concurrency=int(service_config.get("max_concurrency", 10)),
+            max_wait=float(service_config.get("bulkhead_max_wait", 1.0)),
+            failure_threshold=int(service_config.get("failure_threshold", 5)),
+            recovery_timeout=float(service_config.get("recovery_timeout", 30.0)),
+            **kwargs
+        )
+
+    async def __call__(self, request: Any, handler: Callable) -> Any:
+        try:
+            self._emit(self.breaker.before_call(), request)
+        except CircuitOpenError as e:
+            return self._error_result(request, "circuit_open", str(e), retry_after=self.breaker.retry_after())
+        generation = self.breaker.generation
+
+        try:
+            await self.bulkhead.acquire()
+        except BulkheadFullError as e:
+            self.breaker.release_probe(generation)
+            return self._error_result(request, "bulkhead_full", str(e), retry_after=self.bulkhead.max_wait)
+        except asyncio.CancelledError:
+            self.breaker.release_probe(generation)
+            raise
+
+        try:
+            result = await asyncio.wait_for(handler(request), timeout=self.call_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._emit(self.breaker.record_failure(), request)
+            return self._error_result(request, "deadline_exceeded", f"调用超过 {self.call_timeout}s 未返回")
+        except asyncio.CancelledError:
+            self.breaker.release_probe(generation)
+            raise
+        except Exception as e:
+            self.failures += 1
+            self._emit(self.breaker.record_failure(), request)
+            return self._error_result(request, "service_unavailable", f"{type(e).__name__}: {e}")
+        finally:
+            self.bulkhead.release()
+
+        self._emit(self.breaker.record_success(), request)
+        return result
+
+    def _emit(self, transition: Optional[Tuple[str, str]], request: Any) -> None:
+        if transition is None or self.on_state_change is None:
+            return
+        old_state, new_state = transition
+        try:
+            self.on_state_change({
+                "service": self.service_name,
+                "from_state": old_state,
+                "to_state": new_state,
+                "tool": request.name,
+                "thread_id": self._thread_id(request),
+                "consecutive_failures": self.breaker.consecutive_failures,
+            })
+        except Exception as e:
+            logger.warning(f"熔断器状态回调执行失败: {e}")
+
+    @staticmethod
+    def _thread_id(request: Any) -> Optional[str]:
+        """从工具运行时或当前运行配置中取出会话ID"""
+        runtime_config = getattr(getattr(request, "runtime", None), "config", None)
+        if not runtime_config:
+            from langchain_core.runnables.config import var_child_runnable_config
+            runtime_config = var_child_runnable_config.get()
+        return (runtime_config or {}).get("configurable", {}).get("thread_id")
+
+    def _error_result(self, request: Any, error_type: str, message: str, retry_after: Optional[float] = None) -> Any:
+        """构造LLM可读的结构化错误结果"""
+        from mcp.types import CallToolResult, TextContent
+
+        payload = {
+            "error": error_type,
+            "service": self.service_name,
+            "tool": request.name,
+            "message": message,
+        }
+        if retry_after is not None:
+            payload["retry_after_seconds"] = round(retry_after, 1)
+        payload["suggestion"] = "该服务暂时不可用，请不要立即重试，可改用其他工具或直接告知用户稍后再试"
+        return CallToolResult(
+            content=[TextContent(type="text", text=json.dumps(payload, ensure_ascii=False))],
+            isError=True,
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "retry_after": round(self.breaker.retry_after(), 1),
+            "circuit_rejected": self.breaker.rejected,
+            "active_calls": self.bulkhead.active,
+            "waiting_calls": self.bulkhead.waiting,
+            "bulkhead_rejected": self.bulkhead.rejected,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+        }
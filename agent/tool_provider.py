@@ -1,7 +1,12 @@
 import sys
 import os
+import time
+import asyncio
+import inspect
+import json
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from langchain_core.tools import BaseTool
 
 # 添加当前目录到Python路径
@@ -11,9 +16,49 @@ if current_dir not in sys.path:
 
 import config
 
+@dataclass(frozen=True)
+class ToolCatalog:
+    """工具目录快照
+    
+    同一快照内的工具列表与分类视图来自同一次加载，保证二者一致。
+    工具集合（名称或描述）发生变化时版本号递增。
+    """
+    version: int
+    provider_tools: List[Tuple["ToolProvider", List[BaseTool]]]
+    created_at: float = field(default_factory=time.time)
+    
+    @property
+    def tools(self) -> List[BaseTool]:
+        """合并后的完整工具列表"""
+        all_tools = []
+        for _, tools in self.provider_tools:
+            all_tools.extend(tools)
+        return all_tools
+    
+    @staticmethod
+    def fingerprint(provider_tools: List[Tuple["ToolProvider", List[BaseTool]]]) -> tuple:
+        """计算工具集合的指纹，用于判断目录是否变化"""
+        return tuple(
+            (provider.get_provider_name(), tuple((tool.name, tool.description) for tool in tools))
+            for provider, tools in provider_tools
+        )
+
 class ToolProvider(ABC):
     """工具提供器的抽象基类"""
     
+    # 初始化等待时间（秒），None 表示一直等待
+    init_timeout: Optional[float] = None
+    # 关键提供器超时视为加载失败；非关键提供器超时后转入后台继续加载
+    critical: bool = True
+    
+    # 当前发布的工具目录及其指纹、目录监听器
+    _catalog: Optional[ToolCatalog] = None
+    _catalog_fingerprint: Optional[tuple] = None
+    _catalog_listeners: Tuple[Callable[[ToolCatalog], Any], ...] = ()
+    
+    # 轨迹记录器，用于记录熔断等运行事件
+    trajectory_recorder: Optional[Any] = None
+    
     @abstractmethod
     async def get_tools(self) -> List[BaseTool]:
         """获取工具列表"""
@@ -23,17 +68,102 @@ class ToolProvider(ABC):
     def get_provider_name(self) -> str:
         """获取提供器名称"""
         pass
+    
+    async def get_catalog(self) -> ToolCatalog:
+        """获取工具目录快照"""
+        tools = await self.get_tools()
+        return self._publish_catalog([(self, tools)])
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """运行状态统计（连接池使用情况等），没有统计项时返回空字典"""
+        return {}
+    
+    def set_trajectory_recorder(self, recorder: Any) -> None:
+        """设置轨迹记录器"""
+        self.trajectory_recorder = recorder
+    
+    @property
+    def catalog_version(self) -> int:
+        """当前工具目录的版本号，尚未加载时为0"""
+        return self._catalog.version if self._catalog else 0
+    
+    def add_catalog_listener(self, listener: Callable[[ToolCatalog], Any]) -> None:
+        """注册工具目录监听器
+        
+        已发布的目录发生变化（后台加载完成、缓存刷新后工具变化等）时，以新快照回调。
+        监听器可以是同步或异步函数。
+        """
+        self._catalog_listeners = self._catalog_listeners + (listener,)
+    
+    def _publish_catalog(self, provider_tools: List[Tuple["ToolProvider", List[BaseTool]]]) -> ToolCatalog:
+        """根据加载结果生成目录快照，工具集合未变化时沿用当前快照"""
+        fingerprint = ToolCatalog.fingerprint(provider_tools)
+        if self._catalog is not None and fingerprint == self._catalog_fingerprint:
+            return self._catalog
+        
+        previous = self._catalog
+        self._catalog = ToolCatalog(
+            version=previous.version + 1 if previous else 1,
+            provider_tools=provider_tools,
+        )
+        self._catalog_fingerprint = fingerprint
+        # 首次发布不算变化，只有已发布的目录更新时才通知监听器
+        if previous is not None and self._catalog_listeners:
+            asyncio.ensure_future(self._notify_catalog_listeners(self._catalog))
+        return self._catalog
+    
+    async def _notify_catalog_listeners(self, catalog: ToolCatalog) -> None:
+        for listener in self._catalog_listeners:
+            try:
+                result = listener(catalog)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"✗ 工具目录监听器执行失败: {e}")
+    
+    def _on_tools_changed(self) -> None:
+        """底层工具在后台发生变化时调用，重新生成目录快照"""
+        task = asyncio.ensure_future(self.get_catalog())
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
 
 class MCPToolProvider(ToolProvider):
     """MCP工具提供器 - 使用通用MCP客户端"""
     
-    def __init__(self, service_name: str, service_config: Dict[str, Any]):
+    def __init__(self, service_name: str, service_config: Dict[str, Any], connection_manager: Optional[Any] = None):
         self.service_name = service_name
         self.service_config = service_config
+        # 多个MCP服务共享的连接管理器，为None时客户端单独创建
+        self.connection_manager = connection_manager
         self.mcp_client = None
+        self.init_timeout = service_config.get("init_timeout", config.TOOL_PROVIDER_INIT_TIMEOUT)
+        self.critical = service_config.get("critical", False)
+        self._init_lock = asyncio.Lock()
+        self.resilience = self._create_resilience()
+    
+    def _create_resilience(self):
+        """创建熔断/舱壁拦截器，resilience_enabled 为 False 时不启用"""
+        if not self.service_config.get("resilience_enabled", True):
+            return None
+        from mcp_client.resilience import ResilienceInterceptor
+        return ResilienceInterceptor.from_config(
+            self.service_name,
+            self.service_config,
+            on_state_change=self._on_circuit_state_change,
+        )
+    
+    def _on_circuit_state_change(self, event: Dict[str, Any]) -> None:
+        """熔断器状态变化时打印并写入轨迹"""
+        print(f"⚡ MCP服务 {self.service_name} 熔断器: {event['from_state']} -> {event['to_state']}")
+        if self.trajectory_recorder is None:
+            return
+        session_id = event.get("thread_id") or f"mcp-{self.service_name}"
+        task = asyncio.ensure_future(self.trajectory_recorder.record_event(
+            session_id, f"mcp:{self.service_name}", "circuit_breaker_state_change", event
+        ))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
     
     async def get_tools(self) -> List[BaseTool]:
-        """获取MCP工具列表"""
+        """获取MCP工具列表（由客户端按TTL缓存）"""
         if not self.service_config.get("enabled", False):
             return []
             
@@ -46,28 +176,253 @@ class MCPToolProvider(ToolProvider):
         """初始化MCP客户端 - 使用重命名后的客户端模块"""
         from mcp_client.client import MCPClientFactory
         
-        # 验证必要的配置
-        if not self.service_config.get("url"):
-            raise ValueError(f"MCP服务 {self.service_name} 缺少URL配置")
-        
-        # 使用工厂创建通用客户端
-        self.mcp_client = MCPClientFactory.create_client(self.service_config)
-        await self.mcp_client.initialize()
+        async with self._init_lock:
+            if self.mcp_client is not None:
+                return
+            
+            # 验证必要的配置
+            if not self.service_config.get("url"):
+                raise ValueError(f"MCP服务 {self.service_name} 缺少URL配置")
+            
+            # 使用工厂创建通用客户端
+            interceptors = [self.resilience] if self.resilience else []
+            mcp_client = MCPClientFactory.create_client(
+                self.service_config,
+                tool_interceptors=interceptors,
+                connection_manager=self.connection_manager
+            )
+            await mcp_client.initialize()
+            # 后台刷新发现工具变化时重新发布目录
+            mcp_client.add_tools_listener(lambda tools: self._on_tools_changed())
+            self.mcp_client = mcp_client
     
     def get_provider_name(self) -> str:
         description = self.service_config.get("description", self.service_name)
         return f"MCP-{description}"
     
+    def get_stats(self) -> Dict[str, Any]:
+        """MCP客户端的工具缓存、会话池与熔断器使用情况"""
+        stats = {}
+        if self.mcp_client is not None and hasattr(self.mcp_client, "get_stats"):
+            stats.update(self.mcp_client.get_stats())
+        if self.resilience is not None:
+            stats["resilience"] = self.resilience.get_stats()
+        return stats
+    
     async def close(self):
         """关闭MCP客户端连接"""
         if self.mcp_client:
             await self.mcp_client.close()
 
+class LocalToolExecutor:
+    """本地CPU密集型工具的执行层
+    
+    标记为 cpu_bound 的本地工具不在事件循环上执行，而是提交到进程池（或线程池），
+    避免一次大文本处理阻塞其他会话的流式输出。每次调用受以下限制：
+    - 输入总长度超过 max_input_chars 时直接拒绝；
+    - 进程池模式下单次调用的CPU时间不超过 cpu_time_limit 秒；
+    - 等待结果不超过 timeout 秒（包含排队时间）；
+    - 输出超过 max_output_chars 时截断。
+    
+    工具输出形如 ``计算结果: {...}`` 时，截断只缩短其中 JSON 的列表和字符串，
+    保证截断后仍是合法的 JSON，并加上 ``output_truncated`` 字段。
+    """
+    
+    def __init__(
+        self,
+        mode: str = "process",
+        max_workers: int = 2,
+        cpu_time_limit: float = 5.0,
+        timeout: float = 10.0,
+        max_input_chars: int = 200000,
+        max_output_chars: int = 20000,
+        mp_context: Optional[str] = None,
+    ):
+        if mode not in ("process", "thread"):
+            raise ValueError(f"不支持的本地工具执行模式: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.cpu_time_limit = cpu_time_limit
+        self.timeout = timeout
+        self.max_input_chars = max_input_chars
+        self.max_output_chars = max_output_chars
+        self.mp_context = mp_context
+        self._pool = None
+        # 已提交但尚未完成的调用，关闭时取消其中还在排队的
+        self._futures = set()
+        self._in_flight = 0
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "cpu_time_exceeded": 0,
+        }
+        self._total_queue_wait = 0.0
+        self._max_queue_wait = 0.0
+        self._total_run_time = 0.0
+    
+    @classmethod
+    def from_config(cls) -> Optional["LocalToolExecutor"]:
+        """根据配置创建执行层，LOCAL_TOOL_EXECUTOR 为 inline 时返回None（在事件循环上直接执行）"""
+        mode = config.LOCAL_TOOL_EXECUTOR
+        if mode == "inline":
+            return None
+        return cls(
+            mode=mode,
+            max_workers=config.LOCAL_TOOL_WORKERS,
+            cpu_time_limit=config.LOCAL_TOOL_CPU_TIME_LIMIT,
+            timeout=config.LOCAL_TOOL_TIMEOUT,
+            max_input_chars=config.LOCAL_TOOL_MAX_INPUT_CHARS,
+            max_output_chars=config.LOCAL_TOOL_MAX_OUTPUT_CHARS,
+            mp_context=config.LOCAL_TOOL_MP_CONTEXT,
+        )
+    
+    def _get_pool(self):
+        """首次提交时才创建工作池"""
+        if self._pool is None:
+            if self.mode == "process":
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # 默认不直接 fork 运行着事件循环和多个线程的服务进程
+                mp_context = self.mp_context
+                if mp_context is None:
+                    available = multiprocessing.get_all_start_methods()
+                    mp_context = "forkserver" if "forkserver" in available else "spawn"
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(mp_context)
+                )
+            else:
+                from concurrent.futures import ThreadPoolExecutor
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="local-tool")
+        return self._pool
+    
+    async def run(self, module: str, class_name: str, tool_input: Dict[str, Any]) -> Any:
+        """在工作池中执行工具，超出限制时返回错误说明"""
+        from concurrent.futures.process import BrokenProcessPool
+        from tools.worker import run_tool
+        
+        input_size = sum(len(value) if isinstance(value, str) else len(str(value)) for value in tool_input.values())
+        if input_size > self.max_input_chars:
+            self._counters["rejected"] += 1
+            return f"工具执行被拒绝: 输入长度 {input_size} 超过上限 {self.max_input_chars}"
+        
+        self._counters["submitted"] += 1
+        self._in_flight += 1
+        submitted_at = time.time()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._get_pool().submit(run_tool, module, class_name, tool_input, self.cpu_time_limit)
+            self._futures.add(future)
+            future.add_done_callback(self._futures.discard)
+            outcome = await asyncio.wait_for(asyncio.wrap_future(future, loop=loop), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._counters["timeouts"] += 1
+            return f"工具执行超时: 超过 {self.timeout}s 未完成"
+        except BrokenProcessPool:
+            # 工作进程异常退出后进程池不可再用，下次调用重新创建
+            self._counters["failed"] += 1
+            self._pool = None
+            return "工具执行失败: 工作进程异常退出"
+        except Exception:
+            self._counters["failed"] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+        
+        queue_wait = max(0.0, outcome["started_at"] - submitted_at)
+        self._total_queue_wait += queue_wait
+        self._max_queue_wait = max(self._max_queue_wait, queue_wait)
+        self._total_run_time += outcome["finished_at"] - outcome["started_at"]
+        
+        if outcome["status"] == "cpu_time_exceeded":
+            self._counters["cpu_time_exceeded"] += 1
+            return f"工具执行被终止: CPU时间超过 {self.cpu_time_limit}s"
+        
+        self._counters["completed"] += 1
+        result = outcome["result"]
+        if isinstance(result, str) and len(result) > self.max_output_chars:
+            result = self._truncate_output(result)
+        return result
+    
+    def _truncate_output(self, result: str) -> str:
+        """把过长的输出截断到 max_output_chars 以内"""
+        omitted = len(result) - self.max_output_chars
+        prefix, separator, payload = result.partition(": ")
+        try:
+            data = json.loads(payload) if separator else None
+        except ValueError:
+            data = None
+        if not isinstance(data, (dict, list)):
+            return f"{result[:self.max_output_chars]}\n...(输出过长，已截断 {omitted} 个字符)"
+        
+        if isinstance(data, list):
+            data = {"results": data}
+        data["output_truncated"] = True
+        # 每次把最长的列表或字符串减半，直到整体不超过上限
+        while len(prefix) + len(separator) + len(json.dumps(data, ensure_ascii=False)) > self.max_output_chars:
+            largest = self._largest_value(data)
+            if largest is None:
+                data = {"output_truncated": True, "error": f"输出过长（{len(result)} 个字符），无法截断"}
+                break
+            parent, key, value = largest
+            parent[key] = value[:len(value) // 2]
+        return f"{prefix}{separator}{json.dumps(data, ensure_ascii=False)}"
+    
+    @staticmethod
+    def _largest_value(data: Any) -> Optional[Tuple[Any, Any, Any]]:
+        """JSON 中序列化后最长、且还能缩短的列表或字符串: (所在容器, 键或下标, 值)"""
+        largest, largest_size = None, 0
+        stack = [data]
+        while stack:
+            container = stack.pop()
+            items = container.items() if isinstance(container, dict) else enumerate(container)
+            for key, value in items:
+                if isinstance(value, (dict, list)):
+                    stack.append(value)
+                if isinstance(value, (str, list)) and len(value) > 0:
+                    size = len(json.dumps(value, ensure_ascii=False))
+                    if size > largest_size:
+                        largest, largest_size = (container, key, value), size
+        return largest
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """工作池排队与执行情况"""
+        finished = self._counters["completed"] + self._counters["cpu_time_exceeded"]
+        return {
+            "mode": self.mode,
+            "workers": self.max_workers,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.max_workers),
+            **self._counters,
+            "avg_queue_wait_ms": round(self._total_queue_wait / finished * 1000, 2) if finished else 0.0,
+            "max_queue_wait_ms": round(self._max_queue_wait * 1000, 2),
+            "avg_run_ms": round(self._total_run_time / finished * 1000, 2) if finished else 0.0,
+        }
+    
+    def close(self) -> None:
+        if self._pool is not None:
+            # shutdown 的 cancel_futures 参数需要 Python 3.9，这里自行取消排队中的调用
+            for future in list(self._futures):
+                future.cancel()
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
 class LocalToolProvider(ToolProvider):
-    """本地工具提供器"""
+    """本地工具提供器
+    
+    传入 executor 时，标记为 cpu_bound 的工具通过执行层在工作池中运行。
+    """
     
-    def __init__(self, tools: List[BaseTool]):
+    def __init__(self, tools: List[BaseTool], executor: Optional[LocalToolExecutor] = None):
         self.tools = tools
+        self.executor = executor
+        if executor is not None:
+            for tool in tools:
+                if getattr(tool, "cpu_bound", False):
+                    tool.executor = executor
     
     async def get_tools(self) -> List[BaseTool]:
         """获取本地工具列表"""
@@ -75,31 +430,151 @@ class LocalToolProvider(ToolProvider):
     
     def get_provider_name(self) -> str:
         return "本地工具"
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """执行层的排队与执行情况"""
+        if self.executor is None:
+            return {}
+        return {"executor": self.executor.get_stats()}
+    
+    async def close(self):
+        """关闭执行层的工作池"""
+        if self.executor is not None:
+            self.executor.close()
 
 class CompositeToolProvider(ToolProvider):
-    """组合工具提供器，可以组合多个工具提供器"""
+    """组合工具提供器，可以组合多个工具提供器
+    
+    各提供器并发初始化，每个提供器最多等待自身的 init_timeout。
+    非关键提供器超时后在后台继续加载，就绪后发布新的工具目录并通知监听器。
+    """
     
     def __init__(self, providers: List[ToolProvider]):
         self.providers = providers
+        # 每个提供器最近一次成功加载的工具: {provider_index: tools}
+        self._provider_tools: Dict[int, List[BaseTool]] = {}
+        # 仍在后台加载的提供器: {provider_index: task}
+        self._background_tasks: Dict[int, asyncio.Task] = {}
+        # 子提供器的目录变化（如MCP工具缓存刷新）汇总到组合目录
+        for index, provider in enumerate(providers):
+            provider.add_catalog_listener(
+                lambda catalog, index=index: self._on_provider_catalog_changed(index, catalog)
+            )
     
     async def get_tools(self) -> List[BaseTool]:
         """获取所有提供器的工具"""
-        all_tools = []
-        for provider in self.providers:
-            try:
-                tools = await provider.get_tools()
-                all_tools.extend(tools)
-                print(f"✓ 加载了 {len(tools)} 个工具来自: {provider.get_provider_name()}")
-            except Exception as e:
-                print(f"✗ 加载工具失败: {provider.get_provider_name()}, 错误: {e}")
-        return all_tools
+        return (await self.get_catalog()).tools
+    
+    async def get_catalog(self) -> ToolCatalog:
+        """加载所有提供器并返回同一次加载结果生成的目录快照"""
+        await self._load_providers()
+        return self._publish_catalog(self.get_provider_tools())
+    
+    def get_provider_tools(self) -> List[Tuple[ToolProvider, List[BaseTool]]]:
+        """返回各提供器最近一次加载到的工具，不会触发新的加载"""
+        return [
+            (provider, self._provider_tools[index])
+            for index, provider in enumerate(self.providers)
+            if index in self._provider_tools
+        ]
+    
+    async def _load_providers(self) -> None:
+        """并发加载所有提供器，每个提供器最多等待自身的 init_timeout"""
+        tasks = []
+        for index, provider in enumerate(self.providers):
+            # 已在后台加载的提供器直接复用原任务，避免重复建立连接
+            task = self._background_tasks.get(index)
+            if task is None:
+                task = asyncio.ensure_future(provider.get_catalog())
+            tasks.append(task)
+        
+        await asyncio.gather(*(
+            asyncio.wait({task}, timeout=provider.init_timeout)
+            for provider, task in zip(self.providers, tasks)
+        ))
+        
+        for index, (provider, task) in enumerate(zip(self.providers, tasks)):
+            name = provider.get_provider_name()
+            if not task.done():
+                if provider.critical:
+                    task.cancel()
+                    self._background_tasks.pop(index, None)
+                    print(f"✗ 加载工具超时: {name} (>{provider.init_timeout}s)")
+                else:
+                    if index not in self._background_tasks:
+                        print(f"⏳ 初始化超时，转入后台加载: {name} (>{provider.init_timeout}s)")
+                    self._attach_in_background(index, task)
+                continue
+            
+            self._background_tasks.pop(index, None)
+            catalog = self._task_result(provider, task)
+            if catalog is not None:
+                if index not in self._provider_tools:
+                    print(f"✓ 加载了 {len(catalog.tools)} 个工具来自: {name}")
+                self._provider_tools[index] = catalog.tools
+    
+    def _attach_in_background(self, index: int, task: asyncio.Task) -> None:
+        """在后台等待提供器加载完成，就绪后并入工具目录"""
+        if index in self._background_tasks:
+            return
+        self._background_tasks[index] = task
+        task.add_done_callback(lambda t: self._on_background_done(index, t))
+    
+    def _on_background_done(self, index: int, task: asyncio.Task) -> None:
+        # 同一任务可能已被前台的 get_catalog 消费
+        if self._background_tasks.get(index) is not task:
+            return
+        self._background_tasks.pop(index, None)
+        
+        provider = self.providers[index]
+        catalog = self._task_result(provider, task)
+        if catalog is None:
+            return
+        print(f"✓ 后台加载了 {len(catalog.tools)} 个工具来自: {provider.get_provider_name()}")
+        self._on_provider_catalog_changed(index, catalog)
+    
+    def _on_provider_catalog_changed(self, index: int, catalog: ToolCatalog) -> None:
+        self._provider_tools[index] = catalog.tools
+        # 尚未发布过组合目录时（启动加载中）由 get_catalog 统一发布
+        if self._catalog is not None:
+            self._publish_catalog(self.get_provider_tools())
+    
+    @staticmethod
+    def _task_result(provider: ToolProvider, task: asyncio.Task) -> Optional[ToolCatalog]:
+        """取出加载任务的结果，失败时打印错误并返回None"""
+        if task.cancelled():
+            print(f"✗ 加载工具已取消: {provider.get_provider_name()}")
+            return None
+        error = task.exception()
+        if error is not None:
+            print(f"✗ 加载工具失败: {provider.get_provider_name()}, 错误: {error}")
+            return None
+        return task.result()
     
     def get_provider_name(self) -> str:
         provider_names = [provider.get_provider_name() for provider in self.providers]
         return f"组合提供器({', '.join(provider_names)})"
     
+    def get_stats(self) -> Dict[str, Any]:
+        """按提供器名称汇总各提供器的统计"""
+        stats = {}
+        for provider in self.providers:
+            provider_stats = provider.get_stats()
+            if provider_stats:
+                stats[provider.get_provider_name()] = provider_stats
+        return stats
+    
+    def set_trajectory_recorder(self, recorder: Any) -> None:
+        """为所有子提供器设置轨迹记录器"""
+        self.trajectory_recorder = recorder
+        for provider in self.providers:
+            provider.set_trajectory_recorder(recorder)
+    
     async def close(self):
         """关闭所有提供器"""
+        for task in self._background_tasks.values():
+            task.cancel()
+        self._background_tasks.clear()
         for provider in self.providers:
             if hasattr(provider, 'close'):
                 await provider.close()
@@ -108,14 +583,18 @@ class ToolFactory:
     """工具工厂类，用于创建不同类型的工具提供器"""
     
     @staticmethod
-    def create_mcp_provider(service_name: str, service_config: Dict[str, Any]) -> MCPToolProvider:
+    def create_mcp_provider(
+        service_name: str,
+        service_config: Dict[str, Any],
+        connection_manager: Optional[Any] = None
+    ) -> MCPToolProvider:
         """创建MCP工具提供器"""
-        return MCPToolProvider(service_name, service_config)
+        return MCPToolProvider(service_name, service_config, connection_manager)
     
     @staticmethod
-    def create_local_provider(tools: List[BaseTool]) -> LocalToolProvider:
+    def create_local_provider(tools: List[BaseTool], executor: Optional[LocalToolExecutor] = None) -> LocalToolProvider:
         """创建本地工具提供器"""
-        return LocalToolProvider(tools)
+        return LocalToolProvider(tools, executor)
     
     @staticmethod
     def create_composite_provider(providers: List[ToolProvider]) -> CompositeToolProvider:
@@ -127,12 +606,14 @@ class ToolFactory:
         """从配置创建默认的工具提供器"""
         providers = []
         
-        # 添加MCP工具提供器
+        # 添加MCP工具提供器，所有MCP服务共享一个连接管理器
+        from mcp_client.client import MCPConnectionManager
+        connection_manager = MCPConnectionManager()
         mcp_services = getattr(config, 'MCP_SERVICES', {})
         for service_name, service_config in mcp_services.items():
             if service_config.get("enabled", False):
                 try:
-                    mcp_provider = ToolFactory.create_mcp_provider(service_name, service_config)
+                    mcp_provider = ToolFactory.create_mcp_provider(service_name, service_config, connection_manager)
                     providers.append(mcp_provider)
                     print(f"✓ 创建MCP服务提供器: {service_name}")
                 except Exception as e:
@@ -141,7 +622,7 @@ class ToolFactory:
         # 添加本地工具提供器
         local_tools = await ToolFactory._load_local_tools()
         if local_tools:
-            local_provider = ToolFactory.create_local_provider(local_tools)
+            local_provider = ToolFactory.create_local_provider(local_tools, LocalToolExecutor.from_config())
             providers.append(local_provider)
         
         if len(providers) == 1:
@@ -153,42 +634,23 @@ class ToolFactory:
     
     @staticmethod
     async def _load_local_tools() -> List[BaseTool]:
-        """根据配置加载本地工具"""
+        """根据配置加载本地工具（工具模块在第一次调用时才导入）"""
+        from tools.registry import LocalToolRegistry
+        
         tools = []
         local_tool_configs = getattr(config, 'LOCAL_TOOLS', {})
+        registry = LocalToolRegistry.discover()
         
         for tool_name, tool_config in local_tool_configs.items():
             if tool_config.get("enabled", False):
                 try:
-                    tool = await ToolFactory._create_local_tool(tool_name)
+                    tool = registry.create_tool(tool_name)
                     if tool:
                         tools.append(tool)
                         print(f"✓ 加载本地工具: {tool_name}")
+                    else:
+                        print(f"⚠️  警告: 未知的本地工具类型: {tool_name}")
                 except Exception as e:
                     print(f"✗ 加载本地工具失败: {tool_name}, 错误: {e}")
         
         return tools
-    
-    @staticmethod
-    async def _create_local_tool(tool_name: str) -> Optional[BaseTool]:
-        """创建单个本地工具"""
-        try:
-            if tool_name == "calculator":
-                # 使用相对路径导入
-                sys.path.append(os.path.join(current_dir, 'tools', 'local'))
-                from calculator import CalculatorTool
-                return CalculatorTool()
-            elif tool_name == "text_processor":
-                sys.path.append(os.path.join(current_dir, 'tools', 'local'))
-                from text_processor import TextProcessorTool
-                return TextProcessorTool()
-            elif tool_name == "file_reader":
-                sys.path.append(os.path.join(current_dir, 'tools', 'local'))
-                from file_reader import FileReaderTool
-                return FileReaderTool()
-            else:
-                print(f"⚠️  警告: 未知的本地工具类型: {tool_name}")
-                return None
-        except ImportError as e:
-            print(f"⚠️  导入工具失败 {tool_name}: {e}")
-            return None
\ No newline at end of file
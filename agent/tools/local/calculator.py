@@ -1,53 +1,208 @@
 from langchain_core.tools import BaseTool
-from typing import Any, Dict, Optional, ClassVar
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union, ClassVar
+from functools import lru_cache
 from pydantic import BaseModel, Field
 import ast
+import json
+import math
 import operator
 
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖（pip install .[calculator]），缺失时逐组计算
+    np = None
+
+# 整数运算结果的最大位数（约1200位十进制数字），防止 9**9**9 之类的表达式耗尽CPU和内存
+MAX_INT_BITS = 4096
+# 单次批量计算的表达式数量上限和变量列表长度上限
+MAX_BATCH_SIZE = 200
+MAX_VECTOR_LENGTH = 100000
+
 class CalculatorInput(BaseModel):
     """计算器工具的输入模型"""
-    expression: str = Field(description="要计算的数学表达式，例如：2+3*4")
+    expression: Optional[str] = Field(
+        default=None,
+        description="要计算的数学表达式，例如：2+3*4；配合 variables 时可以引用变量，例如：price*qty"
+    )
+    expressions: Optional[List[str]] = Field(
+        default=None,
+        description="批量计算的表达式列表，一次调用返回全部结果"
+    )
+    variables: Optional[Dict[str, Union[float, List[float]]]] = Field(
+        default=None,
+        description="表达式中变量的取值；值为列表时按位置逐组计算，例如：{\"price\": [1.5, 2], \"qty\": [3, 4]}"
+    )
+
+def _is_array(value: Any) -> bool:
+    return np is not None and isinstance(value, np.ndarray)
+
+def _check_int_bits(bits: int) -> None:
+    if bits > MAX_INT_BITS:
+        raise OverflowError("计算结果过大")
+
+def _safe_mul(left, right):
+    if isinstance(left, int) and isinstance(right, int):
+        _check_int_bits(left.bit_length() + right.bit_length())
+    return operator.mul(left, right)
+
+def _safe_pow(base, exponent):
+    if _is_array(base) or _is_array(exponent):
+        return np.power(np.asarray(base, dtype=float), exponent)
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        _check_int_bits(base.bit_length() * exponent)
+    result = operator.pow(base, exponent)
+    if isinstance(result, complex):
+        raise ValueError("结果为复数，不支持")
+    return result
+
+def _safe_div(operation: Callable) -> Callable:
+    """标量除以0时给出明确的错误，数组按NumPy规则得到inf/nan"""
+    def apply(left, right):
+        if not _is_array(right) and right == 0:
+            raise ZeroDivisionError("除数不能为0")
+        return operation(left, right)
+    return apply
+
+@lru_cache(maxsize=256)
+def compile_expression(expression: str) -> Tuple[Callable[[Dict[str, Any]], Any], Tuple[str, ...]]:
+    """把表达式编译成可重复调用的函数，返回 (函数, 引用的变量名)
+
+    编译结果按表达式文本缓存，同一表达式只解析一次。
+    """
+    node = ast.parse(expression, mode='eval')
+    names: List[str] = []
+    return CalculatorTool.compile_node(node.body, names), tuple(dict.fromkeys(names))
 
 class CalculatorTool(BaseTool):
     """简单的计算器工具"""
-    
+
     name: str = "calculator"
-    description: str = "执行基本的数学计算。支持加减乘除和括号。"
+    description: str = (
+        "执行数学计算。支持加减乘除、乘方(**)、取余(%)、整除(//)和括号。"
+        "可以通过 expressions 一次计算多个表达式，或通过 variables 对一组数据逐一计算同一个表达式。"
+    )
     args_schema: type[BaseModel] = CalculatorInput
-    
+
     # 使用 ClassVar 标注类变量，避免被 Pydantic 当作字段
     operators: ClassVar[Dict[type, Any]] = {
         ast.Add: operator.add,
         ast.Sub: operator.sub,
-        ast.Mult: operator.mul,
-        ast.Div: operator.truediv,
+        ast.Mult: _safe_mul,
+        ast.Div: _safe_div(operator.truediv),
+        ast.FloorDiv: _safe_div(operator.floordiv),
+        ast.Mod: _safe_div(operator.mod),
+        ast.Pow: _safe_pow,
         ast.USub: operator.neg,
+        ast.UAdd: operator.pos,
     }
-    
-    def _run(self, expression: str, **kwargs: Any) -> str:
+
+    def _run(
+        self,
+        expression: Optional[str] = None,
+        expressions: Optional[List[str]] = None,
+        variables: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> str:
         """执行计算"""
         try:
-            # 解析表达式
-            node = ast.parse(expression, mode='eval')
-            result = self._eval_node(node.body)
+            if expressions:
+                if len(expressions) > MAX_BATCH_SIZE:
+                    raise ValueError(f"一次最多计算 {MAX_BATCH_SIZE} 个表达式")
+                results = []
+                for item in expressions:
+                    try:
+                        results.append({"expression": item, "result": self.evaluate(item, variables)})
+                    except Exception as e:
+                        results.append({"expression": item, "error": str(e)})
+                return f"批量计算结果: {json.dumps(results, ensure_ascii=False)}"
+
+            if not expression:
+                raise ValueError("需要提供 expression 或 expressions")
+            result = self.evaluate(expression, variables)
+            if isinstance(result, list):
+                return f"计算结果: {json.dumps(result, ensure_ascii=False)}"
             return f"计算结果: {result}"
         except Exception as e:
             return f"计算错误: {str(e)}"
-    
-    async def _arun(self, expression: str, **kwargs: Any) -> str:
+
+    async def _arun(
+        self,
+        expression: Optional[str] = None,
+        expressions: Optional[List[str]] = None,
+        variables: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> str:
         """异步执行计算"""
-        return self._run(expression, **kwargs)
-    
-    def _eval_node(self, node):
-        """递归计算AST节点"""
+        return self._run(expression, expressions, variables, **kwargs)
+
+    def evaluate(self, expression: str, variables: Optional[Dict[str, Any]] = None) -> Any:
+        """计算单个表达式；变量值为列表时返回逐组计算的结果列表，无法计算的位置为None"""
+        function, names = compile_expression(expression)
+        variables = variables or {}
+        missing = [name for name in names if name not in variables]
+        if missing:
+            raise ValueError(f"未定义的变量: {', '.join(missing)}")
+
+        env = {name: variables[name] for name in names}
+        lengths = {len(value) for value in env.values() if isinstance(value, list)}
+        if not lengths:
+            return function(env)
+        if len(lengths) > 1:
+            raise ValueError("变量列表的长度不一致")
+        length = lengths.pop()
+        if length > MAX_VECTOR_LENGTH:
+            raise ValueError(f"变量列表长度不能超过 {MAX_VECTOR_LENGTH}")
+
+        if np is not None:
+            return self._evaluate_vectorized(function, env, length)
+
+        results = []
+        for index in range(length):
+            row = {name: value[index] if isinstance(value, list) else value for name, value in env.items()}
+            try:
+                value = function(row)
+                results.append(value if not isinstance(value, float) or math.isfinite(value) else None)
+            except (ArithmeticError, ValueError):
+                results.append(None)
+        return results
+
+    @staticmethod
+    def _evaluate_vectorized(function: Callable, env: Dict[str, Any], length: int) -> List[Any]:
+        """用NumPy对整列数据一次计算，溢出或除以0的位置为None"""
+        arrays = {
+            name: np.asarray(value, dtype=float) if isinstance(value, list) else value
+            for name, value in env.items()
+        }
+        with np.errstate(all='ignore'):
+            result = np.broadcast_to(np.asarray(function(arrays), dtype=float), (length,))
+        return [value if math.isfinite(value) else None for value in result.tolist()]
+
+    @classmethod
+    def compile_node(cls, node: ast.AST, names: List[str]) -> Callable[[Dict[str, Any]], Any]:
+        """递归地把AST节点编译成闭包"""
         if isinstance(node, ast.Constant):
-            return node.value
+            value = node.value
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"不支持的常量: {value!r}")
+            return lambda env: value
+        elif isinstance(node, ast.Name):
+            name = node.id
+            names.append(name)
+            return lambda env: env[name]
         elif isinstance(node, ast.BinOp):
-            left = self._eval_node(node.left)
-            right = self._eval_node(node.right)
-            return self.operators[type(node.op)](left, right)
+            operation = cls._operator(node.op)
+            left = cls.compile_node(node.left, names)
+            right = cls.compile_node(node.right, names)
+            return lambda env: operation(left(env), right(env))
         elif isinstance(node, ast.UnaryOp):
-            operand = self._eval_node(node.operand)
-            return self.operators[type(node.op)](operand)
+            operation = cls._operator(node.op)
+            operand = cls.compile_node(node.operand, names)
+            return lambda env: operation(operand(env))
         else:
-            raise ValueError(f"不支持的操作: {type(node)}")
\ No newline at end of file
+            raise ValueError(f"不支持的操作: {type(node)}")
+
+    @classmethod
+    def _operator(cls, op: ast.AST) -> Callable:
+        if type(op) not in cls.operators:
+            raise ValueError(f"不支持的运算符: {type(op).__name__}")
+        return cls.operators[type(op)]
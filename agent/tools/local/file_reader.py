@@ -0,0 +1,268 @@
+from langchain_core.tools import BaseTool
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field, PrivateAttr
+from collections import OrderedDict
+import json
+import mmap
+import os
+import re
+import time
+
+import config
+
+SUPPORTED_OPERATIONS = ["info", "read_bytes", "read_lines", "tail", "page", "grep"]
+
+# 以下限制在 config.py 中配置（FILE_READER_*）
+# 允许读取的根目录（多个用系统路径分隔符分隔），默认为当前工作目录
+DEFAULT_ALLOWED_ROOTS = config.FILE_READER_ALLOWED_ROOTS
+# 单次返回内容的最大字节数，保证结果能放进模型上下文
+MAX_OUTPUT_BYTES = config.FILE_READER_MAX_OUTPUT_BYTES
+# grep 单次最多扫描的字节数，超过后返回 next_offset 供下次继续
+MAX_SCAN_BYTES = config.FILE_READER_MAX_SCAN_BYTES
+MAX_GREP_MATCHES = 100
+DEFAULT_PAGE_BYTES = 8192
+# 行号索引每隔多少行记录一次偏移量
+LINE_INDEX_STRIDE = 4096
+MAX_INDEXED_FILES = 32
+
+class FileReaderInput(BaseModel):
+    """文件读取工具的输入模型"""
+    path: str = Field(description="要读取的文件路径")
+    operation: str = Field(description="操作类型：info, read_bytes, read_lines, tail, page, grep")
+    offset: Optional[int] = Field(default=None, description="read_bytes/grep 的起始字节偏移量")
+    length: Optional[int] = Field(default=None, description="read_bytes 读取的字节数")
+    start_line: Optional[int] = Field(default=None, description="read_lines 的起始行号（从1开始）")
+    line_count: Optional[int] = Field(default=None, description="read_lines/tail 返回的行数")
+    page: Optional[int] = Field(default=None, description="page 的页码（从0开始），每页按字节划分并对齐到整行")
+    page_size: Optional[int] = Field(default=None, description="page 每页的字节数")
+    pattern: Optional[str] = Field(default=None, description="grep 使用的正则表达式")
+    max_matches: Optional[int] = Field(default=None, description="grep 最多返回的匹配行数")
+    ignore_case: bool = Field(default=False, description="grep 是否忽略大小写")
+
+class _LineIndex:
+    """稀疏行号索引：记录第 k*LINE_INDEX_STRIDE 行的起始偏移量，随读取逐步扩展"""
+
+    def __init__(self):
+        self.offsets = [0]
+        self.complete = False
+
+    def seek(self, mm: mmap.mmap, line_number: int) -> Optional[int]:
+        """返回第 line_number 行（从0开始）的起始偏移量，超过文件行数时返回None"""
+        slot = line_number // LINE_INDEX_STRIDE
+        while slot >= len(self.offsets) and not self.complete:
+            position = self.offsets[-1]
+            for _ in range(LINE_INDEX_STRIDE):
+                newline = mm.find(b"\n", position)
+                if newline < 0:
+                    self.complete = True
+                    break
+                position = newline + 1
+            else:
+                self.offsets.append(position)
+        if slot >= len(self.offsets):
+            slot = len(self.offsets) - 1
+
+        position = self.offsets[slot]
+        for _ in range(line_number - slot * LINE_INDEX_STRIDE):
+            newline = mm.find(b"\n", position)
+            if newline < 0:
+                return None
+            position = newline + 1
+        return position if position < len(mm) else None
+
+class FileReaderTool(BaseTool):
+    """基于内存映射的大文件读取工具"""
+
+    name: str = "file_reader"
+    description: str = (
+        "读取本地大文件（日志、CSV等），不会把整个文件载入内存。"
+        "支持查看文件信息(info)、按字节范围读取(read_bytes)、按行号读取(read_lines)、"
+        "读取末尾若干行(tail)、按页读取(page)和在文件中搜索(grep)。"
+    )
+    args_schema: type[BaseModel] = FileReaderInput
+
+    allowed_roots: List[str] = Field(default_factory=lambda: [
+        os.path.realpath(root) for root in (DEFAULT_ALLOWED_ROOTS.split(os.pathsep) if DEFAULT_ALLOWED_ROOTS else [os.getcwd()])
+        if root
+    ])
+    max_output_bytes: int = MAX_OUTPUT_BYTES
+
+    _line_indexes: "OrderedDict[Tuple[str, int, int], _LineIndex]" = PrivateAttr(default_factory=OrderedDict)
+
+    def _run(self, path: str, operation: str, **kwargs: Any) -> str:
+        """执行文件读取"""
+        try:
+            if operation not in SUPPORTED_OPERATIONS:
+                return f"不支持的操作: {operation}。支持的操作: {', '.join(SUPPORTED_OPERATIONS)}"
+            real_path = self._resolve(path)
+            stat = os.stat(real_path)
+            if operation == "info":
+                result = {"path": real_path, "size": stat.st_size, "modified": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stat.st_mtime))}
+            elif stat.st_size == 0:
+                result = {"content": "", "size": 0}
+            else:
+                with open(real_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    handler = getattr(self, f"_{operation}")
+                    result = handler(mm, real_path, stat, **{k: v for k, v in kwargs.items() if v is not None})
+            return f"文件读取结果: {json.dumps(result, ensure_ascii=False)}"
+        except Exception as e:
+            return f"文件读取错误: {str(e)}"
+
+    async def _arun(self, path: str, operation: str, **kwargs: Any) -> str:
+        """异步执行文件读取"""
+        return self._run(path, operation, **kwargs)
+
+    def _resolve(self, path: str) -> str:
+        """解析真实路径并检查是否位于允许的目录下"""
+        real_path = os.path.realpath(os.path.expanduser(path))
+        for root in self.allowed_roots:
+            try:
+                if os.path.commonpath([real_path, root]) == root:
+                    break
+            except ValueError:
+                continue
+        else:
+            raise PermissionError(f"不允许读取该路径: {path}")
+        if not os.path.isfile(real_path):
+            raise FileNotFoundError(f"文件不存在: {path}")
+        return real_path
+
+    def _decode(self, data: bytes) -> str:
+        return data.decode("utf-8", errors="replace")
+
+    def _read_bytes(self, mm: mmap.mmap, path: str, stat: os.stat_result, offset: int = 0, length: Optional[int] = None, **kwargs: Any) -> Dict[str, Any]:
+        size = len(mm)
+        offset = min(max(offset, 0), size)
+        length = min(length or self.max_output_bytes, self.max_output_bytes)
+        end = min(offset + length, size)
+        return {
+            "offset": offset,
+            "end": end,
+            "size": size,
+            "content": self._decode(mm[offset:end]),
+            "next_offset": end if end < size else None,
+        }
+
+    def _read_lines(self, mm: mmap.mmap, path: str, stat: os.stat_result, start_line: int = 1, line_count: int = 50, **kwargs: Any) -> Dict[str, Any]:
+        start = self._line_index(path, stat).seek(mm, max(start_line, 1) - 1)
+        if start is None:
+            return {"start_line": start_line, "lines": [], "message": "起始行超过文件行数"}
+        lines, end, truncated = self._collect_lines(mm, start, line_count)
+        return {
+            "start_line": start_line,
+            "lines": lines,
+            "next_line": start_line + len(lines) if end < len(mm) else None,
+            "truncated": truncated,
+        }
+
+    def _tail(self, mm: mmap.mmap, path: str, stat: os.stat_result, line_count: int = 50, **kwargs: Any) -> Dict[str, Any]:
+        """从文件末尾向前查找换行符，只访问末尾的少量页面"""
+        size = len(mm)
+        end = size - 1 if mm[size - 1:size] == b"\n" else size
+        start = end
+        for _ in range(max(line_count, 1)):
+            newline = mm.rfind(b"\n", 0, start)
+            start = newline + 1
+            if newline < 0 or end - start >= self.max_output_bytes:
+                break
+            start = newline
+        else:
+            start += 1
+        if end - start > self.max_output_bytes:
+            # 超过输出上限时从上限内的第一个整行开始
+            start = self._align_to_line(mm, end - self.max_output_bytes)
+        content = self._decode(mm[start:end])
+        return {"offset": start, "size": size, "lines": content.split("\n") if content else []}
+
+    def _page(self, mm: mmap.mmap, path: str, stat: os.stat_result, page: int = 0, page_size: int = DEFAULT_PAGE_BYTES, **kwargs: Any) -> Dict[str, Any]:
+        """按字节分页，页边界对齐到下一行的行首，任意页都能直接定位"""
+        size = len(mm)
+        page_size = min(max(page_size, 1), self.max_output_bytes)
+        total_pages = (size + page_size - 1) // page_size
+        if page < 0 or page >= total_pages:
+            return {"page": page, "total_pages": total_pages, "lines": [], "message": "页码超出范围"}
+        start = self._align_to_line(mm, page * page_size)
+        end = self._align_to_line(mm, min((page + 1) * page_size, size))
+        end = min(end, start + self.max_output_bytes)
+        content = self._decode(mm[start:end]).rstrip("\n")
+        return {
+            "page": page,
+            "total_pages": total_pages,
+            "offset": start,
+            "end": end,
+            "lines": content.split("\n") if content else [],
+        }
+
+    def _grep(self, mm: mmap.mmap, path: str, stat: os.stat_result, pattern: str = "", offset: int = 0, max_matches: int = 20, ignore_case: bool = False, **kwargs: Any) -> Dict[str, Any]:
+        if not pattern:
+            raise ValueError("grep 需要提供 pattern")
+        size = len(mm)
+        offset = min(max(offset, 0), size)
+        max_matches = min(max_matches, MAX_GREP_MATCHES)
+        scan_end = min(offset + MAX_SCAN_BYTES, size)
+        regex = re.compile(pattern.encode("utf-8"), re.IGNORECASE if ignore_case else 0)
+
+        matches = []
+        output_bytes = 0
+        position = offset
+        next_offset = scan_end if scan_end < size else None
+        while position < scan_end:
+            match = regex.search(mm, position, scan_end)
+            if match is None:
+                position = scan_end
+                break
+            line_start = mm.rfind(b"\n", 0, match.start()) + 1
+            line_end = mm.find(b"\n", match.end())
+            line_end = size if line_end < 0 else line_end
+            line = self._decode(mm[line_start:min(line_end, line_start + 1024)])
+            matches.append({"offset": line_start, "line": line})
+            output_bytes += len(line)
+            position = max(line_end + 1, match.end() + 1)
+            if len(matches) >= max_matches or output_bytes >= self.max_output_bytes:
+                next_offset = position if position < size else None
+                break
+        return {
+            "pattern": pattern,
+            "scanned_from": offset,
+            "scanned_to": min(position, scan_end),
+            "matches": matches,
+            "next_offset": next_offset,
+        }
+
+    def _collect_lines(self, mm: mmap.mmap, start: int, line_count: int) -> Tuple[List[str], int, bool]:
+        """从 start 开始收集整行，总字节数不超过输出上限"""
+        lines = []
+        position = start
+        size = len(mm)
+        budget = self.max_output_bytes
+        truncated = False
+        while len(lines) < line_count and position < size:
+            newline = mm.find(b"\n", position)
+            line_end = size if newline < 0 else newline
+            if line_end - position > budget:
+                truncated = True
+                break
+            lines.append(self._decode(mm[position:line_end]))
+            budget -= line_end - position + 1
+            position = line_end + 1
+        return lines, position, truncated
+
+    @staticmethod
+    def _align_to_line(mm: mmap.mmap, position: int) -> int:
+        """把偏移量移动到所在行之后的下一行行首"""
+        if position <= 0 or position >= len(mm) or mm[position - 1:position] == b"\n":
+            return position
+        newline = mm.find(b"\n", position)
+        return len(mm) if newline < 0 else newline + 1
+
+    def _line_index(self, path: str, stat: os.stat_result) -> _LineIndex:
+        """按 (路径, 大小, 修改时间) 缓存行号索引，文件变化后重建"""
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        index = self._line_indexes.get(key)
+        if index is None:
+            index = self._line_indexes[key] = _LineIndex()
+            while len(self._line_indexes) > MAX_INDEXED_FILES:
+                self._line_indexes.popitem(last=False)
+        else:
+            self._line_indexes.move_to_end(key)
+        return index
@@ -1,57 +1,142 @@
 from langchain_core.tools import BaseTool
-from typing import Any
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
+import json
 import re
 
+# 预编译的正则表达式，所有调用共享
+WORD_PATTERN = re.compile(r'\b\w+\b')
+NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+# 单词、数字和邮箱合并为一个扫描模式，一次遍历文本即可完成统计和提取。
+# 邮箱优先匹配；单词部分不含数字，数字单独匹配，紧挨着的单词和数字再合并计为一个单词
+TOKEN_PATTERN = re.compile(
+    r'(?P<email>' + EMAIL_PATTERN.pattern + r')'
+    r'|(?P<number>' + NUMBER_PATTERN.pattern + r')'
+    r'|(?P<word>[^\W\d]+)'
+)
+
+SUPPORTED_OPERATIONS = ["word_count", "char_count", "uppercase", "lowercase", "reverse", "extract_numbers", "extract_emails"]
+# 结构化结果中每种提取结果最多返回的条数
+MAX_EXTRACTED_ITEMS = 1000
+
 class TextProcessorInput(BaseModel):
     """文本处理工具的输入模型"""
     text: str = Field(description="要处理的文本")
-    operation: str = Field(description="处理操作类型：word_count, char_count, uppercase, lowercase, reverse, extract_numbers, extract_emails")
+    operation: Optional[str] = Field(
+        default=None,
+        description="处理操作类型：word_count, char_count, uppercase, lowercase, reverse, extract_numbers, extract_emails"
+    )
+    operations: Optional[List[str]] = Field(
+        default=None,
+        description="同时执行的多个处理操作，一次遍历文本，返回JSON格式的结构化结果"
+    )
 
 class TextProcessorTool(BaseTool):
     """文本处理工具"""
-    
+
     name: str = "text_processor"
-    description: str = "执行各种文本处理操作，如统计字数、大小写转换、提取数字/邮箱等"
+    description: str = (
+        "执行各种文本处理操作，如统计字数、大小写转换、提取数字/邮箱等。"
+        "需要多项结果时用 operations 一次完成。"
+    )
     args_schema: type[BaseModel] = TextProcessorInput
-    
-    def _run(self, text: str, operation: str, **kwargs: Any) -> str:
+
+    def _run(self, text: str, operation: Optional[str] = None, operations: Optional[List[str]] = None, **kwargs: Any) -> str:
         """执行文本处理"""
         try:
-            if operation == "word_count":
-                # 改进字数统计逻辑，去除标点符号和空白字符
-                words = re.findall(r'\b\w+\b', text)
-                count = len(words)
-                return f"字数统计: {count} 个单词"
-            
-            elif operation == "char_count":
-                count = len(text)
-                return f"字符统计: {count} 个字符"
-            
-            elif operation == "uppercase":
-                return f"大写转换: {text.upper()}"
-            
-            elif operation == "lowercase":
-                return f"小写转换: {text.lower()}"
-            
-            elif operation == "reverse":
-                return f"反转文本: {text[::-1]}"
-            
-            elif operation == "extract_numbers":
-                numbers = re.findall(r'\d+(?:\.\d+)?', text)
-                return f"提取的数字: {', '.join(numbers) if numbers else '未找到数字'}"
-            
-            elif operation == "extract_emails":
-                emails = re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text)
-                return f"提取的邮箱: {', '.join(emails) if emails else '未找到邮箱地址'}"
-            
-            else:
-                supported_ops = ["word_count", "char_count", "uppercase", "lowercase", "reverse", "extract_numbers", "extract_emails"]
-                return f"不支持的操作: {operation}。支持的操作: {', '.join(supported_ops)}"
-                
+            if operations:
+                result = self.process(text, operations)
+                return f"文本处理结果: {json.dumps(result, ensure_ascii=False)}"
+
+            if operation not in SUPPORTED_OPERATIONS:
+                return f"不支持的操作: {operation}。支持的操作: {', '.join(SUPPORTED_OPERATIONS)}"
+            return self._format_single(operation, self.process(text, [operation], limit_items=False)[operation])
+
         except Exception as e:
             return f"文本处理错误: {str(e)}"
-    
-    async def _arun(self, text: str, operation: str, **kwargs: Any) -> str:
+
+    async def _arun(self, text: str, operation: Optional[str] = None, operations: Optional[List[str]] = None, **kwargs: Any) -> str:
         """异步执行文本处理"""
-        return self._run(text, operation, **kwargs)
\ No newline at end of file
+        return self._run(text, operation, operations, **kwargs)
+
+    def process(self, text: str, operations: List[str], limit_items: bool = True) -> Dict[str, Any]:
+        """一次扫描文本，同时完成所有操作，返回 {操作: 结果}"""
+        requested = list(dict.fromkeys(operations))
+        unsupported = [op for op in requested if op not in SUPPORTED_OPERATIONS]
+        requested = [op for op in requested if op in SUPPORTED_OPERATIONS]
+
+        extracted: Dict[str, List[str]] = {op: [] for op in ("extract_numbers", "extract_emails") if op in requested}
+        word_count = self._scan(text, extracted) if "word_count" in requested or extracted else 0
+
+        result: Dict[str, Any] = {}
+        for op in requested:
+            if op == "word_count":
+                result[op] = word_count
+            elif op == "char_count":
+                result[op] = len(text)
+            elif op == "uppercase":
+                result[op] = text.upper()
+            elif op == "lowercase":
+                result[op] = text.lower()
+            elif op == "reverse":
+                result[op] = text[::-1]
+            else:
+                items = extracted[op]
+                if limit_items and len(items) > MAX_EXTRACTED_ITEMS:
+                    result[op] = items[:MAX_EXTRACTED_ITEMS]
+                    result[f"{op}_total"] = len(items)
+                else:
+                    result[op] = items
+        if unsupported:
+            result["errors"] = {
+                op: f"不支持的操作。支持的操作: {', '.join(SUPPORTED_OPERATIONS)}" for op in unsupported
+            }
+        return result
+
+    @staticmethod
+    def _scan(text: str, extracted: Dict[str, List[str]]) -> int:
+        """用合并的扫描模式遍历一次文本，返回单词数（与 \\b\\w+\\b 的计数相同），
+        并把数字和邮箱追加到 extracted 中请求的列表"""
+        numbers = extracted.get("extract_numbers")
+        emails = extracted.get("extract_emails")
+        word_count = 0
+        last_end = -1
+        for match in TOKEN_PATTERN.finditer(text):
+            token = match.group()
+            kind = match.lastgroup
+            if kind == "email":
+                # 邮箱很短，其中的单词和数字单独统计
+                word_count += sum(1 for _ in WORD_PATTERN.finditer(token))
+                if emails is not None:
+                    emails.append(token)
+                if numbers is not None:
+                    numbers.extend(NUMBER_PATTERN.findall(token))
+            else:
+                # 小数点把数字分成两个单词
+                word_count += 2 if kind == "number" and "." in token else 1
+                # 与前一个单词或数字相连（如 v2、3rd）时属于同一个单词
+                if match.start() == last_end:
+                    word_count -= 1
+                if kind == "number" and numbers is not None:
+                    numbers.append(token)
+            last_end = match.end() if kind != "email" else -1
+        return word_count
+
+    @staticmethod
+    def _format_single(operation: str, value: Any) -> str:
+        """单个操作沿用原有的文本格式"""
+        if operation == "word_count":
+            return f"字数统计: {value} 个单词"
+        elif operation == "char_count":
+            return f"字符统计: {value} 个字符"
+        elif operation == "uppercase":
+            return f"大写转换: {value}"
+        elif operation == "lowercase":
+            return f"小写转换: {value}"
+        elif operation == "reverse":
+            return f"反转文本: {value}"
+        elif operation == "extract_numbers":
+            return f"提取的数字: {', '.join(value) if value else '未找到数字'}"
+        else:
+            return f"提取的邮箱: {', '.join(value) if value else '未找到邮箱地址'}"
@@ -0,0 +1,175 @@
+"""本地工具注册表
+
+本地工具来自两个来源：
+1. tools/local/manifest.json 中声明的内置工具；
+2. 第三方包通过 entry point 组 ``lang_agent.local_tools`` 注册的工具，
+   entry point 指向一个与 manifest 条目格式相同的字典（或返回该字典的函数）。
+
+注册表只读取工具的名称、描述和参数结构，工具模块在第一次被调用时才导入。
+"""
+
+import importlib
+import inspect
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from langchain_core.tools import BaseTool
+from pydantic import PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "lang_agent.local_tools"
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "local", "manifest.json")
+
+@dataclass(frozen=True)
+class LocalToolSpec:
+    """本地工具的声明信息"""
+    name: str
+    module: str
+    class_name: str
+    description: str
+    args_schema: Dict[str, Any] = field(default_factory=lambda: {"type": "object", "properties": {}})
+    # CPU密集型工具交给执行层在工作池中运行
+    cpu_bound: bool = False
+    source: str = "manifest"
+
+    @classmethod
+    def from_dict(cls, name: str, data: Dict[str, Any], source: str = "manifest") -> "LocalToolSpec":
+        missing = [key for key in ("module", "class", "description") if not data.get(key)]
+        if missing:
+            raise ValueError(f"本地工具 {name} 缺少字段: {', '.join(missing)}")
+        return cls(
+            name=name,
+            module=data["module"],
+            class_name=data["class"],
+            description=data["description"],
+            args_schema=data.get("args_schema") or {"type": "object", "properties": {}},
+            cpu_bound=bool(data.get("cpu_bound", False)),
+            source=source,
+        )
+
+class LazyLocalTool(BaseTool):
+    """延迟加载的本地工具代理
+
+    对LLM暴露声明中的名称、描述和参数结构，第一次调用时才导入并实例化真正的工具，
+    之后的调用直接转交给该实例（参数按真实工具的 args_schema 校验）。
+
+    cpu_bound 的工具设置了 executor 时，异步调用在执行层的工作池中运行。
+    """
+
+    spec: LocalToolSpec
+    executor: Optional[Any] = None
+    _tool: Optional[BaseTool] = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, spec: LocalToolSpec, **kwargs: Any):
+        super().__init__(
+            name=spec.name,
+            description=spec.description,
+            args_schema=spec.args_schema,
+            spec=spec,
+            **kwargs
+        )
+
+    @property
+    def cpu_bound(self) -> bool:
+        return self.spec.cpu_bound
+
+    @property
+    def loaded(self) -> bool:
+        return self._tool is not None
+
+    def load(self) -> BaseTool:
+        """导入并实例化真实工具"""
+        if self._tool is None:
+            with self._lock:
+                if self._tool is None:
+                    module = importlib.import_module(self.spec.module)
+                    tool_class = getattr(module, self.spec.class_name)
+                    self._tool = tool_class()
+                    logger.info(f"已加载本地工具模块: {self.spec.module}.{self.spec.class_name}")
+        return self._tool
+
+    def _prepare(self, kwargs: Dict[str, Any], run_manager: Any) -> tuple:
+        tool = self.load()
+        tool_input = tool._parse_input(kwargs, None)
+        if run_manager is not None and inspect.signature(tool._run).parameters.get("run_manager"):
+            tool_input = {**tool_input, "run_manager": run_manager}
+        return tool, tool_input
+
+    def _run(self, run_manager: Any = None, **kwargs: Any) -> Any:
+        tool, tool_input = self._prepare(kwargs, run_manager)
+        return tool._run(**tool_input)
+
+    async def _arun(self, run_manager: Any = None, **kwargs: Any) -> Any:
+        if self.executor is not None and self.cpu_bound:
+            # 参数在当前进程校验，工作进程只接收校验后的输入
+            tool_input = self.load()._parse_input(kwargs, None)
+            return await self.executor.run(self.spec.module, self.spec.class_name, tool_input)
+        tool, tool_input = self._prepare(kwargs, run_manager)
+        return await tool._arun(**tool_input)
+
+class LocalToolRegistry:
+    """本地工具注册表，按名称查找工具声明"""
+
+    def __init__(self):
+        self._specs: Dict[str, LocalToolSpec] = {}
+
+    @classmethod
+    def discover(cls, manifest_path: str = MANIFEST_PATH, include_entry_points: bool = True) -> "LocalToolRegistry":
+        """从 manifest 和 entry points 构建注册表，同名时 manifest 优先"""
+        registry = cls()
+        if include_entry_points:
+            registry.load_entry_points()
+        registry.load_manifest(manifest_path)
+        return registry
+
+    def register(self, spec: LocalToolSpec) -> None:
+        if spec.name in self._specs and self._specs[spec.name].source != spec.source:
+            logger.warning(f"本地工具 {spec.name} 重复注册，使用来自 {spec.source} 的声明")
+        self._specs[spec.name] = spec
+
+    def load_manifest(self, manifest_path: str) -> None:
+        if not os.path.exists(manifest_path):
+            logger.warning(f"本地工具清单不存在: {manifest_path}")
+            return
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        for name, data in manifest.items():
+            self.register(LocalToolSpec.from_dict(name, data, source="manifest"))
+
+    def load_entry_points(self) -> None:
+        """加载第三方包注册的工具声明（只导入声明所在的模块）"""
+        from importlib.metadata import entry_points
+
+        try:
+            eps = entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError:
+            # Python 3.9 及更早版本
+            eps = entry_points().get(ENTRY_POINT_GROUP, [])
+
+        for ep in eps:
+            try:
+                data = ep.load()
+                if callable(data):
+                    data = data()
+                self.register(LocalToolSpec.from_dict(ep.name, data, source=f"entry_point:{ep.value}"))
+            except Exception as e:
+                logger.warning(f"加载本地工具插件 {ep.name} 失败: {e}")
+
+    def get(self, name: str) -> Optional[LocalToolSpec]:
+        return self._specs.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._specs)
+
+    def create_tool(self, name: str) -> Optional[LazyLocalTool]:
+        """创建延迟加载的工具，未注册的名称返回None"""
+        spec = self.get(name)
+        if spec is None:
+            return None
+        return LazyLocalTool(spec)
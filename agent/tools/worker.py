@@ -0,0 +1,63 @@
+"""本地工具的工作进程入口
+
+由 LocalToolExecutor 提交到进程池或线程池中执行。该模块本身只导入标准库，
+工具模块在子进程中首次调用时才按需导入，子进程只加载被调用的工具及其依赖
+（langchain_core、pydantic 以及部分工具用到的 config），不加载Agent的其余模块。
+"""
+
+import importlib
+import signal
+import threading
+import time
+from typing import Any, Dict
+
+# 每个工作进程（线程池模式下为整个进程）缓存已实例化的工具
+_tool_instances: Dict[tuple, Any] = {}
+
+class CPUTimeLimitExceeded(BaseException):
+    """CPU时间超限
+
+    继承 BaseException，避免被工具内部的 ``except Exception`` 吞掉。
+    """
+
+def _raise_cpu_time_exceeded(signum, frame):
+    raise CPUTimeLimitExceeded()
+
+def _get_tool(module: str, class_name: str) -> Any:
+    key = (module, class_name)
+    if key not in _tool_instances:
+        tool_class = getattr(importlib.import_module(module), class_name)
+        _tool_instances[key] = tool_class()
+    return _tool_instances[key]
+
+def run_tool(module: str, class_name: str, tool_input: Dict[str, Any], cpu_time_limit: float = 0) -> Dict[str, Any]:
+    """执行工具的同步实现
+
+    cpu_time_limit 大于0且运行在主线程（进程池模式）时，用 ITIMER_PROF 限制本次调用的CPU时间。
+    返回执行状态、结果以及开始/结束时间，供调用方统计排队和执行耗时。
+    """
+    started_at = time.time()
+    limit_cpu = (
+        cpu_time_limit > 0
+        and hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+    )
+    if limit_cpu:
+        previous_handler = signal.signal(signal.SIGPROF, _raise_cpu_time_exceeded)
+        signal.setitimer(signal.ITIMER_PROF, cpu_time_limit)
+    try:
+        result = _get_tool(module, class_name)._run(**tool_input)
+        status = "ok"
+    except CPUTimeLimitExceeded:
+        result = None
+        status = "cpu_time_exceeded"
+    finally:
+        if limit_cpu:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, previous_handler)
+    return {
+        "status": status,
+        "result": result,
+        "started_at": started_at,
+        "finished_at": time.time(),
+    }
@@ -2,7 +2,26 @@
 
 from .trajectory_backend import (
     StorageBackend as StorageBackendInterface,
-    LocalFileBackend
+    BatchingBackend,
+    LocalFileBackend,
+    SegmentedFileBackend,
+    SegmentReader
+)
+from .blob_store import (
+    BlobStore
+)
+from .otlp_backend import (
+    OTLPBackend
+)
+from .redis_backend import (
+    RedisStreamBackend
+)
+from .sampling import (
+    SamplingBackend
+)
+from .trajectory_index import (
+    TrajectoryIndex,
+    TrajectoryStore
 )
 from .trajectory_recorder import (
     TrajectoryRecorder,
@@ -10,6 +29,13 @@ from .trajectory_recorder import (
 from .langgraph_hook import (
     TrajectoryNode
 )
+from .trace_context import (
+    TraceContext,
+    Span
+)
+from .callback_handler import (
+    TrajectoryCallbackHandler
+)
 
 __all__ = [
     # Metadata
@@ -17,11 +43,27 @@ __all__ = [
     
     # Backend
     "StorageBackendInterface",
+    "BatchingBackend",
     "LocalFileBackend",
+    "SegmentedFileBackend",
+    "SegmentReader",
+    "OTLPBackend",
+    "RedisStreamBackend",
+    "BlobStore",
+    "SamplingBackend",
+    
+    # Index & queries
+    "TrajectoryIndex",
+    "TrajectoryStore",
     
     # Recorder
     "TrajectoryRecorder",
     
+    # Tracing
+    "TraceContext",
+    "Span",
+    
     # LangGraph Integration
-    "TrajectoryNode"
+    "TrajectoryNode",
+    "TrajectoryCallbackHandler"
 ]
\ No newline at end of file
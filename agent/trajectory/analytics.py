@@ -0,0 +1,349 @@
+"""
+Aggregate statistics over stored trajectories.
+
+Scans every JSONL file (``LocalFileBackend``) or segment
+(``SegmentedFileBackend``) in parallel worker processes, streaming events
+instead of loading them, and merges the partial results:
+
+- per tool: calls, errors, error rate and latency p50/p95/p99
+- per model: calls, errors, latency percentiles and tokens
+- turns per session and tokens per turn
+- the slowest requests (traces)
+
+Latency and token percentiles come from log-bucketed histograms, so memory
+stays bounded and partial results merge exactly; values are accurate to
+about 2.5%. Latencies and tokens require span events (``TRAJECTORY_SPANS``);
+tool call counts and errors are also taken from the trajectory hook's
+"tool_call" events when no spans were recorded.
+
+Usage (from the project root):
+    python -m agent.trajectory.analytics --dir trajectories [--workers 4] [--top 10] [--json]
+"""
+
+import heapq
+import json
+import math
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .trajectory_backend import MANIFEST_NAME, SegmentReader
+
+
+
+class Histogram:
+    """A mergeable histogram with logarithmic buckets (relative error ~2.5%)."""
+
+    GROWTH = 1.05
+    _LOG_GROWTH = math.log(GROWTH)
+    # Smallest value with its own buckets; smaller values (e.g. zero tokens)
+    # share bucket 0 and are reported with an absolute error below it
+    MIN_VALUE = 0.001
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        if value >= self.MIN_VALUE:
+            bucket = int(math.log(value / self.MIN_VALUE) / self._LOG_GROWTH) + 1
+        else:
+            bucket = 0
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram") -> None:
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] += count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                if bucket == 0:
+                    return self.min
+                # Geometric middle of the bucket, clamped to the observed range
+                value = self.MIN_VALUE * self.GROWTH ** (bucket - 0.5)
+                return max(self.min, min(self.max, value))
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3),
+            "p50": round(self.percentile(0.50), 3),
+            "p95": round(self.percentile(0.95), 3),
+            "p99": round(self.percentile(0.99), 3),
+            "max": round(self.max, 3),
+        }
+
+
+@dataclass
+class CallStats:
+    """Calls, errors and latency of one tool or model."""
+    calls: int = 0
+    errors: int = 0
+    latency_ms: Histogram = field(default_factory=Histogram)
+    tokens: int = 0
+
+    def merge(self, other: "CallStats") -> None:
+        self.calls += other.calls
+        self.errors += other.errors
+        self.latency_ms.merge(other.latency_ms)
+        self.tokens += other.tokens
+
+    def summary(self) -> Dict[str, Any]:
+        latency = self.latency_ms.summary()
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.calls, 4) if self.calls else 0.0,
+            "p50_ms": latency.get("p50"),
+            "p95_ms": latency.get("p95"),
+            "p99_ms": latency.get("p99"),
+            "tokens": self.tokens,
+        }
+
+
+@dataclass
+class ScanResult:
+    """Partial statistics of one or more files/segments; results merge."""
+    events: int = 0
+    # From "span" events, which carry durations
+    tool_spans: Dict[str, CallStats] = field(default_factory=lambda: defaultdict(CallStats))
+    models: Dict[str, CallStats] = field(default_factory=lambda: defaultdict(CallStats))
+    # From the hook's "tool_call" events (counts and errors only)
+    tool_events: Dict[str, CallStats] = field(default_factory=lambda: defaultdict(CallStats))
+    turns: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    # trace_id -> tokens used by the request
+    trace_tokens: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    requests: Histogram = field(default_factory=Histogram)
+    # (duration_ms, trace_id, session_id, status, start_time) heap of the slowest requests
+    slowest: List[Tuple[float, str, str, str, str]] = field(default_factory=list)
+    top: int = 10
+
+    def add_event(self, event: Dict[str, Any]) -> None:
+        event_type = event.get("event_type")
+        if event_type == "user_input":
+            self.turns[event.get("session_id") or "default"] += 1
+        elif event_type == "tool_call":
+            tool = event.get("tool") or {}
+            stats = self.tool_events[tool.get("name") or "unknown"]
+            stats.calls += 1
+            tool_input = tool.get("input")
+            if isinstance(tool_input, dict) and tool_input.get("status") == "error":
+                stats.errors += 1
+        elif event_type == "span":
+            self._add_span(event)
+
+    def _add_span(self, event: Dict[str, Any]) -> None:
+        data = event.get("data") or {}
+        kind = data.get("kind")
+        duration = data.get("duration_ms")
+        failed = data.get("status") == "error"
+        if kind in ("tool", "llm"):
+            stats = (self.tool_spans if kind == "tool" else self.models)[data.get("name") or "unknown"]
+            stats.calls += 1
+            stats.errors += failed
+            if duration is not None:
+                stats.latency_ms.add(duration)
+            tokens = (data.get("token_usage") or {}).get("total_tokens") or 0
+            if tokens:
+                stats.tokens += tokens
+                self.trace_tokens[event.get("trace_id") or "unknown"] += tokens
+        elif kind == "request" and duration is not None:
+            self.requests.add(duration)
+            item = (duration, event.get("trace_id") or "", event.get("session_id") or "", data.get("status") or "", data.get("start_time") or "")
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, item)
+            else:
+                heapq.heappushpop(self.slowest, item)
+
+    def merge(self, other: "ScanResult") -> None:
+        self.events += other.events
+        for mine, theirs in ((self.tool_spans, other.tool_spans), (self.models, other.models), (self.tool_events, other.tool_events)):
+            for name, stats in theirs.items():
+                mine[name].merge(stats)
+        for session_id, turns in other.turns.items():
+            self.turns[session_id] += turns
+        for trace_id, tokens in other.trace_tokens.items():
+            self.trace_tokens[trace_id] += tokens
+        self.requests.merge(other.requests)
+        for item in other.slowest:
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, item)
+            else:
+                heapq.heappushpop(self.slowest, item)
+
+
+# --- scanning ---
+
+def _iter_lines(base_path: str, unit: Tuple[str, Any]) -> Iterator[str]:
+    kind, target = unit
+    if kind == "file":
+        with open(os.path.join(base_path, target), "r", encoding="utf-8") as f:
+            yield from f
+    else:
+        for block in SegmentReader(base_path).iter_blocks(target):
+            # Not str.splitlines(), which also splits on separators inside content
+            yield from block.decode("utf-8").split("\n")
+
+
+def _scan_units(args: Tuple[str, List[Tuple[str, Any]], int]) -> ScanResult:
+    """Worker entry point: scans a group of files/segments."""
+    base_path, units, top = args
+    result = ScanResult(top=top)
+    for unit in units:
+        for line in _iter_lines(base_path, unit):
+            if not line.strip():
+                continue
+            result.events += 1
+            # Only parse lines that can be relevant (a cheap substring check;
+            # false positives are filtered by add_event)
+            if '"span"' not in line and '"user_input"' not in line and '"tool_call"' not in line:
+                continue
+            try:
+                result.add_event(json.loads(line))
+            except ValueError:
+                continue
+    return result
+
+
+def storage_units(base_path: str) -> List[Tuple[str, Any]]:
+    """Lists the independently readable pieces of a trajectory directory."""
+    if (Path(base_path) / MANIFEST_NAME).exists():
+        return [("segment", segment) for segment in SegmentReader(base_path).segments()]
+    return [("file", path.name) for path in sorted(Path(base_path).glob("*.jsonl"))]
+
+
+def scan(base_path: str, workers: Optional[int] = None, top: int = 10) -> ScanResult:
+    """Scans a trajectory directory with ``workers`` processes and merges the results."""
+    units = storage_units(base_path)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(units) or 1))
+    # A few groups per worker balance the load without per-file task overhead
+    groups = [units[i::workers * 4] for i in range(min(len(units), workers * 4))]
+    result = ScanResult(top=top)
+    if workers == 1:
+        for group in groups:
+            result.merge(_scan_units((base_path, group, top)))
+        return result
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for partial in executor.map(_scan_units, [(base_path, group, top) for group in groups]):
+            result.merge(partial)
+    return result
+
+
+# --- reporting ---
+
+def build_report(result: ScanResult) -> Dict[str, Any]:
+    """Turns merged scan results into a JSON-serializable report."""
+    tools = {}
+    for name in sorted(set(result.tool_spans) | set(result.tool_events)):
+        spans, events = result.tool_spans.get(name), result.tool_events.get(name)
+        # Spans and hook events describe the same calls; spans also carry latency
+        stats = spans if spans is not None and spans.calls else events
+        summary = stats.summary()
+        if spans is None:
+            summary.update(p50_ms=None, p95_ms=None, p99_ms=None)
+        tools[name] = summary
+
+    turns = Histogram()
+    for count in result.turns.values():
+        turns.add(count)
+    tokens = Histogram()
+    for count in result.trace_tokens.values():
+        tokens.add(count)
+
+    return {
+        "events": result.events,
+        "sessions": len(result.turns),
+        "tools": tools,
+        "models": {name: stats.summary() for name, stats in sorted(result.models.items())},
+        "requests_ms": result.requests.summary(),
+        "turns_per_session": turns.summary(),
+        "tokens_per_turn": tokens.summary(),
+        "slowest_traces": [
+            {"trace_id": trace_id, "session_id": session_id, "duration_ms": round(duration, 3), "status": status, "start_time": start_time}
+            for duration, trace_id, session_id, status, start_time in sorted(result.slowest, reverse=True)
+        ],
+    }
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        # Same precision in a whole column; sub-millisecond latencies stay visible
+        return f"{value:.3f}"
+    return str(value)
+
+
+def _stats_cells(stats: Dict[str, Any], columns: List[str]) -> List[Any]:
+    return [f"{stats[c]:.2%}" if c == "error_rate" else stats[c] for c in columns]
+
+
+def _table(title: str, columns: List[str], rows: List[List[Any]]) -> List[str]:
+    cells = [[_cell(value) for value in row] for row in rows]
+    widths = [max([len(column)] + [len(row[i]) for row in cells]) for i, column in enumerate(columns)]
+    lines = [title, "  ".join(column.ljust(width) for column, width in zip(columns, widths))]
+    lines.append("  ".join("-" * width for width in widths))
+    for row in cells:
+        lines.append("  ".join(value.ljust(width) if i == 0 else value.rjust(width) for i, (value, width) in enumerate(zip(row, widths))))
+    return lines + [""]
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Formats a report as text tables."""
+    stats_columns = ["calls", "errors", "error_rate", "p50_ms", "p95_ms", "p99_ms"]
+    lines = [f"{report['events']} events in {report['sessions']} sessions", ""]
+    lines += _table("Tools", ["tool"] + stats_columns, [[name] + _stats_cells(stats, stats_columns) for name, stats in report["tools"].items()])
+    lines += _table("Models", ["model"] + stats_columns + ["tokens"], [[name] + _stats_cells(stats, stats_columns + ["tokens"]) for name, stats in report["models"].items()])
+    distribution_columns = ["count", "mean", "p50", "p95", "p99", "max"]
+    lines += _table("Distributions", ["metric"] + distribution_columns, [
+        [metric] + [report[metric].get(c) for c in distribution_columns]
+        for metric in ("requests_ms", "turns_per_session", "tokens_per_turn")
+    ])
+    lines += _table("Slowest traces", ["trace_id", "session_id", "duration_ms", "status", "start_time"], [
+        [t["trace_id"], t["session_id"], t["duration_ms"], t["status"], t["start_time"]] for t in report["slowest_traces"]
+    ])
+    return "\n".join(lines).rstrip()
+
+
+def main():
+    """Command line interface for trajectory analytics."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Aggregate tool, model and latency statistics over stored trajectories.")
+    parser.add_argument("--dir", default="trajectories", help="The directory where trajectory files are stored.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest traces to list.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+
+    if not Path(args.dir).exists():
+        print(f"Error: Trajectory directory not found: {os.path.abspath(args.dir)}")
+        return
+    report = build_report(scan(args.dir, workers=args.workers, top=args.top))
+    print(json.dumps(report, indent=2, ensure_ascii=False) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Content-addressed storage for large trajectory payloads."""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from .compression import COMPRESSIONS, compress_block, compression_of, decompress_block
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = "blobs"
+# Key marking a reference in place of an externalized value
+BLOB_REF = "$blob"
+PREVIEW_CHARS = 120
+# Event fields whose values may be externalized: AI content, tool calls and
+# tool input/output. Trace ids, timestamps and span data always stay inline.
+EXTERNALIZED_FIELDS = {"data": ("content", "tool_calls"), "tool": ("input", "output")}
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and BLOB_REF in value
+
+
+class BlobStore:
+    """
+    Stores payloads once, addressed by the SHA-256 of their JSON encoding.
+
+    Blobs live under ``<base_path>/blobs/<first 2 hex chars>/<hash><suffix>``,
+    each compressed on its own (gzip, zstd or none). Writing a payload that is
+    already stored costs a hash and a lookup in an in-memory set of known
+    hashes, so repeated tool outputs and prompts are written once.
+
+    ``externalize`` replaces large values in an event with references of the
+    form ``{"$blob": <hash>, "bytes": <size>, "preview": <start of text>}``;
+    ``resolve`` turns a reference back into the original value. The store
+    does not track references itself: ``SegmentedFileBackend`` counts them
+    per segment and calls ``remove`` for blobs no live segment references,
+    while blobs of ``LocalFileBackend`` files are kept like the files.
+    """
+
+    def __init__(self, base_path: str, compression: str = "gzip", threshold: int = 4096, max_cached: int = 256, max_known: int = 100000):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.base_path = os.path.join(base_path, BLOB_DIR)
+        self.compression = compression
+        self.suffix = {"gzip": ".gz", "zstd": ".zst", "none": ""}[compression]
+        self.threshold = threshold
+        self.max_cached = max_cached
+        self.max_known = max_known
+        self._known: "OrderedDict[str, None]" = OrderedDict()
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.blobs_written = 0
+        self.bytes_externalized = 0
+        self.bytes_written = 0
+        self.duplicates = 0
+        self.blobs_deleted = 0
+        self.stored_bytes = self._scan_stored_bytes()
+
+    def _scan_stored_bytes(self) -> int:
+        total = 0
+        if os.path.isdir(self.base_path):
+            for root, _, names in os.walk(self.base_path):
+                total += sum(os.path.getsize(os.path.join(root, name)) for name in names if not name.endswith(".tmp"))
+        return total
+
+    def _path(self, digest: str, suffix: Optional[str] = None) -> str:
+        return os.path.join(self.base_path, digest[:2], digest + (self.suffix if suffix is None else suffix))
+
+    def _find(self, digest: str) -> Optional[str]:
+        """Finds a stored blob, whatever compression it was written with."""
+        for suffix in (self.suffix, ".gz", ".zst", ""):
+            path = self._path(digest, suffix)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, data: bytes) -> str:
+        """Stores ``data`` unless already present and returns its hash."""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            known = digest in self._known
+            if known:
+                self._known.move_to_end(digest)
+        if known or self._find(digest) is not None:
+            self.duplicates += 1
+        else:
+            path = self._path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            blob = compress_block(data, self.compression)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+            self.blobs_written += 1
+            self.bytes_written += len(blob)
+            self.stored_bytes += len(blob)
+        with self._lock:
+            self._known[digest] = None
+            while len(self._known) > self.max_known:
+                self._known.popitem(last=False)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """Returns the raw (JSON) bytes of a blob."""
+        path = self._find(digest)
+        if path is None:
+            raise FileNotFoundError(f"Blob not found: {digest}")
+        with open(path, "rb") as f:
+            return decompress_block(f.read(), compression_of(path))
+
+    def size(self, digest: str) -> int:
+        """Returns the stored (compressed) size of a blob, 0 if it is missing."""
+        path = self._find(digest)
+        return os.path.getsize(path) if path is not None else 0
+
+    def remove(self, digests: Iterable[str]) -> int:
+        """Deletes blobs and returns the number of bytes freed."""
+        freed = 0
+        for digest in digests:
+            with self._lock:
+                self._known.pop(digest, None)
+            self._cache.pop(digest, None)
+            path = self._find(digest)
+            if path is None:
+                continue
+            size = os.path.getsize(path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            freed += size
+            self.blobs_deleted += 1
+        self.stored_bytes = max(self.stored_bytes - freed, 0)
+        return freed
+
+    def externalize(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns the event with large payload values replaced by references.
+
+        The event itself is not modified; changed fields are copied.
+        """
+        result = event
+        for field_name, keys in EXTERNALIZED_FIELDS.items():
+            container = event.get(field_name)
+            if not isinstance(container, dict):
+                continue
+            replaced = None
+            for key in keys:
+                value = container.get(key)
+                if value is None or isinstance(value, (int, float, bool)) or is_blob_ref(value):
+                    continue
+                if isinstance(value, str) and len(value) < self.threshold // 6:
+                    # Too short to reach the threshold even if every character
+                    # is escaped (\uXXXX)
+                    continue
+                data = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+                if len(data) < self.threshold:
+                    continue
+                ref = {BLOB_REF: self.put(data), "bytes": len(data)}
+                if isinstance(value, str):
+                    ref["preview"] = value[:PREVIEW_CHARS]
+                self.bytes_externalized += len(data)
+                if replaced is None:
+                    replaced = dict(container)
+                replaced[key] = ref
+            if replaced is not None:
+                if result is event:
+                    result = dict(event)
+                result[field_name] = replaced
+        return result
+
+    def resolve(self, value: Any) -> Any:
+        """Returns the original value of a reference; other values are returned as is."""
+        if not is_blob_ref(value):
+            return value
+        digest = value[BLOB_REF]
+        cached = self._cache.get(digest)
+        if cached is None:
+            try:
+                cached = json.loads(self.get(digest))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Cannot resolve blob {digest}: {e}")
+                return value
+            self._cache[digest] = cached
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(digest)
+        return cached
+
+    @staticmethod
+    def refs(event: Dict[str, Any]) -> Iterator[str]:
+        """Yields the hashes of the blobs an event references."""
+        for field_name, keys in EXTERNALIZED_FIELDS.items():
+            container = event.get(field_name)
+            if not isinstance(container, dict):
+                continue
+            for key in keys:
+                value = container.get(key)
+                if is_blob_ref(value):
+                    yield value[BLOB_REF]
+
+    def resolve_event(self, event: Dict[str, Any], fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Returns the event with its references resolved (only in ``fields`` when given)."""
+        result = event
+        for field_name, keys in EXTERNALIZED_FIELDS.items():
+            if fields is not None and field_name not in fields:
+                continue
+            container = event.get(field_name)
+            if not isinstance(container, dict) or not any(is_blob_ref(container.get(key)) for key in keys):
+                continue
+            if result is event:
+                result = dict(event)
+            result[field_name] = {key: self.resolve(value) if key in keys else value for key, value in container.items()}
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "blobs_written": self.blobs_written,
+            "blob_bytes_written": self.bytes_written,
+            "bytes_externalized": self.bytes_externalized,
+            "blob_duplicates": self.duplicates,
+            "blobs_deleted": self.blobs_deleted,
+            "blob_bytes_stored": self.stored_bytes,
+        }
@@ -0,0 +1,202 @@
+"""LangChain callback handler that records timed spans into the trajectory."""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from .session_tracker import SessionTracker
+from .trajectory_recorder import TrajectoryRecorder
+from .trace_context import Span, new_trace
+
+logger = logging.getLogger(__name__)
+
+
+def _token_usage(response: LLMResult) -> Optional[Dict[str, int]]:
+    """Extracts token counts from message usage metadata or provider llm_output."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return {key: usage[key] for key in ("input_tokens", "output_tokens", "total_tokens") if key in usage}
+    usage = (response.llm_output or {}).get("token_usage")
+    if usage:
+        return {
+            "input_tokens": usage.get("prompt_tokens"),
+            "output_tokens": usage.get("completion_tokens"),
+            "total_tokens": usage.get("total_tokens"),
+        }
+    return None
+
+
+def _model_name(serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+    params = kwargs.get("invocation_params") or {}
+    name = params.get("model") or params.get("model_name") or params.get("deployment_name")
+    if name:
+        return name
+    serialized = serialized or {}
+    return serialized.get("name") or (serialized.get("id") or ["llm"])[-1]
+
+
+class TrajectoryCallbackHandler(AsyncCallbackHandler):
+    """
+    Records a span for every request, graph node, LLM call and tool call.
+
+    Each top-level run (one agent invocation) starts a new trace with a
+    "request" span. Given the ``SessionTracker`` of the agent's
+    ``ReactTrajectoryHook``, the trace is started there instead, so the
+    hook records the turn's messages in the same trace. Graph nodes ("agent", "tools", "pre_model_hook",
+    "post_model_hook") become "node"/"hook" spans, and model and tool calls
+    become "llm"/"tool" spans under the node that made them. Other runnables
+    inside a node are not recorded; their children are attached to the
+    nearest recorded ancestor. Spans are recorded when they end, with their
+    duration, status and (for LLM calls) token usage and time to first token.
+
+    Attach it with ``agent.with_config(callbacks=[handler])``. Runs without
+    a ``thread_id``, or whose session is sampled out, are not recorded.
+    Callbacks from synchronous code (e.g. a model without native async
+    support) run in a helper event loop; their spans are handed back to the
+    loop the request started on, where the recorder's backend lives.
+    """
+
+    def __init__(self, recorder: TrajectoryRecorder, sessions: Optional[SessionTracker] = None):
+        self.recorder = recorder
+        self.sessions = sessions
+        self._spans: Dict[UUID, Span] = {}
+        self._sessions: Dict[UUID, str] = {}
+        # Parents of unrecorded runs, to find the nearest recorded ancestor
+        self._parents: Dict[UUID, Optional[UUID]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _recorded_ancestor(self, run_id: Optional[UUID]) -> Optional[UUID]:
+        while run_id is not None and run_id not in self._spans:
+            run_id = self._parents.get(run_id)
+        return run_id
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str, **attributes: Any) -> None:
+        self._parents[run_id] = parent_run_id
+        parent_run = self._recorded_ancestor(parent_run_id)
+        if parent_run is None:
+            return
+        self._spans[run_id] = self._spans[parent_run].context.start_span(name, kind, **attributes)
+        self._sessions[run_id] = self._sessions[parent_run]
+
+    async def _end(self, run_id: UUID, status: str = "ok", error: Optional[BaseException] = None) -> Optional[Span]:
+        self._parents.pop(run_id, None)
+        span = self._spans.pop(run_id, None)
+        session_id = self._sessions.pop(run_id, None)
+        if span is None or session_id is None:
+            return None
+        span.finish(status, f"{type(error).__name__}: {error}" if error is not None else None)
+        if self._loop is not None and self._loop is not asyncio.get_running_loop():
+            asyncio.run_coroutine_threadsafe(self._record(session_id, span), self._loop)
+        else:
+            await self._record(session_id, span)
+        return span
+
+    async def _record(self, session_id: str, span: Span) -> None:
+        try:
+            await self.recorder.record_span(session_id, span)
+        except Exception as e:
+            logger.error(f"Failed to record span {span.name}: {e}")
+
+    # --- chains (the graph itself and its nodes) ---
+
+    async def on_chain_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        metadata = metadata or {}
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+        if parent_run_id is None:
+            session_id = metadata.get("thread_id")
+            if session_id and self.recorder.should_record(session_id):
+                self._loop = asyncio.get_running_loop()
+                context = self.sessions.start_turn(session_id) if self.sessions is not None else new_trace()
+                self._spans[run_id] = context.start_span("request", "request", graph=name)
+                self._sessions[run_id] = session_id
+            return
+        if name == metadata.get("langgraph_node"):
+            self._start(run_id, parent_run_id, name, "hook" if name.endswith("_hook") else "node", step=metadata.get("langgraph_step"))
+        else:
+            self._parents[run_id] = parent_run_id
+
+    async def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        await self._end(run_id)
+
+    async def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        await self._end(run_id, "error", error)
+
+    # --- LLM calls ---
+
+    async def on_chat_model_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        messages: List[List[Any]],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start(run_id, parent_run_id, _model_name(serialized, kwargs), "llm", input_messages=sum(len(m) for m in messages))
+
+    async def on_llm_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        prompts: List[str],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start(run_id, parent_run_id, _model_name(serialized, kwargs), "llm")
+
+    async def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.get(run_id)
+        if span is not None and "time_to_first_token_ms" not in span.attributes:
+            span.attributes["time_to_first_token_ms"] = round((time.perf_counter() - span.start_time) * 1000, 3)
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.get(run_id)
+        if span is not None:
+            span.token_usage = _token_usage(response)
+        await self._end(run_id)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        await self._end(run_id, "error", error)
+
+    # --- tool calls ---
+
+    async def on_tool_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        input_str: str,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start(run_id, parent_run_id, (serialized or {}).get("name") or kwargs.get("name") or "tool", "tool")
+
+    async def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        # Tool errors handled by ToolNode (or MCP error results) come back as error ToolMessages
+        failed = getattr(output, "status", None) == "error"
+        await self._end(run_id, "error" if failed else "ok", RuntimeError(str(getattr(output, "content", ""))[:500]) if failed else None)
+
+    async def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        await self._end(run_id, "error", error)
+
+
+def create_trajectory_callback_handler(recorder: TrajectoryRecorder, sessions: Optional[SessionTracker] = None) -> TrajectoryCallbackHandler:
+    """Factory function to create a TrajectoryCallbackHandler."""
+    return TrajectoryCallbackHandler(recorder, sessions)
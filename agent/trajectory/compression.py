@@ -0,0 +1,45 @@
+"""Block compression helpers shared by the trajectory backends and readers."""
+
+import gzip
+from typing import Optional
+
+# Supported compressions and the file suffix of segments written with them
+COMPRESSIONS = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst", "none": ".jsonl"}
+
+
+def require_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            "zstd compression requires the 'zstandard' package. "
+            "Install it with `pip install zstandard` or use compression='gzip'."
+        )
+    return zstandard
+
+
+def compression_of(file_name: str) -> str:
+    """Infers the compression of a trajectory file from its suffix."""
+    if file_name.endswith(".gz"):
+        return "gzip"
+    if file_name.endswith(".zst"):
+        return "zstd"
+    return "none"
+
+
+def compress_block(data: bytes, compression: str, level: Optional[int] = None) -> bytes:
+    """Compresses one block as a self-contained gzip member / zstd frame."""
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=6 if level is None else level)
+    if compression == "zstd":
+        return require_zstandard().ZstdCompressor(level=3 if level is None else level).compress(data)
+    return data
+
+
+def decompress_block(data: bytes, compression: str) -> bytes:
+    """Decompresses one block written by ``compress_block``."""
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        return require_zstandard().ZstdDecompressor().decompress(data)
+    return data
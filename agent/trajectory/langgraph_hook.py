@@ -1,81 +1,65 @@
 """A LangGraph node for trajectory recording with full tracing capabilities."""
 
-from typing import Any, Dict, Set, List
+from typing import Any, Dict
 
-from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.messages import HumanMessage
 
 from .trajectory_recorder import TrajectoryRecorder
 from .message_processor import MessageProcessor
+from .session_tracker import SessionTracker
 from .trace_context import new_trace # Import trace context helpers
 
 class TrajectoryNode:
     """
     A LangGraph node that monitors state and records events with full trace context.
+    Only messages appended since the previous run are inspected (see ``SessionTracker``).
     """
     
-    def __init__(self, recorder: TrajectoryRecorder):
+    def __init__(self, recorder: TrajectoryRecorder, max_sessions: int = 10000, session_idle_ttl: float = 3600):
         self.recorder = recorder
         self.processor = MessageProcessor(recorder)
-        # State for each session: {session_id: {"context": TraceContext, "has_user_input": bool}}
-        self._session_states: Dict[str, Dict[str, Any]] = {}
-        self._processed_message_ids: Dict[str, Set[str]] = {}
+        self.sessions = SessionTracker(max_sessions=max_sessions, idle_ttl=session_idle_ttl)
     
     async def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """The node's main logic: check for and record new messages with tracing."""
         session_id = state.get("session_id") or state.get("thread_id", "default_session")
         
         # Initialize session state if it's the first time
-        if session_id not in self._session_states:
-            self._session_states[session_id] = {
-                "context": new_trace(),
-                "has_user_input": False,
-            }
-            self._processed_message_ids[session_id] = set()
+        session_state, created = self.sessions.get(session_id)
+        if created:
             await self.recorder.record_event(
                 session_id, "system", "session_start", 
                 {"source": "TrajectoryNode"},
-                context=self._session_states[session_id]["context"]
+                context=session_state.context
             )
 
-        session_state = self._session_states[session_id]
         messages = state.get("messages", [])
         if not messages:
             return {}
         
-        new_messages = self._get_new_messages(session_id, messages)
+        new_messages = self.sessions.new_messages(session_state, messages)
         
         if new_messages:
-            context = session_state["context"]
+            context = session_state.context
             # Check if a new trace should be started
             if any(isinstance(m, HumanMessage) for m in new_messages):
-                if session_state["has_user_input"]:
+                if session_state.has_user_input:
                     context = new_trace()
-                session_state["has_user_input"] = True
+                session_state.has_user_input = True
             
             # Process messages and get the updated context back.
             updated_context = await self.processor.process_and_record(session_id, new_messages, context)
             
             # Update the session state with the new context for the next turn.
             if updated_context:
-                session_state["context"] = updated_context
+                session_state.context = updated_context
 
         return {}
     
-    def _get_new_messages(self, session_id: str, messages: List[BaseMessage]) -> List[BaseMessage]:
-        """Identifies new messages from a list for a given session."""
-        processed_ids = self._processed_message_ids[session_id]
-        new_messages = []
-        for msg in messages:
-            msg_id = self.processor.get_message_id(msg)
-            if msg_id not in processed_ids:
-                processed_ids.add(msg_id)
-                new_messages.append(msg)
-        return new_messages
 
-
-def create_trajectory_node(recorder: TrajectoryRecorder) -> TrajectoryNode:
+def create_trajectory_node(recorder: TrajectoryRecorder, **options: Any) -> TrajectoryNode:
     """创建轨迹记录节点"""
-    return TrajectoryNode(recorder)
+    return TrajectoryNode(recorder, **options)
 
 
 # 使用示例：
@@ -0,0 +1,233 @@
+"""Exports trajectory events as OpenTelemetry spans over OTLP/HTTP."""
+
+import gzip
+import hashlib
+import json
+import logging
+import random
+import time
+import urllib.error
+import urllib.request
+import uuid
+from typing import Any, Dict, List, Optional
+
+from .trajectory_backend import BatchingBackend
+from .trajectory_index import to_epoch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENDPOINT = "http://localhost:4318/v1/traces"
+SCOPE_NAME = "lang_agent.trajectory"
+# Status codes worth retrying (as recommended by the OTLP/HTTP specification)
+RETRYABLE_STATUS = {429, 502, 503, 504}
+# Longest string attribute value; larger payloads (message contents, tool
+# outputs) are truncated
+MAX_ATTRIBUTE_LENGTH = 4096
+
+# OTLP SpanKind / StatusCode values
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_CODES = {"unset": 0, "ok": 1, "error": 2}
+SPAN_KINDS = {"request": SPAN_KIND_SERVER, "llm": SPAN_KIND_CLIENT, "tool": SPAN_KIND_CLIENT}
+
+
+def _hex_id(value: Optional[str], size: int) -> str:
+    """Maps a trajectory id to an OTLP id of ``size`` bytes (hex encoded).
+
+    UUIDs (what ``TraceContext`` generates) keep their bits; other strings
+    are hashed, so the same id always maps to the same OTLP id.
+    """
+    if not value:
+        return uuid.uuid4().hex[:size * 2]
+    try:
+        hex_value = uuid.UUID(value).hex
+    except ValueError:
+        return hashlib.blake2b(value.encode("utf-8"), digest_size=size).hexdigest()
+    return hex_value if size == 16 else hex_value[-size * 2:]
+
+
+def _any_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    return {"stringValue": value[:MAX_ATTRIBUTE_LENGTH]}
+
+
+def _attributes(values: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _any_value(value)} for key, value in values.items() if value is not None]
+
+
+def _nanos(epoch: Optional[float]) -> str:
+    return str(int((epoch if epoch is not None else time.time()) * 1e9))
+
+
+def event_to_span(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts one trajectory event to an OTLP span (JSON encoding).
+
+    "span" events become spans with their real timing, status and token
+    usage. Other events (user input, AI responses, tool calls, ...) become
+    zero-duration spans with a span id of their own, children of the span
+    they were recorded in, with the event payload as attributes.
+    """
+    data = event.get("data") or {}
+    attributes: Dict[str, Any] = {"session.id": event.get("session_id")}
+    span: Dict[str, Any] = {"traceId": _hex_id(event.get("trace_id"), 16)}
+    if event.get("event_type") == "span":
+        span["spanId"] = _hex_id(event.get("span_id"), 8)
+        parent_span_id = event.get("parent_span_id")
+    else:
+        # Several events can be recorded in the same span (e.g. session_start
+        # and the first user_input), so they cannot reuse its id.
+        span["spanId"] = _hex_id(None, 8)
+        parent_span_id = event.get("span_id") or event.get("parent_span_id")
+    if parent_span_id:
+        span["parentSpanId"] = _hex_id(parent_span_id, 8)
+
+    if event.get("event_type") == "span":
+        kind = data.get("kind")
+        start = to_epoch(data.get("start_time")) or to_epoch(event.get("timestamp"))
+        end = start + (data.get("duration_ms") or 0) / 1000 if start is not None else None
+        span.update(name=data.get("name") or kind or "span", kind=SPAN_KINDS.get(kind, SPAN_KIND_INTERNAL))
+        attributes["agent.span.kind"] = kind
+        if kind == "llm":
+            attributes["gen_ai.operation.name"] = "chat"
+            attributes["gen_ai.request.model"] = data.get("name")
+        elif kind == "tool":
+            attributes["gen_ai.operation.name"] = "execute_tool"
+            attributes["gen_ai.tool.name"] = data.get("name")
+        usage = data.get("token_usage") or {}
+        attributes["gen_ai.usage.input_tokens"] = usage.get("input_tokens")
+        attributes["gen_ai.usage.output_tokens"] = usage.get("output_tokens")
+        for key, value in (data.get("attributes") or {}).items():
+            attributes[f"agent.{key}"] = value
+        status = {"code": STATUS_CODES.get(data.get("status"), 0)}
+        if data.get("error"):
+            status["message"] = data["error"][:MAX_ATTRIBUTE_LENGTH]
+        span["status"] = status
+    else:
+        start = end = to_epoch(event.get("timestamp"))
+        span.update(name=event.get("event_type") or "event", kind=SPAN_KIND_INTERNAL)
+        attributes["agent.event_type"] = event.get("event_type")
+        attributes["agent.node"] = event.get("node_name")
+        for key in ("data", "tool", "error"):
+            if event.get(key):
+                attributes[f"agent.{key}"] = event[key]
+
+    span["startTimeUnixNano"] = _nanos(start)
+    span["endTimeUnixNano"] = _nanos(end)
+    span["attributes"] = _attributes(attributes)
+    return span
+
+
+class OTLPBackend(BatchingBackend):
+    """
+    Exports trajectory events to an OpenTelemetry collector.
+
+    Events are batched by ``BatchingBackend`` (one export request per batch,
+    never one per event), converted with ``event_to_span`` and POSTed as
+    gzip-compressed OTLP/HTTP JSON to ``endpoint``. Failed exports are retried
+    with exponential backoff (honouring ``Retry-After``) for network errors and
+    429/502/503/504 responses; other errors drop the batch.
+
+    While an export is retried no new batch is sent, so events pile up in the
+    queue; at most ``max_pending`` events are kept in memory and beyond that
+    ``overflow`` decides whether new events are dropped or the caller waits.
+
+    A ``file://`` endpoint writes each export request as one JSON line to that
+    file instead, as a stand-in for a collector when testing.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = DEFAULT_ENDPOINT,
+        headers: Optional[Dict[str, str]] = None,
+        service_name: str = "lang-agent",
+        resource_attributes: Optional[Dict[str, Any]] = None,
+        compression: str = "gzip",
+        timeout: float = 10,
+        max_retries: int = 5,
+        initial_backoff: float = 0.5,
+        max_backoff: float = 30,
+        flush_interval: float = 1.0,
+        max_batch_size: int = 512,
+        max_pending: int = 10000,
+        overflow: str = "drop",
+    ):
+        if compression not in ("gzip", "none"):
+            raise ValueError(f"Unsupported OTLP compression: {compression}")
+        super().__init__(flush_interval=flush_interval, max_batch_size=max_batch_size, max_pending=max_pending, overflow=overflow)
+        self.endpoint = endpoint
+        self.headers = headers or {}
+        self.compression = compression
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.resource = {"attributes": _attributes({"service.name": service_name, **(resource_attributes or {})})}
+        self.export_retries = 0
+        self.spans_rejected = 0
+
+    def _write_batch(self, grouped: Dict[str, List[Dict[str, Any]]]) -> None:
+        spans = [event_to_span(event) for events in grouped.values() for event in events]
+        request = {
+            "resourceSpans": [{
+                "resource": self.resource,
+                "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": spans}],
+            }]
+        }
+        body = json.dumps(request, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if self.endpoint.startswith("file://"):
+            with open(self.endpoint[len("file://"):], "ab") as f:
+                f.write(body + b"\n")
+            return
+        self._export(body)
+
+    def _export(self, body: bytes) -> None:
+        headers = {"Content-Type": "application/json", **self.headers}
+        if self.compression == "gzip":
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+
+        attempt = 0
+        while True:
+            request = urllib.request.Request(self.endpoint, data=body, headers=headers, method="POST")
+            retry_after = None
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    self._check_partial_success(response.read())
+                return
+            except urllib.error.HTTPError as e:
+                if e.code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    raise RuntimeError(f"OTLP export failed with HTTP {e.code}: {e.read()[:200]!r}") from e
+                retry_after = e.headers.get("Retry-After")
+            except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                if attempt >= self.max_retries:
+                    raise RuntimeError(f"OTLP export failed: {e}") from e
+
+            delay = min(self.max_backoff, self.initial_backoff * 2 ** attempt) * random.uniform(0.5, 1)
+            if retry_after and retry_after.isdigit():
+                delay = min(self.max_backoff, float(retry_after))
+            attempt += 1
+            self.export_retries += 1
+            time.sleep(delay)
+
+    def _check_partial_success(self, body: bytes) -> None:
+        try:
+            partial = json.loads(body or b"{}").get("partialSuccess") or {}
+        except (ValueError, AttributeError):
+            return
+        rejected = int(partial.get("rejectedSpans") or 0)
+        if rejected:
+            self.spans_rejected += rejected
+            logger.warning(f"OTLP collector rejected {rejected} spans: {partial.get('errorMessage')}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats.update(endpoint=self.endpoint, export_retries=self.export_retries, spans_rejected=self.spans_rejected)
+        return stats
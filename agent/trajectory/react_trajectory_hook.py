@@ -1,7 +1,9 @@
 """Hook for create_react_agent that implements robust, turn-based tracing."""
 
-from typing import Dict, Any, Set, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import asyncio
+import logging
+import random
 
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
 from langchain_core.runnables import RunnableConfig
@@ -9,66 +11,175 @@ from langchain_core.runnables import RunnableConfig
 from .trajectory_recorder import TrajectoryRecorder
 from .trace_context import TraceContext, new_trace
 from .message_processor import MessageProcessor  # Ensure MessageProcessor is imported
+from .session_tracker import SessionTracker
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop", "sample", "block")
+
+# A unit of work for the drain task: the session and the (message, context)
+# pairs produced by one model step. ``None`` as the message marks session_start.
+_Step = Tuple[str, List[Tuple[Optional[BaseMessage], TraceContext]]]
 
 class ReactTrajectoryHook:
     """
     Manages and records conversational turns as distinct traces.
     A new trace is started only when a new user input follows a previous one.
+
+    The hook itself never waits on storage. Each call works out the new
+    messages and their trace contexts synchronously (there is no await in
+    between, so no lock is needed) and puts one step on a bounded queue.
+    A single drain task records the steps in FIFO order, which keeps events
+    of a session in order. When the queue is full, ``overflow`` decides:
+    ``"drop"`` discards the step, ``"sample"`` starts discarding steps
+    probabilistically once the queue is half full, and ``"block"`` waits for
+    room (backpressure instead of data loss).
+
+    Per-session state lives in a ``SessionTracker``: each step only looks at
+    the messages appended since the previous step, and idle sessions are
+    evicted after ``session_idle_ttl`` seconds or beyond ``max_sessions``.
+    When a ``TrajectoryCallbackHandler`` shares the tracker, the turn uses the
+    trace its "request" span was started in, so messages and spans of one
+    turn form one trace.
     """
     
-    def __init__(self, recorder: TrajectoryRecorder):
+    def __init__(
+        self,
+        recorder: TrajectoryRecorder,
+        max_queue_size: int = 10000,
+        overflow: str = "drop",
+        max_sessions: int = 10000,
+        session_idle_ttl: float = 3600,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unsupported overflow policy: {overflow}")
         self.recorder = recorder
         # This line was missing, causing the AttributeError.
         self.processor = MessageProcessor(recorder)
-        self._lock = asyncio.Lock()
-        # State for each session: {session_id: {"context": TraceContext, "has_user_input": bool}}
-        self._session_states: Dict[str, Dict[str, Any]] = {}
-        self._processed_message_ids: Dict[str, Set[str]] = {}
+        self.max_queue_size = max_queue_size
+        self.overflow = overflow
+        self.sessions = SessionTracker(max_sessions=max_sessions, idle_ttl=session_idle_ttl)
+        self._queue: Optional[asyncio.Queue] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        self.steps_enqueued = 0
+        self.steps_dropped = 0
+        self.steps_sampled_out = 0
+        self.record_errors = 0
+        # Let recorder.flush()/close() drain this queue before the backend.
+        if hasattr(recorder, "add_producer"):
+            recorder.add_producer(self)
 
     async def __call__(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
         session_id = config.get("configurable", {}).get("thread_id")
-        if not session_id:
+        if not session_id or not self.recorder.should_record(session_id):
             return state
 
-        async with self._lock:
-            # Initialize session state if it's the first time
-            if session_id not in self._session_states:
-                self._session_states[session_id] = {
-                    "context": new_trace(),
-                    "has_user_input": False,
-                }
-                self._processed_message_ids[session_id] = set()
-                await self.recorder.record_event(
-                    session_id, "system", "session_start", 
-                    context=self._session_states[session_id]["context"]
-                )
-
-            session_state = self._session_states[session_id]
-            
-            messages = state.get("messages", [])
-            new_messages = self._get_new_messages(session_id, messages)
-
-            if not new_messages:
-                return state
-
-            # The core logic for managing traces and spans
-            for msg in new_messages:
-                context = session_state["context"]
-                
+        records: List[Tuple[Optional[BaseMessage], TraceContext]] = []
+
+        # Initialize session state if it's the first time
+        session_state, _ = self.sessions.get(session_id)
+        if not session_state.session_started:
+            session_state.session_started = True
+            records.append((None, session_state.context))
+
+        new_messages = self.sessions.new_messages(session_state, state.get("messages", []))
+        turn_context = session_state.turn_context if new_messages else None
+        session_state.turn_context = None
+
+        # The core logic for managing traces and spans
+        for msg in new_messages:
+            context = session_state.context
+
+            if turn_context is not None:
+                # The request span of this turn was started by the callback handler
+                context, turn_context = turn_context, None
                 if isinstance(msg, HumanMessage):
-                    # If a new user input arrives and we've already seen one, start a new trace.
-                    if session_state["has_user_input"]:
-                        context = new_trace()
-                    session_state["has_user_input"] = True
-                
-                # Record the event with the current context
-                await self._process_and_record_message(session_id, msg, context)
-                
-                # The current message's context becomes the context for the next message in the turn.
-                session_state["context"] = context.new_child()
-        
+                    session_state.has_user_input = True
+            elif isinstance(msg, HumanMessage):
+                # If a new user input arrives and we've already seen one, start a new trace.
+                if session_state.has_user_input:
+                    context = new_trace()
+                session_state.has_user_input = True
+
+            records.append((msg, context))
+
+            # The current message's context becomes the context for the next message in the turn.
+            session_state.context = context.new_child()
+
+        if records:
+            await self._enqueue((session_id, records))
         return state
 
+    async def _enqueue(self, step: _Step) -> None:
+        """Hands a step to the drain task according to the overflow policy."""
+        self._ensure_started()
+        if self.overflow == "block":
+            await self._queue.put(step)
+        else:
+            if self.overflow == "sample":
+                half = self.max_queue_size / 2
+                backlog = self._queue.qsize()
+                if backlog >= half and random.random() >= (self.max_queue_size - backlog) / half:
+                    self.steps_sampled_out += 1
+                    return
+            try:
+                self._queue.put_nowait(step)
+            except asyncio.QueueFull:
+                self.steps_dropped += 1
+                return
+        self.steps_enqueued += 1
+
+    def _ensure_started(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.ensure_future(self._drain_loop())
+
+    async def _drain_loop(self) -> None:
+        while True:
+            session_id, records = await self._queue.get()
+            try:
+                for msg, context in records:
+                    if msg is None:
+                        await self.recorder.record_event(session_id, "system", "session_start", context=context)
+                    else:
+                        await self._process_and_record_message(session_id, msg, context)
+            except Exception as e:
+                self.record_errors += 1
+                logger.error(f"Failed to record trajectory step for session {session_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def flush(self) -> None:
+        """Waits until every queued step has been handed to the recorder."""
+        if self._queue is None:
+            return
+        self._ensure_started()
+        await self._queue.join()
+
+    async def close(self) -> None:
+        """Drains the queue and stops the drain task."""
+        await self.flush()
+        if self._drain_task is not None:
+            self._drain_task.cancel()
+            try:
+                await self._drain_task
+            except asyncio.CancelledError:
+                pass
+            self._drain_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "overflow": self.overflow,
+            "steps_enqueued": self.steps_enqueued,
+            "steps_dropped": self.steps_dropped,
+            "steps_sampled_out": self.steps_sampled_out,
+            "record_errors": self.record_errors,
+            **self.sessions.get_stats(),
+        }
+
     async def _process_and_record_message(self, session_id: str, msg: BaseMessage, context: TraceContext):
         """Records a single, specific event for the message using the provided context."""
         if isinstance(msg, AIMessage):
@@ -79,28 +190,17 @@ class ReactTrajectoryHook:
             )
         elif isinstance(msg, ToolMessage):
             await self.recorder.record_tool_call(
-                session_id, msg.name, {"tool_call_id": msg.tool_call_id}, msg.content, context
+                session_id, msg.name, {"tool_call_id": msg.tool_call_id, "status": msg.status}, msg.content, context
             )
         elif isinstance(msg, HumanMessage):
             await self.recorder.record_event(
                 session_id, "user", "user_input", {"content": msg.content}, context
             )
 
-    def _get_new_messages(self, session_id: str, messages: List[BaseMessage]) -> List[BaseMessage]:
-        """Identifies new messages from a list for a given session."""
-        if session_id not in self._processed_message_ids:
-            self._processed_message_ids[session_id] = set()
-            
-        session_processed_ids = self._processed_message_ids[session_id]
-        new_messages = []
-        for msg in messages:
-            # Now self.processor exists and this call will succeed.
-            msg_id = self.processor.get_message_id(msg)
-            if msg_id not in session_processed_ids:
-                session_processed_ids.add(msg_id)
-                new_messages.append(msg)
-        return new_messages
-
-def create_trajectory_hook(recorder: TrajectoryRecorder) -> "ReactTrajectoryHook":
-    """Factory function to create a ReactTrajectoryHook."""
-    return ReactTrajectoryHook(recorder)
\ No newline at end of file
+def create_trajectory_hook(recorder: TrajectoryRecorder, **options: Any) -> "ReactTrajectoryHook":
+    """Factory function to create a ReactTrajectoryHook.
+
+    ``options`` are passed to ``ReactTrajectoryHook`` (max_queue_size, overflow,
+    max_sessions, session_idle_ttl).
+    """
+    return ReactTrajectoryHook(recorder, **options)
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""Stores trajectory events in Redis streams, shared by every server instance."""
+
+import json
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from .trajectory_backend import BatchingBackend
+
+DEFAULT_URL = "redis://localhost:6379/0"
+DEFAULT_PREFIX = "lang_agent:trajectory:"
+
+
+def require_redis():
+    try:
+        import redis
+    except ImportError:
+        raise ImportError(
+            "Redis storage requires the 'redis' package. "
+            "Install it with `pip install redis`."
+        )
+    return redis
+
+
+class RedisStreamBackend(BatchingBackend):
+    """
+    Appends trajectory events to Redis streams.
+
+    Each session has its own stream ``<prefix>session:<session_id>``; an entry
+    holds the event as JSON in its ``event`` field plus ``event_type`` and
+    ``trace_id`` for cheap filtering with XRANGE. The sorted set
+    ``<prefix>sessions`` maps every session to the time of its last event, so
+    sessions can be listed without scanning keys.
+
+    Events are batched by ``BatchingBackend`` and a batch is sent as one
+    pipeline (one round trip, no MULTI/EXEC), whatever the number of sessions
+    in it. ``max_stream_length`` caps each stream (approximately, with
+    ``MAXLEN ~``) and ``ttl`` (seconds) expires the streams of idle sessions
+    and drops them from ``<prefix>sessions``; both are off by default. Several server instances can share the same Redis.
+
+    ``client`` is a ``redis.Redis`` (or compatible, e.g. ``fakeredis``)
+    instance used instead of connecting to ``url``; it must not decode
+    responses.
+    """
+
+    def __init__(
+        self,
+        url: str = DEFAULT_URL,
+        prefix: str = DEFAULT_PREFIX,
+        max_stream_length: int = 0,
+        ttl: float = 0,
+        client: Optional[Any] = None,
+        flush_interval: float = 0.2,
+        max_batch_size: int = 1000,
+        max_pending: int = 10000,
+        overflow: str = "drop",
+    ):
+        super().__init__(flush_interval=flush_interval, max_batch_size=max_batch_size, max_pending=max_pending, overflow=overflow)
+        self.url = url
+        self.prefix = prefix
+        self.max_stream_length = max_stream_length
+        self.ttl = ttl
+        self.client = client if client is not None else require_redis().Redis.from_url(url)
+
+    def stream_key(self, session_id: str) -> str:
+        return f"{self.prefix}session:{session_id}"
+
+    @property
+    def sessions_key(self) -> str:
+        return f"{self.prefix}sessions"
+
+    def _write_batch(self, grouped: Dict[str, List[Dict[str, Any]]]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        now = time.time()
+        for session_id, events in grouped.items():
+            key = self.stream_key(session_id)
+            for event in events:
+                fields = {
+                    "event": json.dumps(event, ensure_ascii=False, default=str),
+                    "event_type": event.get("event_type") or "",
+                    "trace_id": event.get("trace_id") or "",
+                }
+                if self.max_stream_length:
+                    pipe.xadd(key, fields, maxlen=self.max_stream_length, approximate=True)
+                else:
+                    pipe.xadd(key, fields)
+            if self.ttl:
+                pipe.pexpire(key, int(self.ttl * 1000))
+            pipe.zadd(self.sessions_key, {session_id: now})
+        if self.ttl:
+            # Sessions whose streams have expired
+            pipe.zremrangebyscore(self.sessions_key, "-inf", now - self.ttl)
+            pipe.pexpire(self.sessions_key, int(self.ttl * 1000))
+        pipe.execute()
+
+    def _close_resources(self) -> None:
+        self.client.close()
+
+    def list_sessions(self) -> List[str]:
+        """Session ids, most recently active first."""
+        oldest = time.time() - self.ttl if self.ttl else "-inf"
+        return [s.decode("utf-8") for s in self.client.zrevrangebyscore(self.sessions_key, "+inf", oldest)]
+
+    def read_events(self, session_id: str, event_type: Optional[str] = None, trace_id: Optional[str] = None, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Yields the stored events of a session in order, optionally filtered."""
+        key = self.stream_key(session_id)
+        start = "-"
+        while True:
+            entries = self.client.xrange(key, min=start, max="+", count=batch_size)
+            for _, fields in entries:
+                if event_type and fields.get(b"event_type", b"").decode("utf-8") != event_type:
+                    continue
+                if trace_id and fields.get(b"trace_id", b"").decode("utf-8") != trace_id:
+                    continue
+                yield json.loads(fields[b"event"])
+            if len(entries) < batch_size:
+                return
+            start = "(" + entries[-1][0].decode("ascii")
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats["url"] = self.url
+        return stats
@@ -0,0 +1,472 @@
+"""
+Replays recorded trajectories through the agent to benchmark framework overhead.
+
+Each recorded session is rebuilt from its events (user inputs, AI responses
+with tool calls and tool outputs) and driven through ``create_agent`` turn by
+turn. A scripted chat model returns the recorded AI responses and stub tools
+return the recorded outputs, so no model or tool is really called and the
+measured time is the framework's own: LangGraph, the memory hook, the
+trajectory hook and recorder, and checkpoint serialization.
+
+Usage (from the project root):
+    python -m agent.trajectory.replay --dir trajectories [--session ID] [--repeat 3] [--json]
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import BaseTool
+
+from .blob_store import BLOB_DIR, BlobStore
+from .trajectory_backend import MANIFEST_NAME, SegmentReader
+from .trajectory_recorder import LOCAL_BACKENDS, TrajectoryRecorder
+from .react_trajectory_hook import create_trajectory_hook
+
+# Breakdown categories, in report order
+CATEGORIES = (
+    "langgraph",
+    "memory_hook",
+    "trajectory_hook",
+    "trajectory_recorder",
+    "checkpoint_serialization",
+    "model_stub",
+    "tool_stub",
+)
+
+
+class Timings:
+    """Accumulates time per category; safe to use from worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+
+    def add(self, category: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[category] += seconds
+            self.calls[category] += 1
+
+    def wrap(self, category: str, func: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(category, time.perf_counter() - start)
+        return timed
+
+    def wrap_async(self, category: str, func: Callable) -> Callable:
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.add(category, time.perf_counter() - start)
+        return timed
+
+
+# --- rebuilding sessions from recorded events ---
+
+@dataclass
+class Turn:
+    """One user input and what the agent did with it."""
+    user_input: Any
+    responses: List[AIMessage] = field(default_factory=list)
+    # (tool name, canonical args) -> recorded outputs, in call order
+    tool_outputs: Dict[Tuple[str, str], Deque[Any]] = field(default_factory=lambda: defaultdict(deque))
+
+
+def _args_key(name: str, args: Any) -> Tuple[str, str]:
+    return name, json.dumps(args, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def iter_stored_events(base_path: str) -> Iterator[Dict[str, Any]]:
+    """Yields every stored event, from JSONL files or from a segmented store."""
+    base = Path(base_path)
+    if (base / MANIFEST_NAME).exists():
+        yield from SegmentReader(str(base)).iter_events()
+        return
+    for file_path in sorted(base.glob("*.jsonl")):
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def build_sessions(
+    events: Iterable[Dict[str, Any]],
+    session_ids: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    blobs: Optional[BlobStore] = None,
+) -> "OrderedDict[str, List[Turn]]":
+    """Groups recorded events into sessions of turns.
+
+    A turn starts at a "user_input" event and collects the following
+    "ai_response" and "tool_call" events of the same session. Events recorded
+    before the first user input of a session are ignored. Payloads stored in
+    ``blobs`` are resolved.
+    """
+    sessions: "OrderedDict[str, List[Turn]]" = OrderedDict()
+    call_keys: Dict[str, Dict[str, Tuple[str, str]]] = defaultdict(dict)
+    for event in events:
+        session_id = event.get("session_id")
+        if not session_id or (session_ids and session_id not in session_ids):
+            continue
+        turns = sessions.get(session_id)
+        if turns is None:
+            if limit is not None and len(sessions) >= limit:
+                continue
+            turns = sessions[session_id] = []
+
+        if blobs is not None:
+            event = blobs.resolve_event(event)
+        event_type = event.get("event_type")
+        data = event.get("data") or {}
+        if event_type == "user_input":
+            turns.append(Turn(user_input=data.get("content", "")))
+        elif not turns:
+            continue
+        elif event_type == "ai_response":
+            tool_calls = data.get("tool_calls") or []
+            turns[-1].responses.append(AIMessage(content=data.get("content") or "", tool_calls=tool_calls))
+            for call in tool_calls:
+                call_keys[session_id][call.get("id")] = _args_key(call.get("name"), call.get("args") or {})
+        elif event_type == "tool_call":
+            tool = event.get("tool") or {}
+            tool_input = tool.get("input") or {}
+            call_id = tool_input.get("tool_call_id") if isinstance(tool_input, dict) else None
+            key = call_keys[session_id].get(call_id) or (tool.get("name"), None)
+            turns[-1].tool_outputs[key].append(tool.get("output"))
+
+    return OrderedDict((session_id, turns) for session_id, turns in sessions.items() if turns)
+
+
+# --- scripted model and stub tools ---
+
+class ScriptedChatModel(BaseChatModel):
+    """Returns the recorded AI responses of the current turn, in order.
+
+    Once the script is exhausted it answers with an empty message, which ends
+    the turn.
+    """
+
+    script: Any = None
+    timings: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "ScriptedChatModel":
+        return self
+
+    def _next(self) -> ChatResult:
+        start = time.perf_counter()
+        message = self.script.popleft() if self.script else AIMessage(content="")
+        result = ChatResult(generations=[ChatGeneration(message=message.model_copy())])
+        self.timings.add("model_stub", time.perf_counter() - start)
+        return result
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        return self._next()
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        return self._next()
+
+
+class RecordedTool(BaseTool):
+    """A tool that returns the output recorded for the same call."""
+
+    name: str
+    description: str = "Replays recorded tool outputs."
+    args_schema: Dict[str, Any] = {"type": "object", "properties": {}, "additionalProperties": True}
+    harness: Any = None
+
+    def _lookup(self, kwargs: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        outputs = self.harness.turn.tool_outputs
+        recorded = outputs.get(_args_key(self.name, kwargs)) or outputs.get((self.name, None))
+        output = recorded.popleft() if recorded else ""
+        self.harness.timings.add("tool_stub", time.perf_counter() - start)
+        return output
+
+    def _run(self, **kwargs: Any) -> Any:
+        return self._lookup(kwargs)
+
+    async def _arun(self, **kwargs: Any) -> Any:
+        return self._lookup(kwargs)
+
+
+class TimedSerializer:
+    """Wraps a checkpoint serializer and times (de)serialization."""
+
+    def __init__(self, serde: Any, timings: Timings):
+        self._serde = serde
+        self.dumps_typed = timings.wrap("checkpoint_serialization", serde.dumps_typed)
+        self.loads_typed = timings.wrap("checkpoint_serialization", serde.loads_typed)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._serde, name)
+
+
+class _TimedMemoryStrategy:
+    """Delegates to a memory strategy and times its pre-model hook."""
+
+    def __init__(self, strategy: Any, timings: Timings):
+        self._strategy = strategy
+        self._timings = timings
+
+    def create_pre_model_hook(self) -> Callable:
+        return self._timings.wrap("memory_hook", self._strategy.create_pre_model_hook())
+
+
+class _TimedBackend:
+    """Delegates to a trajectory backend and times ``write_event`` (enqueueing an event)."""
+
+    def __init__(self, backend: Any, timings: Timings):
+        self.backend = backend
+        self._timings = timings
+
+    async def write_event(self, event: Dict[str, Any]) -> None:
+        start = time.perf_counter()
+        try:
+            await self.backend.write_event(event)
+        finally:
+            self._timings.add("trajectory_recorder", time.perf_counter() - start)
+
+    async def flush(self) -> None:
+        await self.backend.flush()
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.backend, name)
+
+
+def _timed_backend_class(backend_class: type, timings: Timings) -> type:
+    """Subclass of a ``BatchingBackend`` that times its batch writes (in the worker thread)."""
+
+    class TimedBatchBackend(backend_class):
+        def _write_batch(self, grouped: Dict[str, List[Dict[str, Any]]]) -> None:
+            start = time.perf_counter()
+            try:
+                super()._write_batch(grouped)
+            finally:
+                timings.add("trajectory_write_thread", time.perf_counter() - start)
+
+    TimedBatchBackend.__name__ = f"Timed{backend_class.__name__}"
+    return TimedBatchBackend
+
+
+# --- the harness ---
+
+class ReplayHarness:
+    """
+    Drives recorded sessions through ``create_agent`` and measures where the
+    time goes.
+
+    ``memory_strategy`` is a memory strategy name as accepted by
+    ``create_memory_strategy`` ("none" keeps every message). With
+    ``trajectory_backend`` set, the replay is recorded again into a temporary
+    directory with that backend, so recording costs are part of the
+    measurement; ``None`` disables trajectory recording.
+    """
+
+    def __init__(
+        self,
+        sessions: "OrderedDict[str, List[Turn]]",
+        memory_strategy: str = "none",
+        trajectory_backend: Optional[str] = "file",
+        trajectory_spans: bool = True,
+        quiet: bool = True,
+    ):
+        self.sessions = sessions
+        self.memory_strategy = memory_strategy
+        self.trajectory_backend = trajectory_backend
+        self.trajectory_spans = trajectory_spans
+        self.quiet = quiet
+        self.timings = Timings()
+        self.turn: Optional[Turn] = None
+        self.turn_ms: List[float] = []
+        self.turn_seconds: Dict[str, float] = {}
+        self.drain_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    def _tool_names(self) -> List[str]:
+        names = {call["name"] for turns in self.sessions.values() for turn in turns for response in turn.responses for call in response.tool_calls}
+        names.update(name for turns in self.sessions.values() for turn in turns for name, _ in turn.tool_outputs)
+        return sorted(name for name in names if name)
+
+    def _build_agent(self, recorder: Any) -> Tuple[Any, ScriptedChatModel]:
+        from agent.agent import create_agent
+        from agent.memory_strategy import BaseMemoryStrategy, create_memory_strategy
+        from langgraph.checkpoint.memory import InMemorySaver
+        from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+        model = ScriptedChatModel(timings=self.timings)
+        tools = [RecordedTool(name=name, harness=self) for name in self._tool_names()]
+        if self.memory_strategy == "none":
+            strategy = BaseMemoryStrategy.default_strategy()
+        else:
+            strategy = create_memory_strategy(self.memory_strategy)
+        strategy = _TimedMemoryStrategy(strategy, self.timings)
+
+        hook = None
+        if recorder is not None:
+            trajectory_hook = create_trajectory_hook(recorder)
+            timed_call = self.timings.wrap_async("trajectory_hook", trajectory_hook.__call__)
+
+            async def hook(state, config):
+                return await timed_call(state, config)
+            # Shared with the callback handler, as for the hook itself
+            hook.sessions = trajectory_hook.sessions
+
+        agent = create_agent(
+            model,
+            tools,
+            use_memory=True,
+            memory_strategy=strategy,
+            use_trajectory=recorder is not None,
+            trajectory_recorder=recorder,
+            checkpointer=InMemorySaver(serde=TimedSerializer(JsonPlusSerializer(), self.timings)),
+            trajectory_hook=hook,
+            trajectory_spans=self.trajectory_spans,
+        )
+        return agent, model
+
+    def _create_recorder(self, output_dir: str) -> TrajectoryRecorder:
+        if self.trajectory_backend not in LOCAL_BACKENDS:
+            raise ValueError(f"Unsupported trajectory backend for replay: {self.trajectory_backend}")
+        backend = _timed_backend_class(LOCAL_BACKENDS[self.trajectory_backend], self.timings)(output_dir)
+        return TrajectoryRecorder(backend=_TimedBackend(backend, self.timings))
+
+    async def run(self, repeat: int = 1) -> Dict[str, Any]:
+        """Replays every session ``repeat`` times and returns the report."""
+        output_dir = tempfile.mkdtemp(prefix="trajectory-replay-") if self.trajectory_backend else None
+        recorder = self._create_recorder(output_dir) if output_dir else None
+        stdout = contextlib.redirect_stdout(io.StringIO()) if self.quiet else contextlib.nullcontext()
+        try:
+            with stdout:
+                agent, model = self._build_agent(recorder)
+                start = time.perf_counter()
+                for run in range(repeat):
+                    for session_id, turns in self.sessions.items():
+                        config = {"configurable": {"thread_id": f"replay-{run}-{session_id}"}}
+                        for turn in turns:
+                            self.turn = Turn(turn.user_input, list(turn.responses), {key: deque(outputs) for key, outputs in turn.tool_outputs.items()})
+                            model.script = deque(self.turn.responses)
+                            turn_start = time.perf_counter()
+                            await agent.ainvoke({"messages": [HumanMessage(content=self.turn.user_input)]}, config)
+                            self.turn_ms.append((time.perf_counter() - turn_start) * 1000)
+                # The breakdown covers the turns only; draining the recorder is reported on its own
+                self.turn_seconds = dict(self.timings.seconds)
+                if recorder is not None:
+                    drain_start = time.perf_counter()
+                    await recorder.flush()
+                    self.drain_seconds = time.perf_counter() - drain_start
+                # Batches are mostly written while draining, so this one is read afterwards
+                self.turn_seconds["trajectory_write_thread"] = self.timings.seconds.get("trajectory_write_thread", 0.0)
+                self.wall_seconds = time.perf_counter() - start
+        finally:
+            if recorder is not None:
+                await recorder.close()
+            if output_dir:
+                shutil.rmtree(output_dir, ignore_errors=True)
+        return self.report(repeat)
+
+    def report(self, repeat: int) -> Dict[str, Any]:
+        seconds = dict(self.turn_seconds)
+        measured = sum(seconds.get(category, 0.0) for category in CATEGORIES if category != "langgraph")
+        seconds["langgraph"] = max(sum(self.turn_ms) / 1000 - measured, 0.0)
+        turns = len(self.turn_ms)
+        ordered = sorted(self.turn_ms)
+        return {
+            "sessions": len(self.sessions),
+            "turns": turns,
+            "repeat": repeat,
+            "model_calls": self.timings.calls.get("model_stub", 0),
+            "tool_calls": self.timings.calls.get("tool_stub", 0),
+            "wall_ms": round(self.wall_seconds * 1000, 3),
+            "turns_total_ms": round(sum(self.turn_ms), 3),
+            "drain_ms": round(self.drain_seconds * 1000, 3),
+            "turn_ms": {
+                "mean": round(statistics.fmean(ordered), 3) if ordered else 0,
+                "p50": round(ordered[int(0.50 * (turns - 1))], 3) if ordered else 0,
+                "p95": round(ordered[int(0.95 * (turns - 1))], 3) if ordered else 0,
+                "max": round(ordered[-1], 3) if ordered else 0,
+            },
+            "breakdown_ms": {category: round(seconds.get(category, 0.0) * 1000, 3) for category in CATEGORIES},
+            # Runs in the backend's worker thread, concurrently with the agent
+            "trajectory_write_thread_ms": round(seconds.get("trajectory_write_thread", 0.0) * 1000, 3),
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Formats a replay report as a text table."""
+    total = report["turns_total_ms"] or 1
+    turns = report["turns"] or 1
+    lines = [
+        f"Replayed {report['sessions']} sessions x {report['repeat']}: {report['turns']} turns, "
+        f"{report['model_calls']} model calls, {report['tool_calls']} tool calls",
+        f"Wall time {report['wall_ms']:.1f} ms; per turn mean {report['turn_ms']['mean']:.2f} ms, "
+        f"p50 {report['turn_ms']['p50']:.2f} ms, p95 {report['turn_ms']['p95']:.2f} ms, max {report['turn_ms']['max']:.2f} ms",
+        f"Turns total {report['turns_total_ms']:.1f} ms; draining the trajectory recorder afterwards {report['drain_ms']:.1f} ms",
+        "",
+        f"{'category':<26}{'total ms':>12}{'per turn ms':>14}{'share':>9}",
+    ]
+    for category, ms in report["breakdown_ms"].items():
+        lines.append(f"{category:<26}{ms:>12.1f}{ms / turns:>14.3f}{ms / total:>9.1%}")
+    lines.append(f"{'(trajectory write thread)':<26}{report['trajectory_write_thread_ms']:>12.1f}{report['trajectory_write_thread_ms'] / turns:>14.3f}{'':>9}")
+    return "\n".join(lines)
+
+
+def main():
+    """Command line interface for the replay harness."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Replay recorded trajectories through the agent and report framework overhead.")
+    parser.add_argument("--dir", default="trajectories", help="The directory where trajectory files are stored.")
+    parser.add_argument("--session", action="append", dest="sessions", help="Only replay this session ID (repeatable).")
+    parser.add_argument("--limit", type=int, default=None, help="Replay at most this many sessions.")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay every session this many times.")
+    parser.add_argument("--memory-strategy", default="none", help="Memory strategy: none, sliding_window, token_limit or adaptive.")
+    parser.add_argument("--backend", default="file", help="Trajectory backend used while replaying (file, segmented), or 'none'.")
+    parser.add_argument("--no-spans", action="store_true", help="Do not record timed spans while replaying.")
+    parser.add_argument("--verbose", action="store_true", help="Show the agent's own output.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+
+    blobs = BlobStore(args.dir) if (Path(args.dir) / BLOB_DIR).exists() else None
+    sessions = build_sessions(iter_stored_events(args.dir), session_ids=args.sessions, limit=args.limit, blobs=blobs)
+    if not sessions:
+        print(f"No replayable sessions found in {os.path.abspath(args.dir)}")
+        return
+    harness = ReplayHarness(
+        sessions,
+        memory_strategy=args.memory_strategy,
+        trajectory_backend=None if args.backend == "none" else args.backend,
+        trajectory_spans=not args.no_spans,
+        quiet=not args.verbose,
+    )
+    report = asyncio.run(harness.run(repeat=args.repeat))
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Head- and tail-based sampling of trajectory events."""
+
+import hashlib
+import logging
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Optional
+
+from .trajectory_backend import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+
+def head_sampled(session_id: str, rate: float) -> bool:
+    """Stable per-session decision: the same session is always in or out."""
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    digest = hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 < rate
+
+
+def _keep_reason(event: Dict[str, Any]) -> Optional[str]:
+    """Returns why an event makes its trace worth keeping, if it does."""
+    event_type = event.get("event_type")
+    if event_type == "error":
+        return "error"
+    if event_type == "span":
+        data = event.get("data") or {}
+        if data.get("status") == "error":
+            return "tool_error" if data.get("kind") == "tool" else "error"
+    elif event_type == "tool_call":
+        tool_input = (event.get("tool") or {}).get("input")
+        if isinstance(tool_input, dict) and tool_input.get("status") == "error":
+            return "tool_error"
+    return None
+
+
+@dataclass
+class _Buffer:
+    """Events of one trace (one request) that have not been decided yet."""
+    events: Deque[Dict[str, Any]]
+    started: float = field(default_factory=time.monotonic)
+    last_event: float = field(default_factory=time.monotonic)
+    reason: Optional[str] = None
+
+
+class SamplingBackend(StorageBackend):
+    """
+    Wraps a backend and records only a sample of the sessions.
+
+    Head sampling: a fixed ``sample_rate`` of sessions (chosen by a hash of the
+    session id, so a session is either fully recorded or not at all) is passed
+    straight to the wrapped backend.
+
+    Tail sampling (``tail=True``): events of the other sessions are buffered in
+    memory per trace until the request ends, i.e. when its "request" span
+    arrives (see ``TrajectoryCallbackHandler``, which shares the turn's trace
+    with the trajectory hook), or until the trace has been idle for
+    ``tail_timeout`` seconds when spans are not recorded. The buffered events
+    are then written only if the request took at least ``slow_threshold_ms``,
+    or if it recorded an error or a failed tool call; otherwise they are
+    dropped. Events that arrive after their trace was decided (the trajectory
+    hook records asynchronously) follow that decision.
+
+    At most ``max_buffered_events`` events are kept per trace (the oldest
+    are dropped) and at most ``max_buffered_sessions`` traces are buffered
+    (the least recently active one is decided early). Events without a trace
+    id, such as MCP circuit breaker changes, are always written.
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        sample_rate: float = 1.0,
+        tail: bool = False,
+        slow_threshold_ms: float = 10000,
+        tail_timeout: float = 60,
+        max_buffered_sessions: int = 10000,
+        max_buffered_events: int = 1000,
+        max_decided_traces: int = 10000,
+    ):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"sample_rate must be between 0 and 1, got {sample_rate}")
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.tail = tail
+        self.slow_threshold_ms = slow_threshold_ms
+        self.tail_timeout = tail_timeout
+        self.max_buffered_sessions = max_buffered_sessions
+        self.max_buffered_events = max_buffered_events
+        self.max_decided_traces = max_decided_traces
+        self._buffers: "OrderedDict[str, _Buffer]" = OrderedDict()
+        # trace_id -> whether it was kept, for events arriving after the decision
+        self._decided: "OrderedDict[str, bool]" = OrderedDict()
+        self._next_sweep = 0.0
+        self.events_sampled_in = 0
+        self.events_dropped = 0
+        self.events_truncated = 0
+        self.traces_kept: Dict[str, int] = {}
+        self.traces_dropped = 0
+
+    def should_record(self, session_id: str) -> bool:
+        """Whether events of this session can end up in storage at all."""
+        return self.tail or head_sampled(session_id, self.sample_rate)
+
+    async def write_event(self, event: Dict[str, Any]) -> None:
+        session_id = event.get("session_id")
+        if not session_id or not event.get("trace_id") or head_sampled(session_id, self.sample_rate):
+            self.events_sampled_in += 1
+            await self.backend.write_event(event)
+            return
+        if not self.tail:
+            self.events_dropped += 1
+            return
+
+        now = time.monotonic()
+        trace_id = event["trace_id"]
+        decision = self._decided.get(trace_id)
+        if decision is not None:
+            await self._write_or_drop([event], decision)
+        else:
+            buffer = self._buffers.get(trace_id)
+            if buffer is None:
+                buffer = self._buffers[trace_id] = _Buffer(deque(maxlen=self.max_buffered_events))
+            else:
+                self._buffers.move_to_end(trace_id)
+            if len(buffer.events) == self.max_buffered_events:
+                self.events_truncated += 1
+            buffer.events.append(event)
+            buffer.last_event = now
+            buffer.reason = buffer.reason or _keep_reason(event)
+
+            data = event.get("data") or {}
+            if event.get("event_type") == "span" and data.get("kind") == "request":
+                if (data.get("duration_ms") or 0) >= self.slow_threshold_ms:
+                    buffer.reason = buffer.reason or "slow"
+                await self._decide(trace_id)
+
+        while len(self._buffers) > self.max_buffered_sessions:
+            await self._decide(next(iter(self._buffers)))
+        if now >= self._next_sweep:
+            self._next_sweep = now + 1
+            await self._sweep_idle(now)
+
+    async def _sweep_idle(self, now: float) -> None:
+        while self._buffers:
+            trace_id, buffer = next(iter(self._buffers.items()))
+            if now - buffer.last_event < self.tail_timeout:
+                break
+            await self._decide(trace_id)
+
+    async def _decide(self, trace_id: str) -> None:
+        """Writes or drops the buffered events of a trace."""
+        buffer = self._buffers.pop(trace_id, None)
+        if buffer is None:
+            return
+        if buffer.reason is None and (buffer.last_event - buffer.started) * 1000 >= self.slow_threshold_ms:
+            buffer.reason = "slow"
+        keep = buffer.reason is not None
+        if keep:
+            self.traces_kept[buffer.reason] = self.traces_kept.get(buffer.reason, 0) + 1
+        else:
+            self.traces_dropped += 1
+        self._decided[trace_id] = keep
+        self._decided.move_to_end(trace_id)
+        while len(self._decided) > self.max_decided_traces:
+            self._decided.popitem(last=False)
+        await self._write_or_drop(buffer.events, keep)
+
+    async def _write_or_drop(self, events, keep: bool) -> None:
+        if not keep:
+            self.events_dropped += len(events)
+            return
+        self.events_sampled_in += len(events)
+        for event in events:
+            await self.backend.write_event(event)
+
+    async def flush(self) -> None:
+        """Flushes the wrapped backend; undecided buffers stay in memory."""
+        await self._sweep_idle(time.monotonic())
+        if hasattr(self.backend, "flush"):
+            await self.backend.flush()
+
+    async def close(self) -> None:
+        """Decides every buffered trace, then closes the wrapped backend."""
+        while self._buffers:
+            await self._decide(next(iter(self._buffers)))
+        if hasattr(self.backend, "close"):
+            await self.backend.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.backend.get_stats() if hasattr(self.backend, "get_stats") else {}
+        stats["sampling"] = {
+            "sample_rate": self.sample_rate,
+            "tail": self.tail,
+            "events_sampled_in": self.events_sampled_in,
+            "events_dropped": self.events_dropped,
+            "events_truncated": self.events_truncated,
+            "buffered_traces": len(self._buffers),
+            "buffered_events": sum(len(b.events) for b in self._buffers.values()),
+            "traces_kept": dict(self.traces_kept),
+            "traces_dropped": self.traces_dropped,
+        }
+        return stats
@@ -0,0 +1,141 @@
+"""Per-session bookkeeping shared by the trajectory hooks."""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from .trace_context import TraceContext, new_trace
+
+
+@dataclass
+class SessionState:
+    """Trace state and high-water mark of one session."""
+    context: TraceContext = field(default_factory=new_trace)
+    has_user_input: bool = False
+    session_started: bool = False
+    # Trace of the request in progress, started by the callback handler and
+    # taken over by the trajectory hook with the first new message of the turn
+    turn_context: Optional[TraceContext] = None
+    # Number of messages already seen, and the last of them (its id, or the
+    # object itself when it has no id) to detect rewritten histories.
+    seen: int = 0
+    last_marker: Any = None
+    last_active: float = field(default_factory=time.monotonic)
+
+
+def _marker(msg: BaseMessage) -> Any:
+    return getattr(msg, "id", None) or msg
+
+
+def _matches(msg: BaseMessage, marker: Any) -> bool:
+    msg_id = getattr(msg, "id", None)
+    if msg_id is not None and isinstance(marker, str):
+        return msg_id == marker
+    return msg is marker
+
+
+class SessionTracker:
+    """
+    Tracks which messages of each session have already been recorded.
+
+    Message lists in agent state are append-only between steps, so instead of
+    remembering every message id, each session keeps a high-water mark: the
+    number of messages seen and the last one of them. A step then only looks
+    at the messages appended after the mark. If the history was rewritten
+    (e.g. trimmed by a memory strategy), the mark is searched backwards from
+    the end; if it cannot be found, or the session is unknown (first call or
+    evicted), tracking restarts at the last HumanMessage so old history is
+    not recorded again.
+
+    The tracker lives in one process. When several server instances share a
+    checkpointer, a thread can move between them (A -> B -> A): the new
+    messages then span turns handled by the other instance. A turn starts
+    with its user input, so only the messages from the last new
+    HumanMessage on are recorded; earlier ones were recorded where those
+    turns ran. (An instance seeing a session for the first time also
+    records its own session_start event.)
+
+    Sessions idle for longer than ``idle_ttl`` seconds, or beyond
+    ``max_sessions`` (least recently used first), are evicted.
+    """
+
+    def __init__(self, max_sessions: int = 10000, idle_ttl: float = 3600):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def get(self, session_id: str) -> Tuple[SessionState, bool]:
+        """Returns the session state and whether it was just created."""
+        now = time.monotonic()
+        self._evict_idle(now)
+        state = self._sessions.get(session_id)
+        created = state is None
+        if created:
+            state = self._sessions[session_id] = SessionState()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._sessions.move_to_end(session_id)
+        state.last_active = now
+        return state, created
+
+    def start_turn(self, session_id: str) -> TraceContext:
+        """Starts the trace of a new request and returns its root context.
+
+        The first turn of a session continues the session's trace (the one
+        its session_start event is recorded in); later turns get a new one.
+        """
+        state, _ = self.get(session_id)
+        state.turn_context = state.context if not state.has_user_input else new_trace()
+        return state.turn_context
+
+    def new_messages(self, state: SessionState, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Returns the messages appended since the last call and advances the mark."""
+        start = self._find_start(state, messages)
+        if messages:
+            state.seen = len(messages)
+            state.last_marker = _marker(messages[-1])
+        return messages[start:]
+
+    def _find_start(self, state: SessionState, messages: List[BaseMessage]) -> int:
+        start = self._find_mark(state, messages)
+        for index in range(len(messages) - 1, start, -1):
+            if isinstance(messages[index], HumanMessage):
+                # Earlier turns ran on another instance
+                return index
+        return start
+
+    def _find_mark(self, state: SessionState, messages: List[BaseMessage]) -> int:
+        if state.last_marker is not None:
+            seen = state.seen
+            if 0 < seen <= len(messages) and _matches(messages[seen - 1], state.last_marker):
+                return seen
+            for index in range(len(messages) - 1, -1, -1):
+                if _matches(messages[index], state.last_marker):
+                    return index + 1
+        for index in range(len(messages) - 1, -1, -1):
+            if isinstance(messages[index], HumanMessage):
+                return index
+        return 0
+
+    def _evict_idle(self, now: float) -> None:
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if now - state.last_active <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def get_stats(self) -> dict:
+        return {"sessions": len(self._sessions), "evictions": self.evictions}
@@ -1,7 +1,9 @@
 """
 Defines the TraceContext for managing distributed tracing information.
 """
+import time
 import uuid
+from datetime import datetime
 from typing import Optional, Dict, Any
 from dataclasses import dataclass, field
 
@@ -26,6 +28,10 @@ class TraceContext:
             parent_span_id=self.span_id  # The current span becomes the parent of the new one.
         )
 
+    def start_span(self, name: str, kind: str, **attributes: Any) -> 'Span':
+        """Starts a timed span as a child of this context."""
+        return Span(name=name, kind=kind, context=self.new_child(), attributes=attributes)
+
     def to_dict(self) -> Dict[str, Any]:
         """Converts the context to a dictionary for embedding in log events."""
         data = {
@@ -36,6 +42,63 @@ class TraceContext:
             data["parent_span_id"] = self.parent_span_id
         return data
 
+@dataclass
+class Span:
+    """
+    A timed operation within a trace (a graph node, an LLM call, a tool call...).
+
+    Durations use the monotonic ``time.perf_counter`` clock; ``start_wall`` is
+    the wall-clock start time, for display and correlation only.
+
+    Attributes:
+        name: The operation name, e.g. the node, model or tool name.
+        kind: The operation category: "request", "node", "hook", "llm" or "tool".
+        context: The span's own trace context (its span_id identifies the span).
+        status: "unset" while running, then "ok" or "error".
+        token_usage: Token counts reported by the model, if any.
+    """
+    name: str
+    kind: str
+    context: TraceContext
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start_time: float = field(default_factory=time.perf_counter)
+    start_wall: float = field(default_factory=time.time)
+    end_time: Optional[float] = None
+    status: str = "unset"
+    error: Optional[str] = None
+    token_usage: Optional[Dict[str, int]] = None
+
+    def finish(self, status: str = "ok", error: Optional[str] = None) -> 'Span':
+        """Ends the span; calling it again has no effect."""
+        if self.end_time is None:
+            self.end_time = time.perf_counter()
+            self.status = status
+            self.error = error
+        return self
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_time is None:
+            return None
+        return (self.end_time - self.start_time) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Converts the span to the data payload of a "span" event."""
+        data: Dict[str, Any] = {
+            "name": self.name,
+            "kind": self.kind,
+            "status": self.status,
+            "start_time": datetime.fromtimestamp(self.start_wall).isoformat(),
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+        }
+        if self.error:
+            data["error"] = self.error
+        if self.token_usage:
+            data["token_usage"] = self.token_usage
+        if self.attributes:
+            data["attributes"] = self.attributes
+        return data
+
 def new_trace() -> TraceContext:
     """Factory function to create a new root trace context."""
     return TraceContext(trace_id=str(uuid.uuid4()))
\ No newline at end of file
@@ -1,37 +1,602 @@
 """Storage backends for trajectory data."""
 
+import asyncio
 import json
+import logging
 import os
-from typing import Any, Optional, Protocol, Dict
-import aiofiles
+import time
+import zlib
+from collections import Counter, OrderedDict
+from typing import Any, Optional, Protocol, Dict, Iterable, Iterator, List, IO, Set
+
+from .blob_store import BlobStore
+from .compression import COMPRESSIONS, compress_block, require_zstandard
+from .trajectory_index import TrajectoryIndex
+
+logger = logging.getLogger(__name__)
 
 
 class StorageBackend(Protocol):
     """A simple protocol for writing trajectory events"""
-    
+
     async def write_event(self, event: Dict[str, Any]) -> None:
         """Write a single event to the storage backend."""
         pass
 
-class LocalFileBackend(StorageBackend):
+class BatchingBackend(StorageBackend):
+    """
+    Base class for backends that persist events in batches.
+
+    ``write_event`` only enqueues the event. A background task drains the
+    queue every ``flush_interval`` seconds (or as soon as ``max_batch_size``
+    events are pending), groups the events by session and hands the batch to
+    ``_write_batch``, which runs in a worker thread. ``flush()`` makes it write
+    what is pending right away instead of waiting out ``flush_interval``.
+
+    With ``max_pending`` > 0 at most that many events wait in memory; once
+    the queue is full ``write_event`` either drops the event
+    (``overflow="drop"``) or waits for room (``overflow="block"``).
+
+    When a subclass sets ``self.blobs`` (a ``BlobStore``), large payloads are
+    moved to it in the worker thread before ``_write_batch`` sees the batch.
+
+    Subclasses implement ``_write_batch`` and optionally ``_close_resources``.
+    """
+
+    def __init__(self, flush_interval: float = 0.2, max_batch_size: int = 1000, max_pending: int = 0, overflow: str = "drop"):
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"Unsupported overflow policy: {overflow}")
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+        self.overflow = overflow
+        self._queue: Optional[asyncio.Queue] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        # Set while flush() waits, so the drain loop writes without waiting out flush_interval
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._flush_waiters = 0
+        self._closed = False
+        self.events_written = 0
+        self.batches_written = 0
+        self.write_errors = 0
+        self.events_dropped = 0
+        self.blobs: Optional[BlobStore] = None
+
+    async def write_event(self, event: Dict[str, Any]) -> None:
+        """Enqueue a single event; it is persisted by the drain task."""
+        if self._closed:
+            raise RuntimeError("Backend is closed")
+        if not event.get("session_id", "default"):
+            return
+        self._ensure_started()
+        if self.overflow == "block":
+            await self._queue.put(event)
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.events_dropped += 1
+
+    def _ensure_started(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._flush_requested = asyncio.Event()
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.ensure_future(self._drain_loop())
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _drain_loop(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch_size:
+                # Take what is already queued without waiting; wait_for is
+                # only used when the queue is empty.
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.max_batch_size or remaining <= 0 or self._flush_requested.is_set():
+                    break
+                get = asyncio.ensure_future(self._queue.get())
+                flush = asyncio.ensure_future(self._flush_requested.wait())
+                done, _ = await asyncio.wait({get, flush}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                flush.cancel()
+                if get not in done:
+                    # A cancelled get leaves its event in the queue
+                    get.cancel()
+                    break
+                batch.append(get.result())
+            await self._persist(batch)
+
+    async def _persist(self, batch: List[Dict[str, Any]]) -> None:
+        grouped: Dict[str, List[Dict[str, Any]]] = OrderedDict()
+        for event in batch:
+            session_id = event.get("session_id") or "default"
+            grouped.setdefault(session_id, []).append(event)
+        try:
+            await asyncio.to_thread(self._externalize_and_write, grouped)
+            self.events_written += len(batch)
+            self.batches_written += 1
+        except Exception as e:
+            self.write_errors += 1
+            logger.error(f"Failed to write trajectory batch of {len(batch)} events: {e}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _externalize_and_write(self, grouped: Dict[str, List[Dict[str, Any]]]) -> None:
+        if self.blobs is not None:
+            grouped = OrderedDict(
+                (session_id, [self.blobs.externalize(event) for event in events])
+                for session_id, events in grouped.items()
+            )
+        self._write_batch(grouped)
+
+    def _write_batch(self, grouped: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Persist one batch of events grouped by session (runs in a worker thread)."""
+        raise NotImplementedError
+
+    def _close_resources(self) -> None:
+        """Release backend resources (runs in a worker thread)."""
+
+    async def flush(self) -> None:
+        """Wait until every event enqueued so far has been written."""
+        if self._queue is None:
+            return
+        if self._drain_task is None or self._drain_task.done():
+            self._ensure_started()
+        self._flush_waiters += 1
+        self._flush_requested.set()
+        try:
+            await self._queue.join()
+        finally:
+            self._flush_waiters -= 1
+            if not self._flush_waiters:
+                self._flush_requested.clear()
+
+    async def close(self) -> None:
+        """Flush pending events, stop the drain task and release resources."""
+        if self._closed:
+            return
+        await self.flush()
+        self._closed = True
+        if self._drain_task is not None:
+            self._drain_task.cancel()
+            try:
+                await self._drain_task
+            except asyncio.CancelledError:
+                pass
+        await asyncio.to_thread(self._close_resources)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {
+            "pending": self.pending,
+            "events_written": self.events_written,
+            "batches_written": self.batches_written,
+            "write_errors": self.write_errors,
+            "events_dropped": self.events_dropped,
+        }
+        if self.blobs is not None:
+            stats.update(self.blobs.get_stats())
+        return stats
+
+class LocalFileBackend(BatchingBackend):
     """
     A simple local file storage backend for trajectory data.
     Stores trajectory data in JSON files.
+
+    Events are appended in batches, one write per session per batch, through
+    a bounded LRU of open file handles. ``fsync`` controls durability:
+    ``"never"`` leaves flushing to the OS, ``"batch"`` fsyncs every file
+    touched by a batch. With ``index`` enabled, the byte range of each
+    session's append is added to the sidecar ``TrajectoryIndex``. With
+    ``blob_threshold`` > 0, payloads of at least that many bytes are stored
+    once in a gzip ``BlobStore`` under ``blobs/`` and referenced from events.
     """
-    
-    def __init__(self, base_path: str = "./trajectories"):
+
+    def __init__(
+        self,
+        base_path: str = "./trajectories",
+        flush_interval: float = 0.2,
+        max_batch_size: int = 1000,
+        max_open_files: int = 64,
+        fsync: str = "never",
+        index: bool = True,
+        blob_threshold: int = 0,
+    ):
+        super().__init__(flush_interval=flush_interval, max_batch_size=max_batch_size)
+        if fsync not in ("never", "batch"):
+            raise ValueError(f"Unsupported fsync policy: {fsync}")
         self.base_path = base_path
+        self.blobs = BlobStore(base_path, threshold=blob_threshold) if blob_threshold > 0 else None
+        self.max_open_files = max_open_files
+        self.fsync = fsync
+        self._handles: "OrderedDict[str, IO[bytes]]" = OrderedDict()
         os.makedirs(self.base_path, exist_ok=True)
-    
+        self.index = TrajectoryIndex(self.base_path) if index else None
+
+    def _get_handle(self, session_id: str) -> IO[bytes]:
+        handle = self._handles.get(session_id)
+        if handle is not None:
+            self._handles.move_to_end(session_id)
+            return handle
+        while len(self._handles) >= self.max_open_files:
+            _, oldest = self._handles.popitem(last=False)
+            oldest.close()
+        file_path = os.path.join(self.base_path, f"{session_id}.jsonl")
+        handle = open(file_path, mode='ab')
+        self._handles[session_id] = handle
+        return handle
+
+    def _write_batch(self, grouped: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Append each session's events with a single write call."""
+        chunks = []
+        for session_id, events in grouped.items():
+            handle = self._get_handle(session_id)
+            data = "".join(json.dumps(event, ensure_ascii=False, default=str) + "\n" for event in events).encode("utf-8")
+            chunks.append((f"{session_id}.jsonl", handle.tell(), len(data), 0, events))
+            handle.write(data)
+            handle.flush()
+            if self.fsync == "batch":
+                os.fsync(handle.fileno())
+        if self.index is not None:
+            self.index.add_chunks(chunks)
+
+    def _close_resources(self) -> None:
+        while self._handles:
+            _, handle = self._handles.popitem(last=False)
+            handle.close()
+        if self.index is not None:
+            self.index.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(), "open_files": len(self._handles)}
+
+MANIFEST_NAME = "manifest.json"
+BLOB_REFS_SUFFIX = ".blobs"
+READ_CHUNK_SIZE = 1024 * 1024
 
-    async def write_event(self, event: Dict[str, Any]) -> None:
-        """Write a single event to a local JSON file."""
-        session_id = event.get("session_id", "default")
 
-        if not session_id:
+class SegmentedFileBackend(BatchingBackend):
+    """
+    Stores events of many sessions in a small number of compressed segment files.
+
+    Every batch becomes one compressed block (a standalone gzip member or
+    zstd frame) appended to the active segment, so a segment is a valid
+    compressed stream and each block can also be decompressed on its own.
+    The active segment is sealed when it reaches ``max_segment_bytes`` or
+    ``max_segment_age`` seconds; sealed segments are deleted once the total
+    size exceeds ``retention_bytes`` or they are older than
+    ``retention_seconds`` (0 disables either limit).
+
+    ``manifest.json`` in ``base_path`` lists the segments with their size,
+    event count and time range and is rewritten after every batch;
+    ``SegmentReader`` uses it to read them back.
+    With ``index`` enabled, each session's lines in a block are added to the
+    sidecar ``TrajectoryIndex``. With ``blob_threshold`` > 0, payloads of at
+    least that many bytes are stored once in a ``BlobStore`` (same
+    compression) under ``blobs/`` and referenced from events. The blobs a
+    segment references are listed in a ``<segment>.blobs`` sidecar; blob
+    bytes count towards ``retention_bytes`` and a blob is deleted together
+    with the last segment referencing it.
+    """
+
+    def __init__(
+        self,
+        base_path: str = "./trajectories",
+        flush_interval: float = 0.2,
+        max_batch_size: int = 1000,
+        compression: str = "gzip",
+        compression_level: Optional[int] = None,
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        max_segment_age: float = 3600,
+        retention_bytes: int = 0,
+        retention_seconds: float = 0,
+        fsync: str = "never",
+        index: bool = True,
+        blob_threshold: int = 0,
+    ):
+        super().__init__(flush_interval=flush_interval, max_batch_size=max_batch_size)
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        if compression == "zstd":
+            require_zstandard()
+        if fsync not in ("never", "batch"):
+            raise ValueError(f"Unsupported fsync policy: {fsync}")
+        self.base_path = base_path
+        self.blobs = BlobStore(base_path, compression=compression, threshold=blob_threshold) if blob_threshold > 0 else None
+        self.compression = compression
+        self.compression_level = compression_level
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+        self.fsync = fsync
+        self.segments_rotated = 0
+        self.segments_deleted = 0
+        self._active: Optional[Dict[str, Any]] = None
+        self._handle: Optional[IO[bytes]] = None
+        os.makedirs(self.base_path, exist_ok=True)
+        self._manifest = self._load_manifest()
+        self.index = TrajectoryIndex(self.base_path) if index else None
+        # Blob references per segment and the number of segments referencing each blob
+        self._segment_blobs: Dict[str, Set[str]] = {}
+        self._blob_refs: Counter = Counter()
+        if self.blobs is not None:
+            self._load_blob_refs()
+
+    # --- manifest ---
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.base_path, MANIFEST_NAME)
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        path = self._manifest_path()
+        manifest = {"version": 1, "segments": []}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        # Segments left open by a previous process are sealed as they are;
+        # a truncated last block is skipped by the reader.
+        for segment in manifest["segments"]:
+            if not segment.get("sealed"):
+                segment["sealed"] = True
+                file_path = os.path.join(self.base_path, segment["name"])
+                segment["bytes"] = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        return manifest
+
+    def _save_manifest(self) -> None:
+        path = self._manifest_path()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    # --- blob references ---
+
+    def _blob_refs_path(self, segment_name: str) -> str:
+        return os.path.join(self.base_path, segment_name + BLOB_REFS_SUFFIX)
+
+    def _load_blob_refs(self) -> None:
+        """Loads the blob references of every segment, rebuilding missing sidecars."""
+        reader = SegmentReader(self.base_path)
+        for segment in self._manifest["segments"]:
+            path = self._blob_refs_path(segment["name"])
+            if os.path.exists(path):
+                with open(path, "r", encoding="ascii") as f:
+                    digests = {line.strip() for line in f if line.strip()}
+            else:
+                # Written before blob references were tracked
+                digests = {
+                    digest
+                    for block in reader.iter_blocks(segment)
+                    for line in block.split(b"\n") if line
+                    for digest in BlobStore.refs(json.loads(line))
+                }
+                self._append_blob_refs(segment["name"], digests)
+            self._segment_blobs[segment["name"]] = digests
+            self._blob_refs.update(digests)
+
+    def _append_blob_refs(self, segment_name: str, digests: Iterable[str]) -> None:
+        with open(self._blob_refs_path(segment_name), "a", encoding="ascii") as f:
+            f.write("".join(digest + "\n" for digest in digests))
+
+    def _add_blob_refs(self, segment_name: str, digests: Set[str]) -> None:
+        """Records that a segment references these blobs, before the block is written."""
+        known = self._segment_blobs.setdefault(segment_name, set())
+        new = digests - known
+        if not new:
             return
+        self._append_blob_refs(segment_name, sorted(new))
+        known.update(new)
+        self._blob_refs.update(new)
 
-        file_path = os.path.join(self.base_path, f"{session_id}.jsonl")
+    # --- segments ---
+
+    def _open_segment(self) -> None:
+        sequence = max((s["sequence"] for s in self._manifest["segments"]), default=0) + 1
+        segment = {
+            "name": f"segment-{sequence:08d}{COMPRESSIONS[self.compression]}",
+            "sequence": sequence,
+            "compression": self.compression,
+            "created_at": time.time(),
+            "sealed": False,
+            "bytes": 0,
+            "blocks": 0,
+            "events": 0,
+            "first_timestamp": None,
+            "last_timestamp": None,
+        }
+        self._handle = open(os.path.join(self.base_path, segment["name"]), "ab")
+        self._active = segment
+        self._manifest["segments"].append(segment)
+        self._save_manifest()
+
+    def _seal_segment(self) -> None:
+        if self._active is None:
+            return
+        self._handle.close()
+        self._active["sealed"] = True
+        self._active["sealed_at"] = time.time()
+        self._handle = None
+        self._active = None
+        self.segments_rotated += 1
+
+    def _should_rotate(self) -> bool:
+        segment = self._active
+        return segment is not None and (
+            segment["bytes"] >= self.max_segment_bytes
+            or (self.max_segment_age > 0 and time.time() - segment["created_at"] >= self.max_segment_age)
+        )
+
+    def _apply_retention(self, protected: Iterable[str] = ()) -> bool:
+        """Deletes the oldest sealed segments beyond the retention limits.
+
+        Blobs no remaining segment references are deleted with them, except
+        ``protected`` ones, referenced by the batch being written.
+        """
+        sealed = [s for s in self._manifest["segments"] if s.get("sealed")]
+        total = sum(s["bytes"] for s in self._manifest["segments"])
+        if self.blobs is not None:
+            total += self.blobs.stored_bytes
+        protected = set(protected)
+        cutoff = time.time() - self.retention_seconds if self.retention_seconds > 0 else None
+        expired, unreferenced = [], []
+        for segment in sealed:
+            too_big = self.retention_bytes > 0 and total > self.retention_bytes
+            too_old = cutoff is not None and segment.get("sealed_at", segment["created_at"]) < cutoff
+            if not (too_big or too_old):
+                break
+            expired.append(segment)
+            total -= segment["bytes"]
+            for digest in self._segment_blobs.pop(segment["name"], ()):
+                self._blob_refs[digest] -= 1
+                if self._blob_refs[digest] <= 0:
+                    del self._blob_refs[digest]
+                    if digest not in protected:
+                        unreferenced.append(digest)
+                        total -= self.blobs.size(digest)
+        for segment in expired:
+            for path in (os.path.join(self.base_path, segment["name"]), self._blob_refs_path(segment["name"])):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._manifest["segments"].remove(segment)
+            if self.index is not None:
+                self.index.remove_file(segment["name"])
+            self.segments_deleted += 1
+        if unreferenced:
+            self.blobs.remove(unreferenced)
+        return bool(expired)
+
+    def _write_batch(self, grouped: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Compresses the whole batch, grouped by session, into one block."""
+        events = [event for session_events in grouped.values() for event in session_events]
+        blob_refs = {digest for event in events for digest in BlobStore.refs(event)} if self.blobs is not None else set()
+        if self._should_rotate():
+            self._seal_segment()
+            self._apply_retention(protected=blob_refs)
+        if self._active is None:
+            self._open_segment()
+        if blob_refs:
+            self._add_blob_refs(self._active["name"], blob_refs)
+
+        data = "".join(json.dumps(event, ensure_ascii=False, default=str) + "\n" for event in events)
+        block = compress_block(data.encode("utf-8"), self.compression, self.compression_level)
+        offset = self._handle.tell()
+        self._handle.write(block)
+        self._handle.flush()
+        if self.fsync == "batch":
+            os.fsync(self._handle.fileno())
+
+        segment = self._active
+        segment["bytes"] += len(block)
+        segment["blocks"] += 1
+        segment["events"] += len(events)
+        timestamps = [event["timestamp"] for event in events if event.get("timestamp")]
+        if timestamps:
+            first, last = min(timestamps), max(timestamps)
+            if segment["first_timestamp"] is None or first < segment["first_timestamp"]:
+                segment["first_timestamp"] = first
+            if segment["last_timestamp"] is None or last > segment["last_timestamp"]:
+                segment["last_timestamp"] = last
+        if self.index is not None:
+            chunks, first_line = [], 0
+            for session_events in grouped.values():
+                chunks.append((segment["name"], offset, len(block), first_line, session_events))
+                first_line += len(session_events)
+            self.index.add_chunks(chunks)
+        if self._should_rotate():
+            self._seal_segment()
+        # Keep the manifest current for readers and enforce retention
+        # (including age-based expiry) without waiting for a rotation.
+        self._apply_retention()
+        self._save_manifest()
+
+    def _close_resources(self) -> None:
+        self._seal_segment()
+        self._apply_retention()
+        self._save_manifest()
+        if self.index is not None:
+            self.index.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        segments = self._manifest["segments"]
+        return {
+            **super().get_stats(),
+            "segments": len(segments),
+            "segment_bytes": sum(s["bytes"] for s in segments),
+            "segments_rotated": self.segments_rotated,
+            "segments_deleted": self.segments_deleted,
+        }
+
+
+class SegmentReader:
+    """Reads events back from a ``SegmentedFileBackend`` directory."""
+
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+
+    def segments(self) -> List[Dict[str, Any]]:
+        path = os.path.join(self.base_path, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["segments"]
+
+    def iter_blocks(self, segment: Dict[str, Any]) -> Iterator[bytes]:
+        """Yields the decompressed blocks of a segment; a truncated tail is skipped."""
+        file_path = os.path.join(self.base_path, segment["name"])
+        compression = segment.get("compression", "gzip")
+        if not os.path.exists(file_path):
+            return
+        if compression == "none":
+            with open(file_path, "rb") as f:
+                yield f.read()
+            return
+        if compression == "gzip":
+            decompressor_factory = lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            zstd = require_zstandard()
+            decompressor_factory = lambda: zstd.ZstdDecompressor().decompressobj()
+        with open(file_path, "rb") as f:
+            decompressor = decompressor_factory()
+            parts: List[bytes] = []
+            started = False
+            pending = b""
+            while True:
+                if not pending:
+                    pending = f.read(READ_CHUNK_SIZE)
+                    if not pending:
+                        break
+                try:
+                    parts.append(decompressor.decompress(pending))
+                except Exception as e:
+                    logger.warning(f"Skipping unreadable data in {segment['name']}: {e}")
+                    return
+                started = True
+                if decompressor.eof:
+                    yield b"".join(parts)
+                    pending = decompressor.unused_data
+                    decompressor = decompressor_factory()
+                    parts = []
+                    started = False
+                else:
+                    pending = b""
+            if started:
+                logger.warning(f"Skipping truncated block at the end of {segment['name']}")
 
-        async with aiofiles.open(file_path, mode='a', encoding='utf-8') as f:
-            await f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    def iter_events(self, session_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Yields events in write order, optionally only those of one session."""
+        for segment in self.segments():
+            for block in self.iter_blocks(segment):
+                for line in block.splitlines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if session_id is None or event.get("session_id") == session_id:
+                        yield event
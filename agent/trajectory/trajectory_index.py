@@ -0,0 +1,340 @@
+"""Sidecar index and query API for stored trajectory events."""
+
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .compression import compression_of, decompress_block
+
+INDEX_NAME = "index.sqlite3"
+# Number of cached term ids (session, trace, event type and file names)
+MAX_CACHED_TERMS = 100000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    value TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    first_line INTEGER NOT NULL,
+    line_count INTEGER NOT NULL,
+    session_id INTEGER NOT NULL,
+    min_time REAL,
+    max_time REAL
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_session ON chunks (session_id, id);
+CREATE INDEX IF NOT EXISTS idx_chunks_file ON chunks (file_id);
+CREATE INDEX IF NOT EXISTS idx_chunks_time ON chunks (max_time);
+CREATE TABLE IF NOT EXISTS chunk_terms (
+    term_id INTEGER NOT NULL,
+    chunk_id INTEGER NOT NULL,
+    events INTEGER NOT NULL,
+    min_time REAL,
+    PRIMARY KEY (term_id, chunk_id)
+) WITHOUT ROWID;
+"""
+
+
+def to_epoch(timestamp: Optional[str]) -> Optional[float]:
+    """Converts an ISO timestamp (as written by the recorder) to epoch seconds."""
+    if not timestamp:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class IndexChunk:
+    """Consecutive events of one session: lines ``first_line`` to
+    ``first_line + line_count`` of the ``length`` bytes at ``offset`` in
+    ``file`` (decompressed first when the file is a compressed segment)."""
+    id: int
+    file: str
+    offset: int
+    length: int
+    first_line: int
+    line_count: int
+    session_id: str
+
+
+class TrajectoryIndex:
+    """
+    SQLite index of where each session's events are stored.
+
+    Backends write events in chunks: the events of one session in one batch
+    are contiguous lines of one write (a JSONL append or a compressed
+    segment block). The index stores one row per chunk plus one row per
+    trace id and event type occurring in it (with its event count and
+    earliest timestamp in the chunk), with strings interned in a ``terms``
+    table, so it stays small compared to the data.
+
+    Backends add chunks from their writer thread; readers open their own
+    connection. WAL mode lets both run at the same time.
+    """
+
+    def __init__(self, base_path: str, readonly: bool = False):
+        self.path = os.path.join(base_path, INDEX_NAME)
+        if readonly:
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            if not self._has_term_times():
+                # Indexes written before chunk_terms.min_time existed
+                self._conn.execute("ALTER TABLE chunk_terms ADD COLUMN min_time REAL")
+        self._terms: Dict[str, int] = {}
+
+    def _has_term_times(self) -> bool:
+        return any(row[1] == "min_time" for row in self._conn.execute("PRAGMA table_info(chunk_terms)"))
+
+    @staticmethod
+    def exists(base_path: str) -> bool:
+        return os.path.exists(os.path.join(base_path, INDEX_NAME))
+
+    # --- writing ---
+
+    def _term_id(self, value: str) -> int:
+        term_id = self._terms.get(value)
+        if term_id is None:
+            self._conn.execute("INSERT OR IGNORE INTO terms (value) VALUES (?)", (value,))
+            term_id = self._conn.execute("SELECT id FROM terms WHERE value = ?", (value,)).fetchone()[0]
+            if len(self._terms) >= MAX_CACHED_TERMS:
+                self._terms.clear()
+            self._terms[value] = term_id
+        return term_id
+
+    def add_chunks(self, chunks: Iterable[Tuple[str, int, int, int, Sequence[Dict[str, Any]]]]) -> None:
+        """Adds ``(file, offset, length, first_line, events)`` chunks in one transaction.
+
+        ``events`` are the events of one session, in the order of their lines.
+        """
+        with self._conn:
+            for file, offset, length, first_line, events in chunks:
+                times = [t for t in (to_epoch(event.get("timestamp")) for event in events) if t is not None]
+                cursor = self._conn.execute(
+                    "INSERT INTO chunks (file_id, offset, length, first_line, line_count, session_id, min_time, max_time) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        self._term_id(f"file:{file}"), offset, length, first_line, len(events),
+                        self._term_id(f"session:{events[0].get('session_id') or 'default'}"),
+                        min(times) if times else None,
+                        max(times) if times else None,
+                    ),
+                )
+                # term -> [event count, earliest timestamp]
+                terms: Dict[str, List[Any]] = {}
+                for event in events:
+                    timestamp = to_epoch(event.get("timestamp"))
+                    for term in (f"trace:{event.get('trace_id') or ''}", f"type:{event.get('event_type') or ''}"):
+                        stats = terms.setdefault(term, [0, None])
+                        stats[0] += 1
+                        if timestamp is not None and (stats[1] is None or timestamp < stats[1]):
+                            stats[1] = timestamp
+                self._conn.executemany(
+                    "INSERT INTO chunk_terms (term_id, chunk_id, events, min_time) VALUES (?, ?, ?, ?)",
+                    [(self._term_id(term), cursor.lastrowid, count, min_time) for term, (count, min_time) in terms.items()],
+                )
+
+    def remove_file(self, file: str) -> None:
+        """Drops the chunks of a deleted file (e.g. an expired segment)."""
+        term_id = self._lookup(f"file:{file}")
+        if term_id is None:
+            return
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM chunk_terms WHERE chunk_id IN (SELECT id FROM chunks WHERE file_id = ?)", (term_id,)
+            )
+            self._conn.execute("DELETE FROM chunks WHERE file_id = ?", (term_id,))
+
+    # --- reading ---
+
+    def _lookup(self, value: str) -> Optional[int]:
+        row = self._conn.execute("SELECT id FROM terms WHERE value = ?", (value,)).fetchone()
+        return row[0] if row else None
+
+    def query_chunks(
+        self,
+        session_id: Optional[str] = None,
+        trace_id: Optional[str] = None,
+        event_type: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        from_chunk: int = 0,
+        limit: int = 100,
+    ) -> List[IndexChunk]:
+        """Returns up to ``limit`` chunks that may contain matching events, with id >= ``from_chunk``."""
+        clauses, params = ["c.id >= ?"], [from_chunk]
+        if session_id is not None:
+            term_id = self._lookup(f"session:{session_id}")
+            if term_id is None:
+                return []
+            clauses.append("c.session_id = ?")
+            params.append(term_id)
+        terms = []
+        if trace_id is not None:
+            terms.append(f"trace:{trace_id}")
+        if event_type is not None:
+            terms.append(f"type:{event_type}")
+        for term in terms:
+            term_id = self._lookup(term)
+            if term_id is None:
+                return []
+            clauses.append("c.id IN (SELECT chunk_id FROM chunk_terms WHERE term_id = ?)")
+            params.append(term_id)
+        if since is not None:
+            clauses.append("c.max_time >= ?")
+            params.append(self._bound(since))
+        if until is not None:
+            clauses.append("c.min_time < ?")
+            params.append(self._bound(until))
+        params.append(limit)
+        rows = self._conn.execute(
+            "SELECT c.id, f.value, c.offset, c.length, c.first_line, c.line_count, s.value "
+            "FROM chunks c JOIN terms f ON f.id = c.file_id JOIN terms s ON s.id = c.session_id "
+            f"WHERE {' AND '.join(clauses)} ORDER BY c.id LIMIT ?",
+            params,
+        ).fetchall()
+        return [
+            IndexChunk(chunk_id, file[len("file:"):], offset, length, first_line, line_count, session[len("session:"):])
+            for chunk_id, file, offset, length, first_line, line_count, session in rows
+        ]
+
+    @staticmethod
+    def _bound(timestamp: str) -> float:
+        value = to_epoch(timestamp)
+        if value is None:
+            raise ValueError(f"Invalid timestamp: {timestamp}")
+        return value
+
+    def traces(self, session_id: str) -> List[Tuple[str, int, Optional[str]]]:
+        """Returns (trace_id, event count, first timestamp) of a session, oldest first.
+
+        Events recorded without trace context have the trace id ``""``.
+        """
+        term_id = self._lookup(f"session:{session_id}")
+        if term_id is None:
+            return []
+        # Older indexes only know the time range of the whole chunk
+        first_time = "COALESCE(ct.min_time, c.min_time)" if self._has_term_times() else "c.min_time"
+        rows = self._conn.execute(
+            f"SELECT t.value, SUM(ct.events), MIN({first_time}) FROM chunks c "
+            "JOIN chunk_terms ct ON ct.chunk_id = c.id JOIN terms t ON t.id = ct.term_id "
+            "WHERE c.session_id = ? AND t.value LIKE 'trace:%' GROUP BY ct.term_id ORDER BY MIN(c.id)",
+            (term_id,),
+        ).fetchall()
+        return [
+            (value[len("trace:"):], count, datetime.fromtimestamp(first).isoformat() if first is not None else None)
+            for value, count, first in rows
+        ]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class TrajectoryStore:
+    """
+    Query API over an indexed trajectory directory.
+
+    The index narrows a query down to the chunks that can contain matching
+    events; only those byte ranges are read, so memory use depends on the
+    page size, not on the size of the session or the directory. Decompressed
+    blocks are cached in a small LRU because the chunks of several sessions
+    share a segment block.
+
+    Pages are addressed with opaque cursors (``"<chunk id>:<line>"``).
+    """
+
+    CHUNKS_PER_QUERY = 64
+
+    def __init__(self, base_path: str, block_cache_size: int = 16):
+        self.base_path = base_path
+        self.index = TrajectoryIndex(base_path, readonly=True)
+        self.block_cache_size = block_cache_size
+        self._blocks: "OrderedDict[Tuple[str, int], List[bytes]]" = OrderedDict()
+
+    def find_events(
+        self,
+        session_id: Optional[str] = None,
+        trace_id: Optional[str] = None,
+        event_type: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Returns one page of events in write order and the cursor of the next page (None at the end)."""
+        from_chunk, skip = (int(part) for part in cursor.split(":")) if cursor else (0, 0)
+        events: List[Dict[str, Any]] = []
+        while True:
+            chunks = self.index.query_chunks(
+                session_id, trace_id, event_type, since, until, from_chunk=from_chunk, limit=self.CHUNKS_PER_QUERY
+            )
+            for chunk in chunks:
+                lines = self._chunk_lines(chunk)
+                for line_number in range(skip if chunk.id == from_chunk else 0, len(lines)):
+                    event = json.loads(lines[line_number])
+                    if not self._matches(event, session_id, trace_id, event_type, since, until):
+                        continue
+                    events.append(event)
+                    if len(events) == limit:
+                        return events, f"{chunk.id}:{line_number + 1}"
+            if len(chunks) < self.CHUNKS_PER_QUERY:
+                return events, None
+            from_chunk, skip = chunks[-1].id + 1, 0
+
+    def iter_events(self, page_size: int = 500, **filters: Any) -> Iterator[Dict[str, Any]]:
+        """Streams all matching events page by page."""
+        cursor = None
+        while True:
+            events, cursor = self.find_events(cursor=cursor, limit=page_size, **filters)
+            yield from events
+            if cursor is None:
+                return
+
+    def traces(self, session_id: str) -> List[Tuple[str, int, Optional[str]]]:
+        return self.index.traces(session_id)
+
+    @staticmethod
+    def _matches(event: Dict[str, Any], session_id, trace_id, event_type, since, until) -> bool:
+        if session_id is not None and (event.get("session_id") or "default") != session_id:
+            return False
+        if trace_id is not None and (event.get("trace_id") or "") != trace_id:
+            return False
+        if event_type is not None and event.get("event_type") != event_type:
+            return False
+        timestamp = event.get("timestamp")
+        if since is not None and (timestamp is None or timestamp < since):
+            return False
+        if until is not None and (timestamp is None or timestamp >= until):
+            return False
+        return True
+
+    def _chunk_lines(self, chunk: IndexChunk) -> List[bytes]:
+        key = (chunk.file, chunk.offset)
+        lines = self._blocks.get(key)
+        if lines is not None:
+            self._blocks.move_to_end(key)
+        else:
+            with open(os.path.join(self.base_path, chunk.file), "rb") as f:
+                f.seek(chunk.offset)
+                data = f.read(chunk.length)
+            lines = decompress_block(data, compression_of(chunk.file)).splitlines()
+            self._blocks[key] = lines
+            while len(self._blocks) > self.block_cache_size:
+                self._blocks.popitem(last=False)
+        return lines[chunk.first_line:chunk.first_line + chunk.line_count]
+
+    def close(self) -> None:
+        self.index.close()
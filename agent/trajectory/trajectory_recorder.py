@@ -1,11 +1,14 @@
 """A simplified, stateless trajectory recorder that accepts trace context."""
 
-from typing import Any, Optional, Dict
+from typing import Any, Optional, Dict, List
 from datetime import datetime
 
 from langchain_core.messages import BaseMessage
-from .trajectory_backend import StorageBackend, LocalFileBackend
-from .trace_context import TraceContext  # Import the new context class
+from .trajectory_backend import StorageBackend, LocalFileBackend, SegmentedFileBackend
+from .sampling import SamplingBackend
+from .otlp_backend import OTLPBackend
+from .redis_backend import RedisStreamBackend
+from .trace_context import TraceContext, Span  # Import the new context class
 
 class TrajectoryRecorder:
     """
@@ -15,6 +18,17 @@ class TrajectoryRecorder:
     
     def __init__(self, backend: Optional[StorageBackend] = None):
         self.backend = backend or LocalFileBackend()
+        # Components that buffer events before calling the recorder (e.g. hooks)
+        self._producers: List[Any] = []
+
+    def add_producer(self, producer: Any) -> None:
+        """Registers a buffering producer so flush()/close() drain it first."""
+        self._producers.append(producer)
+
+    def should_record(self, session_id: str) -> bool:
+        """Whether the backend may keep events of this session (False when sampled out)."""
+        should_record = getattr(self.backend, "should_record", None)
+        return should_record(session_id) if should_record is not None else True
 
     async def _write_event(self, event: Dict[str, Any], context: Optional[TraceContext] = None):
         """Internal helper to format and write the event."""
@@ -42,6 +56,10 @@ class TrajectoryRecorder:
         }
         await self._write_event(event, context)
 
+    async def record_span(self, session_id: str, span: Span):
+        """Records a finished span (timing, status, token usage) under its own context."""
+        await self.record_event(session_id, span.name, "span", span.to_dict(), span.context)
+
     async def record_error(self, session_id: str, error_type: str, error_message: str, node_name: Optional[str] = None, context: Optional[TraceContext] = None):
         """Records an error event with optional trace context."""
         event = {
@@ -51,7 +69,54 @@ class TrajectoryRecorder:
         }
         await self._write_event(event, context)
 
-def create_local_recorder(base_path: str = "./trajectories") -> TrajectoryRecorder:
-    """Creates a recorder with a local file backend."""
-    backend = LocalFileBackend(base_path)
+    async def flush(self):
+        """Waits until buffered events have been persisted, if the backend buffers."""
+        for producer in self._producers:
+            await producer.flush()
+        if hasattr(self.backend, "flush"):
+            await self.backend.flush()
+
+    async def close(self):
+        """Flushes buffered events and releases backend resources."""
+        for producer in self._producers:
+            await producer.close()
+        if hasattr(self.backend, "close"):
+            await self.backend.close()
+
+LOCAL_BACKENDS = {
+    "file": LocalFileBackend,
+    "segmented": SegmentedFileBackend,
+}
+
+# Backends that do not store under base_path
+REMOTE_BACKENDS = {
+    "otlp": OTLPBackend,
+    "redis": RedisStreamBackend,
+}
+
+def create_local_recorder(
+    base_path: str = "./trajectories",
+    backend: str = "file",
+    sampling: Optional[Dict[str, Any]] = None,
+    **backend_options: Any
+) -> TrajectoryRecorder:
+    """Creates a recorder with a local file backend.
+
+    ``backend`` selects ``LocalFileBackend`` ("file", one JSONL file per
+    session) or ``SegmentedFileBackend`` ("segmented", compressed segments
+    shared by all sessions), exports to an OpenTelemetry collector with
+    ``OTLPBackend`` ("otlp") or appends to Redis streams with
+    ``RedisStreamBackend`` ("redis"); the remote backends do not use
+    ``base_path``. ``backend_options``
+    are passed to its constructor. ``sampling`` holds ``SamplingBackend`` options; the backend is only wrapped
+    when they actually sample (a rate below 1 or tail sampling).
+    """
+    if backend in REMOTE_BACKENDS:
+        backend = REMOTE_BACKENDS[backend](**backend_options)
+    elif backend in LOCAL_BACKENDS:
+        backend = LOCAL_BACKENDS[backend](base_path, **backend_options)
+    else:
+        raise ValueError(f"Unsupported trajectory backend: {backend}")
+    if sampling and (sampling.get("sample_rate", 1.0) < 1 or sampling.get("tail")):
+        backend = SamplingBackend(backend, **sampling)
     return TrajectoryRecorder(backend=backend)
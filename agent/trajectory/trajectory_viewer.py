@@ -1,23 +1,33 @@
+import itertools
 import json
 from collections import defaultdict
 from pathlib import Path
+from typing import Iterator, Optional, Tuple
 import os
 
+from .blob_store import BLOB_DIR, BlobStore
+from .trajectory_backend import MANIFEST_NAME, SegmentReader
+from .trajectory_index import TrajectoryIndex, TrajectoryStore
+
 class TrajectoryViewer:
     """
     用于查看和展示 trajectory 历史记录的工具。
     """
 
-    def __init__(self, trajectories_dir: str = "trajectories"):
+    def __init__(self, trajectories_dir: str = "trajectories", resolve_blobs: bool = True):
         """
         初始化 TrajectoryViewer。
 
         Args:
             trajectories_dir (str): 存储 trajectory 文件的目录。
+            resolve_blobs (bool): 显示事件时是否读取 blobs/ 中的大内容；否则只显示引用和预览。
         """
         self.trajectories_dir = Path(trajectories_dir)
         if not self.trajectories_dir.exists():
             raise FileNotFoundError(f"Trajectory directory not found: {self.trajectories_dir.resolve()}")
+        self.blobs = None
+        if resolve_blobs and (self.trajectories_dir / BLOB_DIR).exists():
+            self.blobs = BlobStore(str(self.trajectories_dir))
 
     def _find_trajectory_file(self, session_id: str) -> Path:
         """
@@ -28,6 +38,10 @@ class TrajectoryViewer:
             return file_path
         raise FileNotFoundError(f"No trajectory file found for session_id '{session_id}' in {self.trajectories_dir}")
 
+    def _is_segmented(self) -> bool:
+        """目录中存在 manifest.json 时为分段存储（SegmentedFileBackend）。"""
+        return (self.trajectories_dir / MANIFEST_NAME).exists()
+
     def _load_events(self, file_path: Path) -> list:
         """从 .jsonl 文件加载事件。"""
         events = []
@@ -50,48 +64,93 @@ class TrajectoryViewer:
             
         return grouped_events
 
-    def display(self, session_id: str):
+    def _iter_indexed_traces(self, session_id: str, trace_id: Optional[str] = None, event_type: Optional[str] = None) -> Iterator[Tuple[str, Iterator[dict]]]:
+        """通过索引逐个 trace 分页读取事件，不需要把整个会话载入内存。"""
+        store = TrajectoryStore(str(self.trajectories_dir))
+        try:
+            for indexed_trace_id, _count, _first_timestamp in store.traces(session_id):
+                if trace_id is not None and indexed_trace_id != trace_id:
+                    continue
+                events = store.iter_events(session_id=session_id, trace_id=indexed_trace_id, event_type=event_type)
+                first = next(events, None)
+                if first is not None:
+                    yield indexed_trace_id or "unknown_trace", itertools.chain([first], events)
+        finally:
+            store.close()
+
+    def _iter_loaded_traces(self, session_id: str, trace_id: Optional[str] = None, event_type: Optional[str] = None) -> Iterator[Tuple[str, Iterator[dict]]]:
+        """没有索引时（旧数据）读取整个会话并按 trace 分组。"""
+        if self._is_segmented():
+            print(f"🔎 Reading trajectory segments in: {self.trajectories_dir}")
+            events = list(SegmentReader(str(self.trajectories_dir)).iter_events(session_id))
+        else:
+            file_path = self._find_trajectory_file(session_id)
+            print(f"🔎 Found trajectory file: {file_path}")
+            events = self._load_events(file_path)
+        if event_type is not None:
+            events = [event for event in events if event.get("event_type") == event_type]
+
+        grouped_events = self._group_by_trace(events)
+
+        # 按第一个事件的时间戳对 trace_id 进行排序
+        sorted_trace_ids = sorted(grouped_events.keys(), 
+                                  key=lambda tid: grouped_events[tid][0].get("timestamp", "") if grouped_events[tid] else "")
+        for grouped_trace_id in sorted_trace_ids:
+            if trace_id is None or grouped_trace_id == trace_id:
+                yield grouped_trace_id, iter(grouped_events[grouped_trace_id])
+
+    def display(self, session_id: str, trace_id: Optional[str] = None, event_type: Optional[str] = None):
         """
         显示指定 session_id 的 trajectory 历史。
 
         Args:
             session_id (str): 要显示的会话ID。
+            trace_id (str): 只显示该 trace 的事件。
+            event_type (str): 只显示该类型的事件。
         """
         try:
-            file_path = self._find_trajectory_file(session_id)
-            print(f"🔎 Found trajectory file: {file_path}")
+            traces = None
+            if TrajectoryIndex.exists(str(self.trajectories_dir)):
+                # 索引中没有该会话时（例如启用索引前写入的文件）回退到整体读取
+                traces = self._iter_indexed_traces(session_id, trace_id, event_type)
+                first_trace = next(traces, None)
+                if first_trace is None:
+                    traces = None
+                else:
+                    print(f"🔎 Using trajectory index in: {self.trajectories_dir}")
+                    traces = itertools.chain([first_trace], traces)
+            if traces is None:
+                traces = self._iter_loaded_traces(session_id, trace_id, event_type)
+
             print(f"\n{'='*60}")
             print(f"📜 Trajectory for Session ID: {session_id}")
             print(f"{'='*60}\n")
 
-            events = self._load_events(file_path)
-            if not events:
-                print("No events found in the trajectory file.")
-                return
-
-            grouped_events = self._group_by_trace(events)
-
-            # 按第一个事件的时间戳对 trace_id 进行排序
-            sorted_trace_ids = sorted(grouped_events.keys(), 
-                                      key=lambda tid: grouped_events[tid][0].get("timestamp", "") if grouped_events[tid] else "")
-
-            for trace_id in sorted_trace_ids:
-                print(f"--- Trace ID: {trace_id} ---")
-                trace_events = grouped_events[trace_id]
+            found = False
+            for current_trace_id, trace_events in traces:
+                found = True
+                print(f"--- Trace ID: {current_trace_id} ---")
                 
                 for event in trace_events:
+                    if self.blobs is not None:
+                        # 只在显示时读取被引用的内容，且只读取要显示的 data 字段
+                        event = self.blobs.resolve_event(event, fields=("data",))
                     timestamp = event.get("timestamp", "N/A")
-                    event_type = event.get("event_type", "unknown")
+                    current_event_type = event.get("event_type", "unknown")
                     span_id = event.get("span_id", "N/A")
                     parent_span_id = event.get("parent_span_id", "None")
                     data = json.dumps(event.get("data", {}), ensure_ascii=False, indent=2)
                     
-                    print(f"\n[{timestamp}] 🔹 {event_type}")
+                    print(f"\n[{timestamp}] 🔹 {current_event_type}")
                     print(f"  - Span ID: {span_id}")
                     print(f"  - Parent Span ID: {parent_span_id}")
                     print(f"  - Data:\n{self._indent_text(data, 4)}")
                 
                 print(f"\n--- End of Trace ---")
+
+            if not found:
+                print("No events found in the trajectory file.")
+                return
             
             print(f"\n{'='*60}")
             print("✅ Trajectory display finished.")
@@ -114,6 +173,9 @@ def main():
     parser = argparse.ArgumentParser(description="Display trajectory history for a given session ID.")
     parser.add_argument("session_id", help="The session ID to display the trajectory for.")
     parser.add_argument("--dir", default="trajectories", help="The directory where trajectory files are stored.")
+    parser.add_argument("--trace", default=None, help="Only display events of this trace ID.")
+    parser.add_argument("--type", default=None, dest="event_type", help="Only display events of this type.")
+    parser.add_argument("--no-blobs", action="store_true", help="Show blob references instead of loading large payloads.")
     
     args = parser.parse_args()
     
@@ -122,8 +184,8 @@ def main():
     project_root = Path(__file__).parent.parent.parent
     trajectories_path = project_root / args.dir
 
-    viewer = TrajectoryViewer(trajectories_dir=str(trajectories_path))
-    viewer.display(args.session_id)
+    viewer = TrajectoryViewer(trajectories_dir=str(trajectories_path), resolve_blobs=not args.no_blobs)
+    viewer.display(args.session_id, trace_id=args.trace, event_type=args.event_type)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,10 +1,10 @@
 import asyncio
 import uuid
 from contextlib import asynccontextmanager
-from typing import Optional, AsyncGenerator, List, Dict, Any
+from typing import Optional, AsyncGenerator, List, Dict, Any, Literal
 
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware  # 添加这行
 from pydantic import BaseModel, Field
@@ -17,12 +17,19 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, project_root)
 
 # --- 导入Agent核心组件 ---
-from agent.agent import create_agent, stream_agent  # 删除 invoke_agent
+from agent.agent import create_agent, stream_agent, stream_agent_messages  # 删除 invoke_agent
 from agent.llm_provider import init_llm
-from agent.tool_provider import ToolFactory, CompositeToolProvider
+from agent.tool_provider import ToolFactory, ToolCatalog
+from agent import config
 from agent.memory_strategy import create_memory_strategy  # 已经导入了
 from agent.trajectory.trajectory_recorder import create_local_recorder # 导入轨迹记录器
+from agent.trajectory.react_trajectory_hook import create_trajectory_hook
+from agent.checkpointer import create_checkpointer
+from backend.thread_history import ThreadHistory
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage, SystemMessage
+from backend.stream_protocol import (
+    STREAM_FORMATS, agent_events, coalesce_frames, debug_events, debug_message, final_answer_of
+)
 
 # --- 全局状态 ---
 app_state = {}
@@ -44,6 +51,28 @@ def get_tool_args_schema(tool) -> Dict[str, Any]:
         print(f"⚠️ 获取工具 {getattr(tool, 'name', 'unknown')} 的参数模式失败: {e}")
         return {"type": "object", "description": "参数模式解析失败"}
 
+def build_categorized_tools(catalog: ToolCatalog) -> List["ToolCategory"]:
+    """按提供器对工具分类，与Agent使用的工具来自同一个目录快照"""
+    categorized_tools = []
+    for provider, tools_from_provider in catalog.provider_tools:
+        if not tools_from_provider:
+            continue
+        
+        tool_list = [
+            ToolInfo(
+                name=tool.name,
+                description=tool.description,
+                args=get_tool_args_schema(tool)
+            ) for tool in tools_from_provider
+        ]
+        categorized_tools.append(ToolCategory(
+            category=provider.get_provider_name(),
+            provider=provider.__class__.__name__,
+            tool_count=len(tools_from_provider),
+            tools=tool_list
+        ))
+    return categorized_tools
+
 # --- FastAPI生命周期管理 ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -57,8 +86,9 @@ async def lifespan(app: FastAPI):
         # 初始化LLM
         llm = init_llm()
         
-        # 获取所有工具
-        all_tools = await tool_provider.get_tools()
+        # 获取工具目录（各提供器并发初始化，超时的非关键提供器转入后台加载）
+        catalog = await tool_provider.get_catalog()
+        all_tools = catalog.tools
         
         # === 添加记忆策略配置 ===
         # 从环境变量读取记忆策略类型
@@ -96,67 +126,72 @@ async def lifespan(app: FastAPI):
         trajectory_recorder = None
         if use_trajectory:
             print("🛤️  启用轨迹记录功能")
-            trajectory_recorder = create_local_recorder()
+            trajectory_recorder = create_local_recorder(
+                config.TRAJECTORY_DIR,
+                backend=config.TRAJECTORY_BACKEND,
+                sampling=config.TRAJECTORY_SAMPLING,
+                **config.TRAJECTORY_BACKENDS.get(config.TRAJECTORY_BACKEND, {})
+            )
+            # MCP服务熔断状态变化也写入轨迹
+            tool_provider.set_trajectory_recorder(trajectory_recorder)
         else:
             print("🛤️  禁用轨迹记录功能")
         
+        # 工具目录变化后需要重建Agent，共享检查点和轨迹钩子以保留会话状态
+        checkpointer = create_checkpointer(config.CHECKPOINTER, **config.CHECKPOINTER_OPTIONS.get(config.CHECKPOINTER, {}))
+        print(f"💾 会话状态存储: {config.CHECKPOINTER}")
+        trajectory_hook = create_trajectory_hook(
+            trajectory_recorder,
+            max_queue_size=config.TRAJECTORY_HOOK_QUEUE_SIZE,
+            overflow=config.TRAJECTORY_HOOK_OVERFLOW,
+            max_sessions=config.TRAJECTORY_MAX_SESSIONS,
+            session_idle_ttl=config.TRAJECTORY_SESSION_IDLE_TTL,
+        ) if use_trajectory else None
+        
+        def build_agent(tools):
+            return create_agent(
+                llm=llm, 
+                tools=tools, 
+                use_memory=True,
+                memory_strategy=memory_strategy,  # 传入记忆策略
+                use_trajectory=use_trajectory,
+                trajectory_recorder=trajectory_recorder,  # 传入轨迹记录器
+                checkpointer=checkpointer,
+                trajectory_hook=trajectory_hook,
+                trajectory_spans=config.TRAJECTORY_SPANS
+            )
+        
         # 创建Agent实例，传入记忆策略
-        agent = create_agent(
-            llm=llm, 
-            tools=all_tools, 
-            use_memory=True,
-            memory_strategy=memory_strategy,  # 传入记忆策略
-            use_trajectory=use_trajectory,
-            trajectory_recorder=trajectory_recorder  # 传入轨迹记录器
-        )
+        agent = build_agent(all_tools)
         
         print(f"✅ 使用记忆策略: {memory_strategy.__class__.__name__}")
         
         # 将实例存储在全局状态中
         app_state["agent"] = agent
         app_state["tool_provider"] = tool_provider
+        app_state["trajectory_recorder"] = trajectory_recorder
+        app_state["trajectory_hook"] = trajectory_hook
+        app_state["checkpointer"] = checkpointer
+        app_state["thread_history"] = ThreadHistory(
+            checkpointer,
+            max_cached=config.THREAD_HISTORY_CACHE_SIZE,
+            max_cached_messages=config.THREAD_HISTORY_CACHE_MESSAGES,
+        )
         app_state["memory_strategy"] = memory_strategy  # 也可以存储策略信息
         
         # 预先加载和分类工具信息
         print("🔧 正在加载和分类工具信息...")
-        categorized_tools = []
-        if isinstance(tool_provider, CompositeToolProvider):
-            for provider in tool_provider.providers:
-                tools_from_provider = await provider.get_tools()
-                if not tools_from_provider:
-                    continue
-                
-                tool_list = [
-                    ToolInfo(
-                        name=tool.name,
-                        description=tool.description,
-                        args=get_tool_args_schema(tool)
-                    ) for tool in tools_from_provider
-                ]
-
-                categorized_tools.append(ToolCategory(
-                    category=provider.get_provider_name(),
-                    provider=provider.__class__.__name__,
-                    tool_count=len(tools_from_provider),
-                    tools=tool_list
-                ))
-        else:
-            tools_from_provider = await tool_provider.get_tools()
-            if tools_from_provider:
-                tool_list = [
-                    ToolInfo(
-                        name=tool.name,
-                        description=tool.description,
-                        args=get_tool_args_schema(tool)
-                    ) for tool in tools_from_provider
-                ]
-                categorized_tools.append(ToolCategory(
-                    category=tool_provider.get_provider_name(),
-                    provider=tool_provider.__class__.__name__,
-                    tool_count=len(tools_from_provider),
-                    tools=tool_list
-                ))
+        categorized_tools = build_categorized_tools(catalog)
+        
+        def on_catalog_changed(new_catalog: ToolCatalog):
+            app_state["agent"] = build_agent(new_catalog.tools)
+            app_state["categorized_tools"] = build_categorized_tools(new_catalog)
+            app_state["tool_catalog"] = new_catalog
+            print(f"🔄 工具目录已更新到版本 {new_catalog.version}，Agent已使用 {len(new_catalog.tools)} 个工具重建")
+        
+        tool_provider.add_catalog_listener(on_catalog_changed)
         
+        app_state["tool_catalog"] = catalog
         app_state["categorized_tools"] = categorized_tools
         print(f"✅ 工具信息加载完成，共 {len(categorized_tools)} 个分类。")
         print("✅ Agent初始化完成，服务已就绪！")
@@ -176,6 +211,17 @@ async def lifespan(app: FastAPI):
             await app_state["tool_provider"].close()
         except:
             pass
+    if app_state.get("trajectory_recorder"):
+        try:
+            # 写出队列中尚未落盘的轨迹事件
+            await app_state["trajectory_recorder"].close()
+        except Exception as e:
+            print(f"⚠️ 关闭轨迹记录器失败: {e}")
+    if hasattr(app_state.get("checkpointer"), "close"):
+        try:
+            app_state["checkpointer"].close()
+        except Exception as e:
+            print(f"⚠️ 关闭会话状态存储失败: {e}")
     print("✅ 资源清理完成。")
 
 # --- 数据模型 ---
@@ -184,6 +230,14 @@ class ChatRequest(BaseModel):
     thread_id: Optional[str] = Field(None, description="会话ID，用于多轮对话。如果为空，则会创建一个新的会话。")
     stream: bool = Field(True, description="是否使用流式响应。现在强制为True。")  # 默认就是True
     debug: bool = Field(False, description="是否开启Debug模式。如果为True，将返回详细的执行过程。")
+    stream_format: Literal["text", "sse", "ndjson"] = Field(
+        "text",
+        description="流式响应格式：text 只返回回复文本；sse / ndjson 返回 token、tool_start、tool_end、usage、done、error 事件。"
+    )
+    debug_history: int = Field(
+        0, ge=0, le=200,
+        description="Debug模式下附带本轮之前最近的多少条历史消息，0 表示只返回本轮消息。"
+    )
 
 class ChatResponse(BaseModel):
     answer: str
@@ -198,7 +252,19 @@ class DebugMessage(BaseModel):
 class DebugResponse(BaseModel):
     thread_id: str
     final_answer: str
+    messages: List[DebugMessage]  # 本轮新增的消息
+    history: List[DebugMessage] = []  # 本轮之前的历史消息（按 debug_history 截取）
+    history_before: Optional[int] = None  # 更早历史的游标（消息序号），没有更早的消息时为空
+
+class ThreadMessagesResponse(BaseModel):
+    thread_id: str
+    checkpoint_id: str  # 最新检查点ID，会话有新消息时变化
+    total: int  # 会话中的消息总数
+    start: int  # 本页第一条消息的序号
     messages: List[DebugMessage]
+    before: Optional[int] = None  # 更早一页的游标，没有更早的消息时为空
+    since: int  # 下次增量同步使用的游标
+    has_more: bool  # 本页之后是否还有消息
 
 class ToolInfo(BaseModel):
     name: str
@@ -298,8 +364,15 @@ app.add_middleware(
 
 # --- API端点 ---
 @app.get("/tools", response_model=List[ToolCategory], summary="获取可用工具列表")
-async def get_tools_endpoint():
-    """返回一个按提供商分类的可用工具列表，包含工具名称、描述和参数。"""
+async def get_tools_endpoint(response: Response):
+    """返回一个按提供商分类的可用工具列表，包含工具名称、描述和参数。
+    
+    响应头 X-Tool-Catalog-Version 为当前工具目录的版本号。
+    """
+    # 直接返回启动时加载、之后由目录监听器更新的快照，不会重新加载工具提供器
+    catalog = app_state.get("tool_catalog")
+    if catalog is not None:
+        response.headers["X-Tool-Catalog-Version"] = str(catalog.version)
     return app_state.get("categorized_tools", [])
 
 @app.post("/chat", summary="标准聊天接口")
@@ -307,7 +380,8 @@ async def chat_endpoint(request: ChatRequest):
     """
     处理聊天请求
     - **stream=True**: 流式返回答案文本（默认总是True）
-    - **debug=True**: 返回详细的执行步骤（仍然收集完整信息后返回）
+    - **stream_format**: text（默认，纯文本）、sse 或 ndjson（类型化事件，包含工具调用进度和 token 用量）
+    - **debug=True**: 返回本轮新增的消息（debug_history 可附带之前的历史）；stream_format 为 sse / ndjson 时每产生一条消息就发送一条
     """
     try:
         agent = app_state.get("agent")
@@ -323,51 +397,32 @@ async def chat_endpoint(request: ChatRequest):
         
         # --- Debug模式 ---
         if request.debug:
-            print("🐛 使用Debug模式（内部使用流式收集）")
+            # 只返回本轮新增的消息，响应大小不随会话长度增长；更早的消息按 debug_history 分页附带
+            history = None
+            if request.debug_history:
+                page = await app_state["thread_history"].page(thread_id, limit=request.debug_history)
+                if page:
+                    history = {"messages": page["messages"], "before": page["before"]}
+            messages = stream_agent_messages(agent, request.query, thread_id)
+            
+            if request.stream_format != "text":
+                print(f"🐛 使用Debug模式（{request.stream_format} 逐条发送消息）")
+                frames = coalesce_frames(debug_events(messages, thread_id, history), request.stream_format)
+                return StreamingResponse(
+                    frames,
+                    media_type=STREAM_FORMATS[request.stream_format],
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Thread-Id": thread_id}
+                )
+            
+            print("🐛 使用Debug模式（收集本轮消息后返回）")
             try:
-                # 收集所有消息用于调试
-                all_messages = []
-                final_answer = ""
-                
-                async for chunk, metadata in stream_agent(agent, request.query, thread_id):
-                    # 收集AI回复
-                    if isinstance(chunk, AIMessage) and chunk.content:
-                        final_answer += chunk.content
-                
-                # 获取完整的对话历史
-                state = await agent.aget_state({"configurable": {"thread_id": thread_id}})
-                if state and state.values and "messages" in state.values:
-                    all_messages = state.values["messages"]
-                
-                # 构建调试响应
-                debug_messages = []
-                for msg in all_messages:
-                    debug_msg = {
-                        "type": msg.__class__.__name__,
-                        "content": msg.content if hasattr(msg, 'content') else str(msg)
-                    }
-                    
-                    if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                        debug_msg["tool_calls"] = [
-                            {
-                                "id": tc.get("id", ""),
-                                "function": {
-                                    "name": tc.get("name", ""),
-                                    "arguments": tc.get("args", "{}")
-                                },
-                                "type": tc.get("type", "function")
-                            } for tc in msg.tool_calls
-                        ]
-                    
-                    if hasattr(msg, 'tool_call_id'):
-                        debug_msg["tool_call_id"] = msg.tool_call_id
-                    
-                    debug_messages.append(debug_msg)
-                
+                turn_messages = [msg async for msg in messages]
                 return DebugResponse(
                     thread_id=thread_id,
-                    final_answer=final_answer,
-                    messages=debug_messages
+                    final_answer=final_answer_of(turn_messages),
+                    messages=[debug_message(msg) for msg in turn_messages],
+                    history=history["messages"] if history else [],
+                    history_before=history["before"] if history else None
                 )
             except Exception as e:
                 print(f"❌ Debug模式错误: {e}")
@@ -375,7 +430,23 @@ async def chat_endpoint(request: ChatRequest):
                 traceback.print_exc()
                 raise HTTPException(status_code=500, detail=f"Debug mode error: {str(e)}")
 
-        # --- 流式响应（这是唯一的非Debug响应方式）---
+        # --- 结构化事件流 ---
+        if request.stream_format != "text":
+            print(f"📡 使用 {request.stream_format} 事件流")
+            frames = coalesce_frames(
+                agent_events(stream_agent(agent, request.query, thread_id), thread_id),
+                request.stream_format,
+                max_delay=config.STREAM_COALESCE_INTERVAL,
+                max_chars=config.STREAM_COALESCE_MAX_CHARS
+            )
+            return StreamingResponse(
+                frames,
+                media_type=STREAM_FORMATS[request.stream_format],
+                # 禁止代理缓冲，事件到达即转发
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Thread-Id": thread_id}
+            )
+
+        # --- 流式响应（纯文本）---
         print("📡 使用流式响应")
         async def stream_generator() -> AsyncGenerator[str, None]:
             try:
@@ -398,11 +469,66 @@ async def chat_endpoint(request: ChatRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- 会话历史接口 ---
+@app.get("/threads/{thread_id}/messages", response_model=ThreadMessagesResponse, summary="分页读取会话消息")
+async def thread_messages_endpoint(
+    thread_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200, description="每页最多返回的消息数"),
+    before: Optional[int] = Query(None, ge=0, description="向前翻页：返回序号小于此游标的最近 limit 条消息"),
+    since: Optional[int] = Query(None, ge=0, description="增量同步：返回序号不小于此游标的消息（按时间顺序）")
+):
+    """从检查点存储的最新状态读取会话消息。
+    
+    - 不带游标：返回最近的 limit 条，before 为更早一页的游标
+    - **before**：继续向前翻页
+    - **since**：传入上次响应中的 since，只返回之后新增的消息，has_more 为 True 时继续请求
+    
+    响应头 ETag 为最新检查点ID，请求带 If-None-Match 且会话没有变化时返回 304。
+    """
+    if before is not None and since is not None:
+        raise HTTPException(status_code=400, detail="before 和 since 不能同时指定")
+    thread_history = app_state.get("thread_history")
+    if not thread_history:
+        raise HTTPException(status_code=503, detail="Agent not initialized")
+    
+    page = await thread_history.page(thread_id, limit=limit, before=before, since=since)
+    if page is None:
+        raise HTTPException(status_code=404, detail=f"会话不存在: {thread_id}")
+    
+    etag = f'"{page["checkpoint_id"]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return ThreadMessagesResponse(thread_id=thread_id, **page)
+
+# --- 运行统计接口 ---
+@app.get("/stats", summary="获取运行统计")
+async def stats_endpoint():
+    """返回工具提供器的运行统计（MCP会话池利用率、重连次数等）和轨迹写入情况。"""
+    tool_provider = app_state.get("tool_provider")
+    trajectory_recorder = app_state.get("trajectory_recorder")
+    trajectory_hook = app_state.get("trajectory_hook")
+    thread_history = app_state.get("thread_history")
+    backend = getattr(trajectory_recorder, "backend", None)
+    return {
+        "tool_providers": tool_provider.get_stats() if tool_provider else {},
+        "trajectory": backend.get_stats() if hasattr(backend, "get_stats") else {},
+        "trajectory_hook": trajectory_hook.get_stats() if trajectory_hook else {},
+        "thread_history": thread_history.get_stats() if thread_history else {}
+    }
+
 # --- 健康检查接口 ---
 @app.get("/health")
 async def health_check():
     """健康检查接口"""
-    return {"status": "ok", "agent_ready": "agent" in app_state}
+    catalog = app_state.get("tool_catalog")
+    return {
+        "status": "ok",
+        "agent_ready": "agent" in app_state,
+        "tool_catalog_version": catalog.version if catalog else None
+    }
 
 # --- 运行服务器 ---
 if __name__ == "__main__":
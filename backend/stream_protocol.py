@@ -0,0 +1,294 @@
+"""/chat 的结构化流式协议
+
+stream_format 为 sse 或 ndjson 时，/chat 返回类型化事件而不是纯文本：
+
+- ``token``：AI 回复文本 ``{"type": "token", "text": ...}``，相邻的小块会合并后发送
+- ``tool_start``：模型决定调用工具 ``{"id", "name", "args"}``
+- ``tool_end``：工具返回 ``{"id", "name", "status", "output", "truncated", "duration_ms"}``
+- ``usage``：一次模型调用的 token 用量 ``{"input_tokens", "output_tokens", "total_tokens"}``
+- ``done``：正常结束 ``{"thread_id", "duration_ms", "ttft_ms", "usage"}``
+- ``error``：出错结束 ``{"message"}``
+
+debug 为 True 时改为逐条发送本轮的完整消息（格式与 DebugResponse 中的消息相同）：
+
+- ``history``：请求了 debug_history 时最先发送 ``{"messages", "before"}``，
+  ``before`` 为更早历史的游标，没有更早的消息时为 null
+- ``message``：一条完整消息 ``{"message": {...}}``，用户消息、模型回复和工具返回各一条
+- ``done``：``{"thread_id", "final_answer", "duration_ms"}``；出错时为 ``error``
+
+SSE 每个事件为 ``event: <type>`` 加一行 ``data: <JSON>``；NDJSON 每行一个 JSON 对象。
+两种格式的 JSON 内容相同，都包含 ``type`` 字段。
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+
+# stream_format -> 响应的 media_type
+STREAM_FORMATS = {
+    "text": "text/plain",
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+# 这些节点中的模型调用（例如摘要记忆策略生成摘要）不属于回复内容
+SKIPPED_NODES = {"pre_model_hook"}
+# tool_end 事件中工具输出的最大字符数
+MAX_TOOL_OUTPUT_CHARS = 2000
+
+
+def encode_event(event: Dict[str, Any], stream_format: str) -> str:
+    """把一个事件编码为 SSE 或 NDJSON 文本"""
+    data = json.dumps(event, ensure_ascii=False, default=str, separators=(",", ":"))
+    if stream_format == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+def _text_of(content: Any) -> str:
+    """消息内容可能是字符串，也可能是内容块列表，只取其中的文本"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block if isinstance(block, str) else block.get("text", "")
+            for block in content
+            if isinstance(block, str) or (isinstance(block, dict) and block.get("type") == "text")
+        )
+    return ""
+
+
+class AgentEventMapper:
+    """把 stream_agent 产生的 (消息块, 元数据) 转换为类型化事件
+
+    流式模型的工具调用分散在多个消息块中，同一消息的块先累加，
+    在最后一块（chunk_position 为 last）或工具开始返回时再发出 tool_start。
+    """
+
+    def __init__(self, thread_id: str):
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.ttft_ms: Optional[float] = None
+        self.usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        self._partial: Dict[str, AIMessageChunk] = {}
+        self._tool_started: Dict[str, float] = {}
+
+    def _elapsed_ms(self, since: float) -> float:
+        return round((time.perf_counter() - since) * 1000, 1)
+
+    def on_chunk(self, chunk: Any, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if metadata.get("langgraph_node") in SKIPPED_NODES:
+            return []
+        if isinstance(chunk, ToolMessage):
+            return self._finish_partial() + [self._tool_end(chunk)]
+        if not isinstance(chunk, AIMessage):
+            return []
+
+        events = []
+        text = _text_of(chunk.content)
+        if text:
+            if self.ttft_ms is None:
+                self.ttft_ms = self._elapsed_ms(self.started)
+            events.append({"type": "token", "text": text})
+        if chunk.usage_metadata:
+            usage = {key: chunk.usage_metadata.get(key, 0) for key in self.usage}
+            for key, value in usage.items():
+                self.usage[key] += value
+            events.append({"type": "usage", **usage})
+
+        if isinstance(chunk, AIMessageChunk):
+            key = chunk.id or ""
+            if chunk.tool_call_chunks:
+                partial = self._partial.get(key)
+                self._partial[key] = partial + chunk if partial is not None else chunk
+            if chunk.chunk_position == "last" and key in self._partial:
+                events.extend(self._tool_starts(self._partial.pop(key).tool_calls))
+        else:
+            # 非流式模型一次给出完整消息
+            events.extend(self._tool_starts(chunk.tool_calls))
+        return events
+
+    def _finish_partial(self) -> List[Dict[str, Any]]:
+        """没有收到最后一块的消息（部分模型不标记 chunk_position）在这里补发 tool_start"""
+        events = []
+        for partial in self._partial.values():
+            events.extend(self._tool_starts(partial.tool_calls))
+        self._partial.clear()
+        return events
+
+    def _tool_starts(self, tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        events = []
+        for tool_call in tool_calls:
+            tool_call_id = tool_call.get("id") or ""
+            if tool_call_id in self._tool_started:
+                continue
+            self._tool_started[tool_call_id] = time.perf_counter()
+            events.append({"type": "tool_start", "id": tool_call_id, "name": tool_call.get("name"), "args": tool_call.get("args")})
+        return events
+
+    def _tool_end(self, message: ToolMessage) -> Dict[str, Any]:
+        output = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False, default=str)
+        started = self._tool_started.pop(message.tool_call_id, None)
+        return {
+            "type": "tool_end",
+            "id": message.tool_call_id,
+            "name": message.name,
+            "status": message.status,
+            "output": output[:MAX_TOOL_OUTPUT_CHARS],
+            "truncated": len(output) > MAX_TOOL_OUTPUT_CHARS,
+            "duration_ms": self._elapsed_ms(started) if started is not None else None,
+        }
+
+    def finish(self) -> List[Dict[str, Any]]:
+        return self._finish_partial() + [{
+            "type": "done",
+            "thread_id": self.thread_id,
+            "duration_ms": self._elapsed_ms(self.started),
+            "ttft_ms": self.ttft_ms,
+            "usage": dict(self.usage),
+        }]
+
+
+async def agent_events(chunks: AsyncIterator[Tuple[Any, Dict[str, Any]]], thread_id: str) -> AsyncIterator[Dict[str, Any]]:
+    """把 stream_agent 的输出转换为事件流，以 done 或 error 事件结束"""
+    mapper = AgentEventMapper(thread_id)
+    try:
+        async for chunk, metadata in chunks:
+            for event in mapper.on_chunk(chunk, metadata):
+                yield event
+    except Exception as e:
+        print(f"❌ 流式生成错误: {e}")
+        yield {"type": "error", "message": str(e)}
+        return
+    for event in mapper.finish():
+        yield event
+
+
+def debug_message(msg: BaseMessage) -> Dict[str, Any]:
+    """把一条消息转换为 Debug 模式的消息格式"""
+    debug_msg = {
+        "type": msg.__class__.__name__,
+        "content": msg.content if hasattr(msg, 'content') else str(msg)
+    }
+    if getattr(msg, 'tool_calls', None):
+        debug_msg["tool_calls"] = [
+            {
+                "id": tc.get("id", ""),
+                "function": {
+                    "name": tc.get("name", ""),
+                    "arguments": tc.get("args", "{}")
+                },
+                "type": tc.get("type", "function")
+            } for tc in msg.tool_calls
+        ]
+    if hasattr(msg, 'tool_call_id'):
+        debug_msg["tool_call_id"] = msg.tool_call_id
+    return debug_msg
+
+
+def final_answer_of(messages: List[BaseMessage]) -> str:
+    """本轮所有AI回复的文本"""
+    return "".join(_text_of(msg.content) for msg in messages if isinstance(msg, AIMessage))
+
+
+async def debug_events(
+    messages: AsyncIterator[BaseMessage],
+    thread_id: str,
+    history: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Debug 模式的事件流：每产生一条完整消息就发送一条，以 done 或 error 事件结束"""
+    started = time.perf_counter()
+    if history is not None:
+        yield {"type": "history", **history}
+    answer: List[str] = []
+    try:
+        async for msg in messages:
+            if isinstance(msg, AIMessage):
+                answer.append(_text_of(msg.content))
+            yield {"type": "message", "message": debug_message(msg)}
+    except Exception as e:
+        print(f"❌ Debug模式错误: {e}")
+        yield {"type": "error", "message": str(e)}
+        return
+    yield {
+        "type": "done",
+        "thread_id": thread_id,
+        "final_answer": "".join(answer),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+async def coalesce_frames(
+    events: AsyncIterator[Dict[str, Any]],
+    stream_format: str,
+    max_delay: float = 0.03,
+    max_chars: int = 512,
+) -> AsyncIterator[str]:
+    """合并相邻的 token 事件，减少并发较高时的写入次数和分帧开销
+
+    token 文本先缓存，累计达到 ``max_chars`` 个字符，或第一段缓存文本已等待
+    ``max_delay`` 秒（即使模型暂时没有新输出）时合并为一个 token 事件发送。
+    第一个 token 立即发送，不影响首字延迟；其他事件到达时先发出缓存的文本，
+    再与该事件一起作为一次写入发送。
+    """
+    loop = asyncio.get_running_loop()
+    iterator = events.__aiter__()
+    text: List[str] = []
+    text_chars = 0
+    deadline: Optional[float] = None
+    first_token = True
+    next_event: Optional[asyncio.Future] = None
+
+    def take_text() -> str:
+        nonlocal text_chars, deadline
+        if not text:
+            return ""
+        frame = encode_event({"type": "token", "text": "".join(text)}, stream_format)
+        text.clear()
+        text_chars = 0
+        deadline = None
+        return frame
+
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(iterator.__anext__())
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, _ = await asyncio.wait({next_event}, timeout=timeout)
+            if not done:
+                # 模型暂时没有新输出，先发出已缓存的文本
+                frame = take_text()
+                if frame:
+                    yield frame
+                continue
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                next_event = None
+
+            if event["type"] == "token":
+                text.append(event["text"])
+                text_chars += len(event["text"])
+                if first_token or text_chars >= max_chars:
+                    first_token = False
+                    yield take_text()
+                elif deadline is None:
+                    deadline = loop.time() + max_delay
+            else:
+                yield take_text() + encode_event(event, stream_format)
+        frame = take_text()
+        if frame:
+            yield frame
+    finally:
+        # 客户端断开时停止读取 Agent 输出
+        if next_event is not None:
+            next_event.cancel()
+            try:
+                await next_event
+            except BaseException:
+                pass
+        await iterator.aclose()
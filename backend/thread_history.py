@@ -0,0 +1,114 @@
+"""会话消息历史的分页读取
+
+消息按在会话中的序号（从0开始）定位，游标就是序号：
+``before`` 读取序号小于它的最近一页（向前翻页），``since`` 读取序号不小于它的消息（增量同步）。
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.stream_protocol import debug_message
+
+
+class ThreadHistory:
+    """从检查点存储读取会话的最新消息，不经过 Agent 的 aget_state
+
+    格式化后的消息按检查点ID缓存（LRU，最多 ``max_cached`` 个检查点，
+    且缓存的消息总数不超过 ``max_cached_messages``，超过时淘汰最久未用的检查点）。
+    会话没有新的检查点时，只需确认最新检查点ID即可直接使用缓存，
+    不再反序列化和格式化整段历史，前端轮询的开销与会话长度无关。
+    检查点存储提供 ``get_latest_checkpoint_id`` 时（RedisSaver、MemorySaverWithLatest）这一步不读取消息。
+    """
+
+    def __init__(self, checkpointer: Any, max_cached: int = 256, max_cached_messages: int = 20000):
+        self.checkpointer = checkpointer
+        self.max_cached = max_cached
+        self.max_cached_messages = max_cached_messages
+        self._cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._cached_messages = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    async def _latest_checkpoint_id(self, thread_id: str) -> Optional[str]:
+        """最新检查点ID；检查点存储不支持直接查询时返回 None"""
+        get_latest = getattr(self.checkpointer, "get_latest_checkpoint_id", None)
+        if get_latest is not None:
+            return await asyncio.to_thread(get_latest, thread_id)
+        return None
+
+    def _remember(self, checkpoint_id: str, messages: List[Dict[str, Any]]) -> None:
+        if len(messages) > self.max_cached_messages:
+            # 单个会话就超过上限时不缓存
+            return
+        self._cache[checkpoint_id] = messages
+        self._cached_messages += len(messages)
+        while len(self._cache) > self.max_cached or self._cached_messages > self.max_cached_messages:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_messages -= len(evicted)
+
+    async def load(self, thread_id: str) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """返回 (最新检查点ID, 全部消息)；会话不存在时返回 None"""
+        checkpoint_id = await self._latest_checkpoint_id(thread_id)
+        if checkpoint_id is not None and checkpoint_id in self._cache:
+            self._cache.move_to_end(checkpoint_id)
+            self.cache_hits += 1
+            return checkpoint_id, self._cache[checkpoint_id]
+
+        self.cache_misses += 1
+        checkpoint_tuple = await self.checkpointer.aget_tuple({"configurable": {"thread_id": thread_id}})
+        if checkpoint_tuple is None:
+            return None
+        checkpoint_id = checkpoint_tuple.checkpoint["id"]
+        messages = self._cache.get(checkpoint_id)
+        if messages is None:
+            raw_messages = checkpoint_tuple.checkpoint["channel_values"].get("messages", [])
+            messages = [debug_message(msg) for msg in raw_messages]
+            self._remember(checkpoint_id, messages)
+        return checkpoint_id, messages
+
+    async def page(
+        self,
+        thread_id: str,
+        limit: int,
+        before: Optional[int] = None,
+        since: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """读取一页消息
+
+        不指定游标时返回最近的 ``limit`` 条；指定 ``before`` 时返回其之前的 ``limit`` 条；
+        指定 ``since`` 时从该序号起按时间顺序返回最多 ``limit`` 条。
+
+        Returns:
+            {"checkpoint_id", "total", "start"（第一条消息的序号）, "messages",
+             "before"（更早一页的游标，没有时为 None）, "since"（下次增量同步的游标）,
+             "has_more"（since 之后是否还有未返回的消息）}；会话不存在时返回 None
+        """
+        loaded = await self.load(thread_id)
+        if loaded is None:
+            return None
+        checkpoint_id, messages = loaded
+        total = len(messages)
+        if since is not None:
+            start = max(0, min(since, total))
+            end = min(total, start + limit)
+        else:
+            end = total if before is None else max(0, min(before, total))
+            start = max(0, end - limit)
+        return {
+            "checkpoint_id": checkpoint_id,
+            "total": total,
+            "start": start,
+            "messages": messages[start:end],
+            "before": start if start > 0 else None,
+            "since": end,
+            "has_more": end < total,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "cached_checkpoints": len(self._cache),
+            "cached_messages": self._cached_messages,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
@@ -0,0 +1,114 @@
+import sys
+import os
+import time
+
+import pytest
+
+# 将 agent 目录添加到 Python 路径中
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from agent.checkpointer import RedisSaver
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+
+def reply(state: MessagesState):
+    return {"messages": [AIMessage(content=f"reply {len(state['messages'])}")]}
+
+
+def create_graph(checkpointer):
+    graph = StateGraph(MessagesState)
+    graph.add_node("reply", reply)
+    graph.add_edge(START, "reply")
+    graph.add_edge("reply", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def create_savers(**options):
+    """两个共享同一个 Redis 的检查点存储，相当于两个服务实例"""
+    server = fakeredis.FakeServer()
+    return [RedisSaver(client=fakeredis.FakeRedis(server=server), **options) for _ in range(2)]
+
+
+def test_instances_share_threads():
+    saver_a, saver_b = create_savers()
+    config = {"configurable": {"thread_id": "t1"}}
+    create_graph(saver_a).invoke({"messages": [HumanMessage(content="hi")]}, config)
+    result = create_graph(saver_b).invoke({"messages": [HumanMessage(content="again")]}, config)
+    assert [m.content for m in result["messages"]] == ["hi", "reply 1", "again", "reply 3"]
+
+    latest = saver_a.get_tuple(config)
+    assert latest.checkpoint["id"] == saver_b.get_latest_checkpoint_id("t1")
+    assert len(latest.checkpoint["channel_values"]["messages"]) == 4
+
+
+def test_list_before_and_limit():
+    saver_a, saver_b = create_savers()
+    config = {"configurable": {"thread_id": "t1"}}
+    graph = create_graph(saver_a)
+    for question in ("q1", "q2", "q3"):
+        graph.invoke({"messages": [HumanMessage(content=question)]}, config)
+
+    history = list(saver_b.list(config))
+    ids = [item.checkpoint["id"] for item in history]
+    assert ids == sorted(ids, reverse=True)
+    assert len(history) == 9
+    assert history[0].parent_config["configurable"]["checkpoint_id"] == ids[1]
+
+    assert [item.checkpoint["id"] for item in saver_b.list(config, limit=2)] == ids[:2]
+    assert [item.checkpoint["id"] for item in saver_b.list(config, before=history[3].config)] == ids[4:]
+    assert [item.checkpoint["id"] for item in saver_b.list(config, before=history[3].config, limit=1)] == ids[4:5]
+    assert [item.metadata["step"] for item in saver_b.list(config, filter={"source": "input"})] == [5, 2, -1]
+    assert [item.checkpoint["id"] for item in saver_b.list(None, limit=1)] == ids[:1]
+
+
+def test_pending_writes():
+    saver_a, saver_b = create_savers()
+    config = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+    checkpoint = empty_checkpoint()
+    saved = saver_a.put(config, checkpoint, {"source": "input", "step": -1}, {})
+
+    saver_a.put_writes(saved, [("messages", "b"), ("other", "c")], task_id="task-2")
+    saver_a.put_writes(saved, [("messages", "a")], task_id="task-1")
+    # 普通写入已存在时不覆盖，特殊通道（错误）总是覆盖
+    saver_b.put_writes(saved, [("messages", "changed")], task_id="task-1")
+    saver_b.put_writes(saved, [("__error__", "first")], task_id="task-1")
+    saver_b.put_writes(saved, [("__error__", "second")], task_id="task-1")
+
+    pending = saver_b.get_tuple(saved).pending_writes
+    assert pending == [
+        ("task-1", "__error__", "second"),
+        ("task-1", "messages", "a"),
+        ("task-2", "messages", "b"),
+        ("task-2", "other", "c"),
+    ]
+
+
+def test_delete_thread():
+    saver_a, saver_b = create_savers()
+    graph = create_graph(saver_a)
+    for thread_id in ("t1", "t2"):
+        graph.invoke({"messages": [HumanMessage(content="hi")]}, {"configurable": {"thread_id": thread_id}})
+
+    saver_b.delete_thread("t1")
+    assert saver_a.get_tuple({"configurable": {"thread_id": "t1"}}) is None
+    assert list(saver_a.list({"configurable": {"thread_id": "t1"}})) == []
+    assert {item.config["configurable"]["thread_id"] for item in saver_a.list(None)} == {"t2"}
+    assert not any(b":t1:" in key or key.endswith(b"t1:namespaces") for key in saver_a.client.keys("*"))
+
+
+def test_ttl_expires_thread_index():
+    saver_a, saver_b = create_savers(ttl=60)
+    graph = create_graph(saver_a)
+    graph.invoke({"messages": [HumanMessage(content="hi")]}, {"configurable": {"thread_id": "old"}})
+    threads_key = saver_a._threads_key()
+    assert 0 < saver_a.client.ttl(threads_key) <= 60
+
+    # 模拟 old 最后一次写入已超过 ttl
+    saver_a.client.zadd(threads_key, {"old": time.time() - 120})
+    assert list(saver_b.list(None)) == []
+    graph.invoke({"messages": [HumanMessage(content="hi")]}, {"configurable": {"thread_id": "new"}})
+    assert [t.decode("utf-8") for t in saver_a.client.zrange(threads_key, 0, -1)] == ["new"]
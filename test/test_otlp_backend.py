@@ -0,0 +1,97 @@
+import sys
+import os
+import asyncio
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# 将 agent 目录添加到 Python 路径中
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.trajectory.otlp_backend import OTLPBackend, _hex_id
+
+
+def turn_events(session_id: str, trace_id: str, span_id: str):
+    """一轮请求的事件：session_start 和 user_input 记录在同一个 span 中"""
+    context = {"session_id": session_id, "trace_id": trace_id, "span_id": span_id, "timestamp": "2026-01-01T00:00:01"}
+    return [
+        {**context, "event_type": "session_start", "data": {}},
+        {**context, "event_type": "user_input", "data": {"content": "hi"}},
+        {**context, "event_type": "span", "data": {"kind": "request", "name": "LangGraph", "status": "ok", "duration_ms": 12}},
+    ]
+
+
+def test_file_sink_writes_one_export_per_batch(tmp_path):
+    async def main():
+        path = tmp_path / "spans.jsonl"
+        backend = OTLPBackend(endpoint=f"file://{path}", flush_interval=0.01)
+        for event in turn_events("s1", "trace-1", "span-1"):
+            await backend.write_event(event)
+        await backend.flush()
+        for event in turn_events("s2", "trace-2", "span-2"):
+            await backend.write_event(event)
+        await backend.close()
+
+        exports = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert len(exports) == backend.batches_written == 2
+        for export, span_id in zip(exports, ("span-1", "span-2")):
+            resource_spans = export["resourceSpans"][0]
+            assert {"key": "service.name", "value": {"stringValue": "lang-agent"}} in resource_spans["resource"]["attributes"]
+            spans = resource_spans["scopeSpans"][0]["spans"]
+            assert len({(span["traceId"], span["spanId"]) for span in spans}) == 3
+            # 其他事件作为所在 span 的子 span
+            request_span = next(span for span in spans if span["name"] == "LangGraph")
+            assert request_span["spanId"] == _hex_id(span_id, 8)
+            assert [span.get("parentSpanId") for span in spans if span is not request_span] == [request_span["spanId"]] * 2
+    asyncio.run(main())
+
+
+class CollectorStub(BaseHTTPRequestHandler):
+    """第一次请求返回 503 和 Retry-After，之后正常接收"""
+
+    requests = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        CollectorStub.requests.append((self.headers.get("Content-Encoding"), body))
+        if len(CollectorStub.requests) == 1:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_export_retries_after_retry_after():
+    CollectorStub.requests = []
+    server = HTTPServer(("127.0.0.1", 0), CollectorStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    async def main():
+        backend = OTLPBackend(endpoint=f"http://127.0.0.1:{server.server_port}/v1/traces", flush_interval=0.01, initial_backoff=5)
+        for event in turn_events("s1", "trace-1", "span-1"):
+            await backend.write_event(event)
+        await backend.close()
+        return backend
+
+    try:
+        backend = asyncio.run(main())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert backend.export_retries == 1
+    assert backend.write_errors == 0
+    assert len(CollectorStub.requests) == 2
+    encoding, body = CollectorStub.requests[-1]
+    assert encoding == "gzip"
+    spans = json.loads(gzip.decompress(body))["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert len(spans) == 3
@@ -0,0 +1,81 @@
+import sys
+import os
+import asyncio
+import time
+
+import pytest
+
+# 将 agent 目录添加到 Python 路径中
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from agent.trajectory.redis_backend import RedisStreamBackend
+
+
+def create_backend(**options):
+    return RedisStreamBackend(client=fakeredis.FakeRedis(), flush_interval=0.01, **options)
+
+
+def make_event(session_id: str, index: int, event_type: str = "user_input", trace_id: str = "t1"):
+    return {
+        "session_id": session_id,
+        "trace_id": trace_id,
+        "event_type": event_type,
+        "timestamp": f"2026-01-01T00:00:{index:02d}",
+        "data": {"index": index},
+    }
+
+
+def test_read_events_with_filters():
+    async def main():
+        backend = create_backend()
+        for index in range(6):
+            await backend.write_event(make_event(
+                "a", index,
+                event_type="ai_response" if index % 2 else "user_input",
+                trace_id=f"t{index // 3}",
+            ))
+        await backend.write_event(make_event("b", 0))
+        await backend.flush()
+
+        assert [e["data"]["index"] for e in backend.read_events("a", batch_size=4)] == [0, 1, 2, 3, 4, 5]
+        assert [e["data"]["index"] for e in backend.read_events("a", event_type="ai_response")] == [1, 3, 5]
+        assert [e["data"]["index"] for e in backend.read_events("a", trace_id="t1")] == [3, 4, 5]
+        assert [e["data"]["index"] for e in backend.read_events("a", event_type="user_input", trace_id="t0")] == [0, 2]
+        assert set(backend.list_sessions()) == {"a", "b"}
+        await backend.close()
+    asyncio.run(main())
+
+
+def test_max_stream_length_trims_streams():
+    async def main():
+        backend = create_backend(max_stream_length=10)
+        for index in range(500):
+            await backend.write_event(make_event("a", index % 60))
+        await backend.flush()
+        # MAXLEN ~ 是近似裁剪，但不会保留全部事件
+        assert 10 <= backend.client.xlen(backend.stream_key("a")) < 500
+        await backend.close()
+    asyncio.run(main())
+
+
+def test_ttl_expires_streams_and_sessions():
+    async def main():
+        backend = create_backend(ttl=0.2)
+        await backend.write_event(make_event("a", 0))
+        await backend.flush()
+        # 小于1秒的 ttl 不能让流立即过期
+        assert backend.client.exists(backend.stream_key("a")) == 1
+        assert backend.list_sessions() == ["a"]
+
+        time.sleep(0.3)
+        assert backend.client.exists(backend.stream_key("a")) == 0
+        assert backend.list_sessions() == []
+
+        await backend.write_event(make_event("b", 0))
+        await backend.flush()
+        assert backend.list_sessions() == ["b"]
+        assert backend.client.zrange(backend.sessions_key, 0, -1) == [b"b"]
+        await backend.close()
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+import sys
+import os
+import importlib
+import json
+from typing import Any
+
+import pytest
+
+# manifest 中的模块路径（tools.local.xxx）相对于 agent 目录
+AGENT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'agent'))
+sys.path.append(AGENT_DIR)
+
+with open(os.path.join(AGENT_DIR, "tools", "local", "manifest.json"), encoding="utf-8") as f:
+    MANIFEST = json.load(f)
+
+
+def normalize_schema(schema: Any) -> Any:
+    """把 pydantic 生成的 JSON Schema 简化为 manifest 的写法
+
+    去掉 title 和 default，可选字段的 anyOf [X, null] 还原为 X。
+    """
+    if isinstance(schema, list):
+        return [normalize_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    any_of = schema.get("anyOf")
+    if any_of and {"type": "null"} in any_of:
+        rest = [item for item in any_of if item != {"type": "null"}]
+        extra = {key: value for key, value in schema.items() if key != "anyOf"}
+        schema = {**(rest[0] if len(rest) == 1 else {"anyOf": rest}), **extra}
+    return {
+        key: normalize_schema(value) if key != "properties" else {name: normalize_schema(prop) for name, prop in value.items()}
+        for key, value in schema.items()
+        if key not in ("title", "default")
+    }
+
+
+@pytest.mark.parametrize("name", sorted(MANIFEST))
+def test_manifest_matches_tool_class(name):
+    entry = MANIFEST[name]
+    tool = getattr(importlib.import_module(entry["module"]), entry["class"])()
+    assert tool.name == name
+    assert tool.description == entry["description"]
+
+    schema = normalize_schema(tool.args_schema.model_json_schema())
+    # 模型自身的说明不属于参数定义
+    schema.pop("description", None)
+    assert schema == entry["args_schema"]
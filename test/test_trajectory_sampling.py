@@ -0,0 +1,96 @@
+import sys
+import os
+import asyncio
+import uuid
+from typing import Any, Dict, List
+
+# 将 agent 目录添加到 Python 路径中
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent.trajectory.callback_handler import TrajectoryCallbackHandler
+from agent.trajectory.react_trajectory_hook import ReactTrajectoryHook
+from agent.trajectory.sampling import SamplingBackend
+from agent.trajectory.trajectory_recorder import TrajectoryRecorder
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+
+class ListBackend:
+    """把写入的事件保存在列表中"""
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+
+    async def write_event(self, event: Dict[str, Any]) -> None:
+        self.events.append(event)
+
+
+def create_tail_sampled_agent_parts():
+    backend = ListBackend()
+    sampling = SamplingBackend(backend, sample_rate=0, tail=True, slow_threshold_ms=10000)
+    recorder = TrajectoryRecorder(backend=sampling)
+    hook = ReactTrajectoryHook(recorder)
+    handler = TrajectoryCallbackHandler(recorder, hook.sessions)
+    return backend, sampling, recorder, hook, handler
+
+
+async def run_turn(hook, handler, thread_id: str, messages, tool_failed: bool = False) -> None:
+    """模拟一轮请求：request span 在轨迹钩子的事件写入之前结束"""
+    config = {"configurable": {"thread_id": thread_id}}
+    request_run, tool_run = uuid.uuid4(), uuid.uuid4()
+    await handler.on_chain_start({}, {}, run_id=request_run, metadata={"thread_id": thread_id}, name="LangGraph")
+    await handler.on_tool_start({"name": "add"}, "", run_id=tool_run, parent_run_id=request_run)
+    if tool_failed:
+        await handler.on_tool_error(RuntimeError("boom"), run_id=tool_run)
+    else:
+        await handler.on_tool_end("3", run_id=tool_run)
+    # 钩子只把事件放入队列，由后台任务异步写入
+    await hook({"messages": messages}, config)
+    await handler.on_chain_end({}, run_id=request_run)
+
+
+def turn_messages(question: str, tool_status: str = "success"):
+    return [
+        HumanMessage(content=question, id=f"h-{question}"),
+        AIMessage(content="", id=f"a-{question}", tool_calls=[{"name": "add", "args": {"a": 1, "b": 2}, "id": f"c-{question}"}]),
+        ToolMessage(content="3", name="add", tool_call_id=f"c-{question}", status=tool_status, id=f"t-{question}"),
+        AIMessage(content="3", id=f"r-{question}"),
+    ]
+
+
+def test_hook_events_share_the_request_trace():
+    async def main():
+        backend, sampling, recorder, hook, handler = create_tail_sampled_agent_parts()
+        history = turn_messages("q1", tool_status="error")
+        await run_turn(hook, handler, "t1", history, tool_failed=True)
+        await run_turn(hook, handler, "t1", history + turn_messages("q2"), tool_failed=True)
+        await recorder.close()
+        traces = {}
+        for event in backend.events:
+            traces.setdefault(event["trace_id"], []).append(event["event_type"])
+        assert len(traces) == 2
+        for event_types in traces.values():
+            assert "span" in event_types and "user_input" in event_types and "ai_response" in event_types
+    asyncio.run(main())
+
+
+def test_late_hook_events_follow_the_trace_decision():
+    async def main():
+        backend, sampling, recorder, hook, handler = create_tail_sampled_agent_parts()
+
+        # 快速且没有出错的请求被丢弃，之后才到达的钩子事件也一起丢弃，不会重新缓存
+        await run_turn(hook, handler, "fast", turn_messages("q1"))
+        await hook.flush()
+        assert backend.events == []
+        assert sampling.get_stats()["sampling"]["buffered_traces"] == 0
+
+        # 工具调用失败的请求被保留，之后到达的钩子事件直接写入
+        await run_turn(hook, handler, "failed", turn_messages("q2", tool_status="error"), tool_failed=True)
+        await hook.flush()
+        event_types = {event["event_type"] for event in backend.events}
+        assert {"span", "session_start", "user_input", "ai_response", "tool_call"} <= event_types
+        assert len({event["trace_id"] for event in backend.events}) == 1
+        assert sampling.get_stats()["sampling"]["buffered_traces"] == 0
+        assert sampling.traces_kept == {"tool_error": 1}
+        assert sampling.traces_dropped == 1
+        await recorder.close()
+    asyncio.run(main())